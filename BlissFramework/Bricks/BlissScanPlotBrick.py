@@ -9,6 +9,7 @@ import logging
 from qt import *
 from PyMca.QtBlissGraph import QtBlissGraph
 from BlissFramework.BaseComponents import BlissWidget
+from BlissFramework.Utils.ScanPlotUpdater import ScanPlotUpdater
 from bliss.common.data_manager import DataManager
 from bliss.common import event
 
@@ -21,7 +22,6 @@ class BlissScanPlotBrick(BlissWidget):
         self.defineSignal('newScan', ())
 
         self.scanObject = None
-        self.xdata = []
         self.ylable = ""
         self.mylog = 0
         self.canAddPoint = True
@@ -31,11 +31,14 @@ class BlissScanPlotBrick(BlissWidget):
 
         self.addProperty('backgroundColor', 'combo', ('white', 'default'), 'white')
         self.addProperty('graphColor', 'combo', ('white', 'default'), 'white')
+        self.addProperty('maxRefreshRate', 'float', 10.)
         self.lblTitle = QLabel(self)
         self.graphPanel = QFrame(self)
         buttonBox = QHBox(self)
         self.lblPosition = QLabel(buttonBox)
         self.graph = QtBlissGraph(self.graphPanel)
+        # points are drawn in batches
+        self.plotUpdater = ScanPlotUpdater(self.graph)
                          
         QObject.connect(self.graph, PYSIGNAL('QtBlissGraphSignal'), self.handleBlissGraphSignal)
         QObject.disconnect(self.graph, SIGNAL('plotMousePressed(const QMouseEvent&)'), self.graph.onMousePressed)
@@ -72,6 +75,8 @@ class BlissScanPlotBrick(BlissWidget):
                 self.graph.canvas().setPaletteBackgroundColor(Qt.white)
             elif newValue == 'default':
                 self.graph.canvas().setPaletteBackgroundColor(QWidget.paletteBackgroundColor(self))
+        elif property == 'maxRefreshRate':
+            self.plotUpdater.maxRefreshRate = newValue
         else:
             BlissWidget.propertyChanged(self,property,oldValue,newValue)
                
@@ -79,17 +84,14 @@ class BlissScanPlotBrick(BlissWidget):
     def newScan(self, scan_id, filename, motors, npoints, counters, save_flag=True):
         self.emit(PYSIGNAL('newScan'), ())
         self.lblTitle.setText('<nobr><b>%s</b></nobr>' % filename)
-        self.xdata = []
 
         self.graph.clearcurves()
         #self.graph.xlabel(scanParameters['xlabel'])
         self.graph.xlabel("Energy")
         self.ylabel = "Counts"
 
-        ylabels = self.ylabel.split()
-        self.ydatas = [[] for x in range(len(ylabels))]
-        for labels,ydata in zip(ylabels,self.ydatas):
-            self.graph.newcurve(labels,self.xdata,ydata)
+        # the number of points is known, the arrays are allocated once
+        self.plotUpdater.newScan(self.ylabel.split(), max(1, npoints or 1))
             
         self.graph.ylabel(self.ylabel)
         if motors == 'Time':
@@ -100,12 +102,7 @@ class BlissScanPlotBrick(BlissWidget):
         self.graph.replot()
         
     def newScanPoint(self, scan_id, values):
-        x = values[0]
-        self.xdata.append(x)
-        for label,ydata,yvalue in zip(self.ylabel.split(),self.ydatas,values[1:]):
-            ydata.append(float(yvalue))
-            self.graph.newcurve(label,self.xdata,ydata)
-        self.graph.replot()
+        self.plotUpdater.addPoint(values[0], values[1:])
         
     def handleBlissGraphSignal(self, signalDict):
         if signalDict['event'] == 'MouseAt':
@@ -1,4 +1,5 @@
 import logging
+import time
 import numpy
 import qt
 import qtcanvas
@@ -9,6 +10,7 @@ from Qub.Objects.QubDrawingManager import QubPointDrawingMgr,QubAddDrawing
 from Qub.Objects.QubDrawingCanvasTools import QubCanvasHLine,QubCanvasVLine
 
 from BlissFramework.BaseComponents import BlissWidget
+from BlissFramework.Utils import BeamProfile
 
 __category__ = "Camera"
 
@@ -31,12 +33,21 @@ class CameraProfileBrick(BlissWidget) :
         self.__line = None
         self.__pointSelected = None
         self.__graphs = None
+        self.__camera = None
+        self.__showProfile = False
+        self.__lastRefresh = 0
+        self.__profileStatistics = {}
+        # refresh on new frame, at most maxRefreshRate times per second
         self.__refreshTimer = qt.QTimer(self)
         qt.QObject.connect(self.__refreshTimer,qt.SIGNAL('timeout()'),self.__refreshGraph)
         # Properties
+        self.addProperty('maxRefreshRate','float',5.)
                         ####### SIGNAL #######
         self.defineSignal('getView',())
         self.defineSignal('getImage',())
+        self.defineSignal('beamProfileChanged',())
+                        ####### SLOT #######
+        self.defineSlot('getBeamProfile',())
         self.setFixedSize(0,0)
         
                
@@ -49,6 +60,19 @@ class CameraProfileBrick(BlissWidget) :
         except KeyError:
             logging.getLogger().error('%s : You have to connect this brick to the CameraBrick',self.name())
             return
+
+        # without camera hardware object the profile is refreshed periodically
+        try:
+            self.__camera = self.getHardwareObject(key['hwname'])
+        except KeyError:
+            self.__camera = None
+        if self.__camera is not None:
+            try:
+                camera_role = self.__camera.getDeviceByRole('camera')
+                if camera_role is not None:
+                    self.__camera = camera_role
+            except:
+                pass
         
         self.__toggleButton = QubToggleAction(label='Show profile',name='histogram',place='toolbar',
                                               group='Camera',autoConnect = True)
@@ -67,14 +91,48 @@ class CameraProfileBrick(BlissWidget) :
         
         self.__graphs = (graphH,graphV)
         
+    def stop(self) :
+        self.__showCBK(False)
+
+    def propertyChanged(self,prop,oldValue,newValue) :
+        if prop == 'maxRefreshRate':
+            if self.__showProfile and self.__camera is None:
+                self.__refreshTimer.start(self.__refreshInterval())
+        else:
+            BlissWidget.propertyChanged(self,prop,oldValue,newValue)
+
+    def getBeamProfile(self,key) :
+        key['profile'] = self.__profileStatistics
+
+    def __refreshInterval(self) :
+        # in ms
+        return int(1000 / max(self['maxRefreshRate'],0.01))
+
     def __showCBK(self,state) :
+        if state == self.__showProfile:
+            return
+        self.__showProfile = state
         if state:
             self.__line.startDrawing()
-            self.__refreshTimer.start(1000)
+            if self.__camera is not None:
+                self.__camera.connect('imageReceived',self.__imageReceived)
+            else:
+                self.__refreshTimer.start(self.__refreshInterval())
         else:
+            if self.__camera is not None:
+                self.__camera.disconnect('imageReceived',self.__imageReceived)
             self.__refreshTimer.stop()
-            self.__line.hide()
-            self.__line.stopDrawing()
+            if self.__line is not None:
+                self.__line.hide()
+                self.__line.stopDrawing()
+
+    def __imageReceived(self,*args) :
+        # the refresh of a frame is delayed to respect the maximum rate,
+        # frames received meanwhile are skipped
+        if self.__pointSelected is None or self.__refreshTimer.isActive():
+            return
+        elapsed = int((time.time() - self.__lastRefresh) * 1000)
+        self.__refreshTimer.start(max(0,self.__refreshInterval() - elapsed),True)
 
     def __clickedPoint(self,drawingMgr) :
         self.__pointSelected = drawingMgr.point()
@@ -85,6 +143,7 @@ class CameraProfileBrick(BlissWidget) :
         self.__refreshGraph()
 
     def __refreshGraph(self) :
+        self.__lastRefresh = time.time()
         key = {}
         try:
             self.emit(qt.PYSIGNAL("getImage"), (key,))
@@ -93,44 +152,42 @@ class CameraProfileBrick(BlissWidget) :
 
         matrix = self.__drawing.matrix()
         try:
-            x,y = self.__pointSelected
+            x,y = [int(pos) for pos in self.__pointSelected]
         except TypeError: return
-        
+        if not (0 <= x < qimage.width() and 0 <= y < qimage.height()):
+            return
+        if qimage.depth() != 32:
+            qimage = qimage.convertDepth(32)
+
         (graphH,graphV) = self.__graphs
-        
-        array = numpy.fromstring(qimage.bits().asstring(qimage.width() * qimage.height() * 4),
-                                 dtype = numpy.uint8)
-        array.shape = qimage.height(),qimage.width(),-1
-        
-        yColor = array[y]
-        yData = yColor[:,0] * 0.114 + yColor[:,1] * 0.587 + yColor[:,2] * 0.299
-        maxData = yData.max()
-        maxHeight = qimage.height() / 3
-        z = float(maxHeight) / maxData
-        yData = yData * z
-        yData = (qimage.height()) - yData
-        #yData[len(yData)/2]= 220
-        xData = numpy.arange(qimage.width())
-        allPoint = numpy.array(zip(xData,yData))
-        allPoint.shape = -1        
-        aP = qt.QPointArray(len(xData))
-        aP.putPoints(0,allPoint.tolist())
-        aP = matrix.map(aP)
-        graphH._myXProfile = aP
-        graphH.setPoints(aP)
-
-        xColor = array[:,x]
-        xData = xColor[:,0] * 0.114 + xColor[:,1] * 0.587 + xColor[:,2] * 0.299
-        maxData = xData.max()
-        maxHeight = qimage.width() / 3
-        z = float(maxHeight) / maxData
-        xData = xData * z
-        xData = qimage.width() - xData
-        yData = numpy.arange(qimage.height())
-        allPoint = numpy.array(zip(xData,yData))
-        allPoint.shape = -1
-        aP = qt.QPointArray(len(xData))
-        aP.putPoints(0,allPoint.tolist())
-        aP = matrix.map(aP)
-        graphV._myYProfile = aP
-        graphV.setPoints(aP)
+
+        # only the selected row and column are converted to luminance
+        array = BeamProfile.get_image_array(qimage)
+        hProfile = BeamProfile.get_luminance(array[y])
+        vProfile = BeamProfile.get_luminance(array[:,x])
+
+        graphH._myXProfile = self.__profilePoints(hProfile,qimage.height(),False,matrix)
+        graphH.setPoints(graphH._myXProfile)
+        graphV._myYProfile = self.__profilePoints(vProfile,qimage.width(),True,matrix)
+        graphV.setPoints(graphV._myYProfile)
+
+        self.__profileStatistics = {'x' : x, 'y' : y,
+                                    'horizontal' : BeamProfile.get_profile_statistics(hProfile),
+                                    'vertical' : BeamProfile.get_profile_statistics(vProfile)}
+        self.emit(qt.PYSIGNAL("beamProfileChanged"), (self.__profileStatistics,))
+
+    def __profilePoints(self,profile,imageSize,vertical,matrix) :
+        # profile drawn on a third of the image from its bottom (right)
+        maxData = profile.max()
+        if maxData > 0:
+            values = imageSize - profile * (float(imageSize / 3) / maxData)
+        else:
+            values = numpy.zeros(len(profile)) + imageSize
+        positions = numpy.arange(len(profile))
+        if vertical:
+            allPoint = numpy.column_stack((values,positions))
+        else:
+            allPoint = numpy.column_stack((positions,values))
+        aP = qt.QPointArray(len(profile))
+        aP.putPoints(0,allPoint.astype(numpy.int32).ravel().tolist())
+        return matrix.map(aP)
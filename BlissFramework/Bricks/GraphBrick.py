@@ -1,6 +1,8 @@
 """Graph brick"""
 import time
 import os
+import logging
+import numpy
 import Qwt5 as qwt
 #from qwt import QwtPlot
 from qt import *
@@ -9,6 +11,7 @@ from PyMca.QtBlissGraph import QtBlissGraph
 from PyMca.QtBlissGraph import TimeScaleDraw
 from BlissFramework.BaseComponents import BlissWidget
 from BlissFramework.Utils.CustomWidgets import QLineEditWithOkCancel
+from BlissFramework.Utils.CurveBuffer import CurveBuffer
 from BlissFramework import Icons
 
 __author__ = 'Matias Guijarro'
@@ -67,12 +70,13 @@ class CurveData(QObject):
 
         self.setName(curve_name)
         self.maptoy2 = maptoy2
+        # x is the time of the points on a time axis
+        self.points = CurveBuffer()
         self.clear()
      
         
     def clear(self):
-        self.x = []
-        self.y = []
+        self.points.clear()
         self.t0 = None
         self.t = None
         
@@ -82,8 +86,8 @@ class CurveData(QObject):
 
 
     def timeout(self):
-        if len(self.y) > 0:
-            self.emit(PYSIGNAL('addPoint'), (str(self.name()), self.y[-1], None, True))
+        if len(self.points) > 0:
+            self.emit(PYSIGNAL('addPoint'), (str(self.name()), self.points.get_last(), None, True))
        
 
 class GraphWidget(QtBlissGraph):
@@ -118,6 +122,11 @@ class GraphBrick(BlissWidget):
         self.timeAxisX = False
         self.timeAxisElapsedTime = True
         self.windowSize = None
+        # curves are redrawn at most maxRefreshRate times per second
+        self.dirtyCurves = set()
+        self.lastRedraw = 0
+        self.redrawTimer = QTimer(self)
+        QObject.connect(self.redrawTimer, SIGNAL('timeout()'), self.redrawCurves)
     
         self.defineSlot("clearGraphs", ())
   
@@ -137,6 +146,7 @@ class GraphBrick(BlissWidget):
         self.addProperty('timeElapsedTime', 'boolean', 'True')
         self.addProperty('windowSize', 'integer', '3600')
         self.addProperty('allowSave', 'boolean', False)
+        self.addProperty('maxRefreshRate', 'float', 5.)
         self.getProperty('timeOnXAxis').hidden = True
         self.getProperty('windowSize').hidden = True
         self.getProperty('timeElapsedTime').hidden = True
@@ -222,13 +232,17 @@ class GraphBrick(BlissWidget):
 
     def cmdBrowseClicked(self):
         self["filename"] =  QFileDialog.getSaveFileName(os.environ["HOME"],
-                                                        "Data file (*.dat *.txt)",
+                                                        "Data file (*.dat *.txt);;NumPy archive (*.npz)",
                                                         self,
                                                         "Save file",
                                                         "Choose a filename to save under")
 
 
     def cmdSaveDataClicked(self):
+        if str(self["filename"]).endswith(".npz"):
+            self.saveNpz(str(self["filename"]))
+            return
+
         try:
             f = open(self["filename"], "w")
         except:
@@ -242,7 +256,7 @@ class GraphBrick(BlissWidget):
                 contents.append("#N 2")
                 contents.append("#L  %s  %s" % (self.graphWidget.xlabel() or (self.timeAxisX and "time (s.)" or "X"), self.graphWidget.ylabel() or "Y"))
 
-                for x, y in zip(curve_data.x, curve_data.y):
+                for x, y in zip(*self.getCurvePlotData(curve_data)):
                     contents.append("%s %s" % (str(x), str(y)))
 
                 contents.append("\n")
@@ -256,16 +270,47 @@ class GraphBrick(BlissWidget):
                     QMessageBox.information(self, "Success", "Data have been saved successfully to\n%s" % self["filename"], QMessageBox.Ok)
             finally:
                 f.close()
-                
+
+
+    def saveNpz(self, filename):
+        # one x and one y array per curve, as plotted
+        arrays = {}
+        for curve_name, curve_data in self.curveData.iteritems():
+            x, y = self.getCurvePlotData(curve_data)
+            arrays["%s.x" % curve_name] = x
+            arrays["%s.y" % curve_name] = y
+
+        try:
+            numpy.savez_compressed(filename, **arrays)
+        except:
+            logging.getLogger().exception("An error occured while trying to save file %s", filename)
+            QMessageBox.warning(self, "Error", "Could not save file to\n%s" % filename, QMessageBox.Ok)
+        else:
+            QMessageBox.information(self, "Success", "Data have been saved successfully to\n%s" % filename, QMessageBox.Ok)
+
+
+    def getCurvePlotData(self, curveData):
+        x, y = curveData.points.get_data()
+        if self.timeAxisX and len(x) > 0:
+            if self.windowSize > 0:
+                # time relative to the last point
+                x -= curveData.t
+            elif self.timeAxisElapsedTime:
+                x -= curveData.t0
+        return x, y
+
 
     def run(self):        
         self.topPanel.hide()
 
         for curve_name, curve_data in self.curveData.items():
-            self.graphWidget.newcurve(curve_name, curve_data.x, curve_data.y, maptoy2=curve_data.maptoy2)
+            x, y = self.getCurvePlotData(curve_data)
+            self.graphWidget.newcurve(curve_name, x, y, maptoy2=curve_data.maptoy2)
 
 
     def stop(self):
+        self.redrawTimer.stop()
+        self.dirtyCurves.clear()
         self.topPanel.show()
 
         for child in self.topPanel.queryList('QObject'):
@@ -401,6 +446,8 @@ class GraphBrick(BlissWidget):
         elif property == 'windowSize':
             self.txtWindowSize.setText(str(newValue))
             self.windowSizeChanged(newValue)
+        elif property == 'maxRefreshRate':
+            pass
         elif property == 'allowSave':
             if newValue:
                 self.savePanel.show()
@@ -454,8 +501,7 @@ class GraphBrick(BlissWidget):
         if curve_name in self.hardwareObjects and str(self.hardwareObjects[curve_name].name()) != mnemonic:
             self.disconnect(self.hardwareObjects[curve_name], PYSIGNAL('valueChanged'), self.curveData[curve_name].addPoint)
             self.disconnect(self.hardwareObjects[curve_name], PYSIGNAL('timeout'), self.curveData[curve_name].timeout)
-            self.curveData[curve_name].x = []
-            self.curveData[curve_name].y = []
+            self.curveData[curve_name].points.clear()
             del self.hardwareObjects[curve_name]
 
         if not curve_name in self.hardwareObjects:
@@ -467,7 +513,8 @@ class GraphBrick(BlissWidget):
                 self.connect(ho, PYSIGNAL('valueChanged'), self.curveData[curve_name].addPoint)
                 self.connect(ho, PYSIGNAL('timeout'), self.curveData[curve_name].timeout)
            
-        self.graphWidget.newcurve(curve_name, x = self.curveData[curve_name].x, y = self.curveData[curve_name].y, maptoy2=maptoy2)
+        x, y = self.getCurvePlotData(self.curveData[curve_name])
+        self.graphWidget.newcurve(curve_name, x = x, y = y, maptoy2=maptoy2)
     
     def addPoint(self, curve_name, y = None, x = None, timeout = False, replot = True):
         curveData = self.curveData[curve_name]
@@ -479,33 +526,18 @@ class GraphBrick(BlissWidget):
 
         if self.timeAxisX:
             if self.timeAxisElapsedTime: 
-              if curveData.t0 is None:
-                # 't0' is the starting time (first point added)
-                curveData.t0 = time.time()
-                curveData.t = curveData.t0
-                t = 0
-              else:
-                # 't' is the time elapsed between the new point and the previous one
-                t = time.time() - curveData.t
-                curveData.t += t
+              curveData.t = time.time()
             else:
-              t = int(time.strftime("%S"))+int(time.strftime("%H"))*3600+int(time.strftime("%M"))*60
-              curveData.t = t
+              curveData.t = int(time.strftime("%S"))+int(time.strftime("%H"))*3600+int(time.strftime("%M"))*60
+            if curveData.t0 is None:
+              # 't0' is the starting time (first point added)
+              curveData.t0 = curveData.t
+            x = curveData.t
 
             if self.windowSize > 0:
-                x = 0
-                
-                n0 = len(curveData.x)
-                curveData.x = filter(None, [x + self.windowSize > 0 and x - t for x in curveData.x])
-                n = len(curveData.x)
-                
-                if n0 > n:
-                    curveData.y = curveData.y[n0 - n:]
-            else:
-                if self.timeAxisElapsedTime:
-                  x = curveData.t - curveData.t0
-                else:
-                  x = curveData.t
+                # times are monotonic, the points out of the window
+                # are found by a binary search
+                curveData.points.discard_before(x - self.windowSize)
 
         elif x is not None:
             x = float(x)
@@ -513,24 +545,46 @@ class GraphBrick(BlissWidget):
             if timeout:
                 return
             
-            if len(curveData.x) > 0:
-                x = curveData.x[-1] + 1
+            if len(curveData.points) > 0:
+                x = curveData.points.get_last("x") + 1
             else:
                 x = 0
                                   
-        curveData.x.append(x)  
-        curveData.y.append(y)
+        curveData.points.append(x, y)
 
         if self.windowSize:
-            if not self.timeAxisX and len(curveData.y) == self.windowSize:
-                del curveData.y[0]
-                del curveData.x[0]
+            if not self.timeAxisX:
+                curveData.points.keep_last(self.windowSize - 1)
 
         if replot is True:
             if self.isRunning():            
-                self.graphWidget.newcurve(curve_name, curveData.x,  curveData.y, maptoy2=curveData.maptoy2)
-                self.graphWidget.replot()                
-        
+                self.scheduleRedraw(curve_name)
+
+
+    def scheduleRedraw(self, curve_name):
+        # points received until the redraw are drawn together
+        self.dirtyCurves.add(curve_name)
+        if not self.redrawTimer.isActive():
+            elapsed = int((time.time() - self.lastRedraw) * 1000)
+            self.redrawTimer.start(max(0, self.redrawInterval() - elapsed), True)
+
+
+    def redrawInterval(self):
+        # in ms
+        return int(1000 / max(self['maxRefreshRate'], 0.01))
+
+
+    def redrawCurves(self):
+        self.lastRedraw = time.time()
+
+        for curve_name in self.dirtyCurves:
+            curveData = self.curveData.get(curve_name)
+            if curveData is not None:
+                x, y = self.getCurvePlotData(curveData)
+                self.graphWidget.newcurve(curve_name, x, y, maptoy2=curveData.maptoy2)
+        self.dirtyCurves.clear()
+
+        self.graphWidget.replot()
                                                    
 
     def curveSelected(self, curve_name):
@@ -3,7 +3,11 @@ from qt import *
 from BlissFramework.BaseComponents import BlissWidget
 import os,sys
 import glob
+import time
+import threading
+import collections
 from BlissFramework import Icons
+from BlissFramework.Utils.ImageContrast import ImageContrast
 import qttable
 import DataCollectStatusBrick
 import numpy
@@ -15,18 +19,140 @@ from Qub.Widget import QubDataDisplay
 from Qub.Widget.QubActionSet import QubLineDataSelectionAction
 from Qub.Widget.QubView import QubView
 
+try:
+    from Bruker import Bruker
+except:
+    pass
+
 __category__ = 'mxCuBE'
 
-class DetectorImage(DataCollectStatusBrick.DetectorImage):
-    def __init__(self,*args):
-        DataCollectStatusBrick.DetectorImage.__init__(self,*args)
-        self.setFixedSize(0,0)
-    def clearImage(self):
-        self.emit(PYSIGNAL("clearImage"),())
-    def readFailed(self,filename):
-        self.emit(PYSIGNAL("imageUpdated"),(filename,False))
-    def readSuccessful(self,filename,data_array,image_headers):
-        self.emit(PYSIGNAL("imageUpdated"),(filename,True,data_array,image_headers))
+IMAGE_READ_EVENT = QEvent.User
+class ImageReadEvent(QCustomEvent):
+    def __init__(self,filename,status,data_array=None,image_headers=None):
+        QCustomEvent.__init__(self,IMAGE_READ_EVENT)
+        self.filename=filename
+        self.status=status
+        self.dataArray=data_array
+        self.imageHeaders=image_headers
+
+def readImageFile(filename):
+    """Returns (data array, headers) of a detector image file"""
+    template_ext=os.path.splitext(filename)[1]
+    if template_ext==".img":
+        format_reader=QubADSC()
+    elif template_ext==".mccd":
+        format_reader=QubMarCCD()
+    elif template_ext==".gfrm":
+        format_reader=Bruker()
+    else:
+        raise ValueError("Unknown image format: %s" % filename)
+
+    fd=file(filename)
+    try:
+        read_handler=format_reader.readHandler(fd)
+        data_array=read_handler.get()
+        try:
+            img_headers=read_handler.info()
+        except:
+            img_headers={}
+    finally:
+        fd.close()
+    return data_array,img_headers
+
+class ImagePrefetchThread(QThread):
+    """Reads the requested images off the GUI thread. Only the newest
+       requested image ready to be read is read, older requests are
+       dropped, so the viewer keeps up with fast collections
+    """
+    IMAGE_DELAY = DataCollectStatusBrick.DetectorImage.IMAGE_DELAY/1000.0
+    IMAGE_TIMEOUT = DataCollectStatusBrick.DetectorImage.IMAGE_TIMEOUT/1000.0
+    TIMEOUT_RETRIES = DataCollectStatusBrick.DetectorImage.TIMEOUT_RETRIES
+
+    def __init__(self,brick):
+        QThread.__init__(self)
+        self.Brick=brick
+        self.condition=threading.Condition()
+        # (filename, time from which it can be read), in request order
+        self.pending=[]
+        self.stopped=False
+        self.dropped=0
+
+    def request(self,filename,delay=False):
+        ready_time=time.time()
+        if delay:
+            ready_time+=ImagePrefetchThread.IMAGE_DELAY
+        with self.condition:
+            self.pending.append((filename,ready_time))
+            self.condition.notify()
+
+    def stopPrefetch(self):
+        with self.condition:
+            self.stopped=True
+            self.pending=[]
+            self.condition.notify()
+
+    def takeNewestReady(self):
+        # called with the condition acquired
+        now=time.time()
+        newest=None
+        for i in range(len(self.pending)):
+            if self.pending[i][1]<=now:
+                newest=i
+        if newest is None:
+            return None
+        filename=self.pending[newest][0]
+        self.dropped+=newest
+        del self.pending[:newest+1]
+        return filename
+
+    def waitForImage(self):
+        with self.condition:
+            while not self.stopped:
+                filename=self.takeNewestReady()
+                if filename is not None:
+                    return filename
+                timeout=None
+                if self.pending:
+                    timeout=max(0,min([t for f,t in self.pending])-time.time())
+                self.condition.wait(timeout)
+
+    def waitForRetry(self):
+        # returns True if the read has to be abandoned for a newer image
+        end_time=time.time()+ImagePrefetchThread.IMAGE_TIMEOUT
+        with self.condition:
+            while not self.stopped:
+                now=time.time()
+                if [f for f,t in self.pending if t<=now]:
+                    return True
+                if now>=end_time:
+                    return False
+                self.condition.wait(end_time-now)
+        return True
+
+    def run(self):
+        while True:
+            filename=self.waitForImage()
+            if filename is None:
+                return
+
+            retries=ImagePrefetchThread.TIMEOUT_RETRIES
+            while retries>0:
+                try:
+                    data_array,img_headers=readImageFile(filename)
+                except ValueError:
+                    self.postEvent(self.Brick,ImageReadEvent(filename,False))
+                    break
+                except:
+                    # the image may not be written yet
+                    retries-=1
+                    if self.waitForRetry():
+                        self.dropped+=1
+                        break
+                else:
+                    self.postEvent(self.Brick,ImageReadEvent(filename,True,data_array,img_headers))
+                    break
+            else:
+                self.postEvent(self.Brick,ImageReadEvent(filename,False))
 
 class ImageAnalysisBrick(BlissWidget):
     ZOOM_LEVELS = ( (0.25,"25%"), (0.5,"50%"), (1.0,"100%"),\
@@ -36,19 +162,30 @@ class ImageAnalysisBrick(BlissWidget):
     KEY_WIDTH   = 1.5
     VALUE_WIDTH = 1.1
 
+    # number of images whose contrast levels are kept
+    CONTRAST_CACHE_SIZE = 8
+
     def __init__(self, *args):
         BlissWidget.__init__(self, *args)
 
         self.collectObj = None
 
         self.imageHeaders={}
-        self.image90Contrast=None
-        self.imageStdDevContrast=None
+        self.imageContrast=None
+        self.contrastCache=collections.OrderedDict()
         self.currentImage=None
+        self.wantedImage=None
 
-        self.detectorImage=DetectorImage(None)
-        QObject.connect(self.detectorImage, PYSIGNAL("clearImage"), self.clearImage)
-        QObject.connect(self.detectorImage, PYSIGNAL("imageUpdated"), self.detectorImageUpdated)
+        # decoded images, least recently used first
+        self.imageCache=collections.OrderedDict()
+        self.imageCacheBytes=0
+        self.prefetchThread=None
+
+        # filename -> insertion number, the combobox index is the
+        # insertion number minus the number of removed filenames
+        self.filenameHistory={}
+        self.filenameCount=0
+        self.removedFilenames=0
 
         filename_box=QHBox(self)
         box1=QVBox(filename_box)
@@ -64,6 +201,7 @@ class ImageAnalysisBrick(BlissWidget):
         self.imageFilename.setEditable(True)
         self.imageFilename.setEnabled(False)
         self.imageFilename.setDuplicatesEnabled(False)
+        self.imageFilename.setInsertionPolicy(QComboBox.NoInsertion)
         self.imageFilename.setSizePolicy(QSizePolicy.MinimumExpanding,QSizePolicy.Fixed)
         QObject.connect(self.imageFilename, SIGNAL("activated(const QString &)"), self.readCurrentImage)
 
@@ -139,6 +277,9 @@ class ImageAnalysisBrick(BlissWidget):
         self.addProperty('fileHistorySize','integer',10)
         self.addProperty('showLegends','boolean',False)
         self.addProperty('graphFixedHeight','integer',200)
+        self.addProperty('contrastSubsample','integer',1)
+        self.addProperty('imageCacheSize','integer',5)
+        self.addProperty('imageCacheMegabytes','integer',256)
 
         self.defineSlot('setSession',())
 
@@ -147,12 +288,22 @@ class ImageAnalysisBrick(BlissWidget):
         self.layout().addWidget(box2)
 
     def run(self):
-        self.imageFilename.clear()
+        self.clearFilenameHistory()
         self.imageFilename.setPaletteBackgroundColor(Qt.white)
         self.imageFilename.lineEdit().setPaletteBackgroundColor(Qt.white)
         self.clearImage()
         #filename="/tmp/gabadinho/external/mx415/20070924/mx415_1_002.img"
 
+        if self.prefetchThread is None:
+            self.prefetchThread=ImagePrefetchThread(self)
+            self.prefetchThread.start()
+
+    def stop(self):
+        if self.prefetchThread is not None:
+            self.prefetchThread.stopPrefetch()
+            self.prefetchThread.wait()
+            self.prefetchThread=None
+
     def updateHeaders(self,img_headers):
         self.imageHeaders=img_headers
         self.headersTable.setNumRows(0)
@@ -183,7 +334,11 @@ class ImageAnalysisBrick(BlissWidget):
                 self.connect(self.collectObj, PYSIGNAL('progressUpdate'), self.imageCollected)
 
         elif propertyName == 'fileHistorySize':
-            self.imageFilename.setMaxCount(newValue)
+            while self.imageFilename.count()>max(1,newValue):
+                self.removeOldestFilename()
+
+        elif propertyName in ('imageCacheSize','imageCacheMegabytes'):
+            self.applyImageCacheSize()
 
         elif propertyName == 'showLegends':
             if not newValue:
@@ -199,30 +354,106 @@ class ImageAnalysisBrick(BlissWidget):
             BlissWidget.propertyChanged(self,propertyName,oldValue,newValue)
 
     def setSession(self,session_id,prop_code=None,prop_number=None,prop_id=None,expiration_time=0):
-        self.imageFilename.clear()
+        self.clearFilenameHistory()
         self.imageFilename.setPaletteBackgroundColor(Qt.white)
         self.imageFilename.lineEdit().setPaletteBackgroundColor(Qt.white)
         self.clearImage()
 
+    def clearFilenameHistory(self):
+        self.imageFilename.clear()
+        self.filenameHistory={}
+        self.filenameCount=0
+        self.removedFilenames=0
+
+    def removeOldestFilename(self):
+        self.filenameHistory.pop(str(self.imageFilename.text(0)),None)
+        self.imageFilename.removeItem(0)
+        self.removedFilenames+=1
+
+    def selectFilename(self,filename):
+        if filename not in self.filenameHistory:
+            if self.imageFilename.count()>=max(1,self['fileHistorySize']):
+                self.removeOldestFilename()
+            self.imageFilename.insertItem(filename)
+            self.filenameHistory[filename]=self.filenameCount
+            self.filenameCount+=1
+        self.imageFilename.setCurrentItem(self.filenameHistory[filename]-self.removedFilenames)
+
+    def getCachedImage(self,filename):
+        # returns (data array, headers) if the file has not changed
+        cached=self.imageCache.get(filename)
+        if cached is None:
+            return None
+        if cached[0] is None or cached[0]!=self.getImageKey(filename):
+            self.uncacheImage(filename)
+            return None
+        self.imageCache[filename]=self.imageCache.pop(filename)
+        return cached[1:]
+
+    def cacheImage(self,filename,data_array,image_headers):
+        self.uncacheImage(filename)
+        self.imageCache[filename]=(self.getImageKey(filename),data_array,image_headers)
+        self.imageCacheBytes+=getattr(data_array,'nbytes',0)
+        self.applyImageCacheSize()
+
+    def uncacheImage(self,filename):
+        cached=self.imageCache.pop(filename,None)
+        if cached is not None:
+            self.imageCacheBytes-=getattr(cached[1],'nbytes',0)
+
+    def applyImageCacheSize(self):
+        # the cache is bounded both in images and in bytes, a few frames
+        # of a large detector can take hundreds of megabytes
+        max_bytes=max(0,self['imageCacheMegabytes'])*1024*1024
+        while self.imageCache and (len(self.imageCache)>max(0,self['imageCacheSize']) or \
+                                   self.imageCacheBytes>max_bytes):
+            self.uncacheImage(next(iter(self.imageCache)))
+
     def setImage(self,filename,delay):
         #print "setImage",filename,self.currentImage
         if filename==self.currentImage:
+            if filename!=self.wantedImage:
+                self.wantedImage=filename
+                self.selectFilename(filename)
+                self.filenameBox.setEnabled(True)
+                self.imageFilename.setPaletteBackgroundColor(Qt.white)
+                self.imageFilename.lineEdit().setPaletteBackgroundColor(Qt.white)
             return
-        self.filenameBox.setEnabled(False)
+        self.wantedImage=filename
+        self.selectFilename(filename)
 
-        found=False
-        for i in range(self.imageFilename.count()):
-            f=str(self.imageFilename.text(i))
-            if f==filename:
-                found=True
-                break
-        if not found:
-            self.imageFilename.insertItem(filename)
-            i=self.imageFilename.count()-1
-        self.imageFilename.setCurrentItem(i)
+        cached=self.getCachedImage(filename)
+        if cached is not None:
+            self.detectorImageUpdated(filename,True,*cached)
+            return
+
+        if self.prefetchThread is None:
+            # not running: nothing reads images in the background
+            try:
+                data_array,img_headers=readImageFile(filename)
+            except:
+                logging.getLogger().exception("ImageAnalysisBrick: cannot read image %s" % filename)
+                self.detectorImageUpdated(filename,False)
+            else:
+                self.cacheImage(filename,data_array,img_headers)
+                self.detectorImageUpdated(filename,True,data_array,img_headers)
+            return
+
+        self.filenameBox.setEnabled(False)
         self.imageFilename.setPaletteBackgroundColor(Qt.yellow)
         self.imageFilename.lineEdit().setPaletteBackgroundColor(Qt.yellow)
-        self.detectorImage.setImage("","",0,filename,delay=delay)
+        self.prefetchThread.request(filename,delay)
+
+    def customEvent(self,event):
+        if event.type()!=IMAGE_READ_EVENT:
+            return
+        if event.status:
+            self.cacheImage(event.filename,event.dataArray,event.imageHeaders)
+        # while following a collection the newest read image is shown,
+        # even if a newer one has been requested meanwhile
+        following=self.radioBox.selectedId()==0 and self.currentImage!=self.wantedImage
+        if event.filename==self.wantedImage or (following and event.status):
+            self.detectorImageUpdated(event.filename,event.status,event.dataArray,event.imageHeaders)
 
     def imageCollected(self,osc_id,image_number):
         #print "ImageAnalysisBrick.imageCollected",osc_id,image_number
@@ -303,54 +534,48 @@ class ImageAnalysisBrick(BlissWidget):
             elif button==1:
                 colormap.setColorMapType(pixmaptools.LUT.Palette.REVERSEGREY)
                 colormap.setAutoscale(False)
-                try:
-                    min_val=float(self.image90Contrast[0])
-                    max_val=float(self.image90Contrast[1])
-                except:
-                    datatmp = self.imageDisplay.getData().copy()
-                    datatmp = datatmp.ravel()
-                    datatmp.sort()
-                    cumsum = datatmp.cumsum()
-                    limit = cumsum[-1] * 0.97
-                    maskResult = cumsum > limit
-                    max_val = datatmp[maskResult][0]
-                    min_val = self.imageDisplay.getData().min()
-                    self.image90Contrast=(min_val,max_val)
-                colormap.setMinMax(min_val,max_val)
+                min_val,max_val=self.getImageContrast().get_cumulative_contrast()
+                colormap.setMinMax(float(min_val),float(max_val))
 
             elif button==2:
                 colormap.setColorMapType(pixmaptools.LUT.Palette.GREYSCALE)
                 colormap.setAutoscale(False)
-                try:
-                    min_val=float(self.imageStdDevContrast[0])
-                    max_val=float(self.imageStdDevContrast[1])
-                except:
-                    datatmp = self.imageDisplay.getData()
-                    nbValue = 1
-                    for val in datatmp.shape:
-                        nbValue *= val
-                    integralVal = datatmp.sum() 
-                    average = integralVal / nbValue
-                    stdDeviation = datatmp.std()
-                    min_val=average - stdDeviation
-                    max_val=average + stdDeviation
-                    self.imageStdDevContrast=(min_val,max_val)
-                colormap.setMinMax(min_val,max_val)
+                min_val,max_val=self.getImageContrast().get_std_dev_contrast()
+                colormap.setMinMax(float(min_val),float(max_val))
 
             self.imageDisplay.refresh()
 
         except:
             pass
 
+    def getImageContrast(self):
+        # contrast levels are computed once per image, from one histogram
+        if self.imageContrast is None:
+            self.imageContrast=ImageContrast(self.imageDisplay.getData(),
+                                             max(1,self['contrastSubsample']))
+            key=self.getImageKey(self.currentImage)
+            if key is not None:
+                self.contrastCache[key]=self.imageContrast
+                while len(self.contrastCache)>ImageAnalysisBrick.CONTRAST_CACHE_SIZE:
+                    self.contrastCache.popitem(last=False)
+        return self.imageContrast
+
+    def getImageKey(self,filename):
+        try:
+            return (filename,os.path.getmtime(filename))
+        except (OSError,TypeError):
+            return None
+
     def detectorImageUpdated(self,filename,status,data_array=None,image_headers=None):
         #print "ImageAnalysisBrick.detectorImageUpdated",filename,status
-        self.filenameBox.setEnabled(True)
+        if filename==self.wantedImage:
+            self.filenameBox.setEnabled(True)
 
-        self.image90Contrast=None
-        self.imageStdDevContrast=None
+        self.imageContrast=None
         if status:
-            self.imageFilename.setPaletteBackgroundColor(Qt.white)
-            self.imageFilename.lineEdit().setPaletteBackgroundColor(Qt.white)
+            if filename==self.wantedImage:
+                self.imageFilename.setPaletteBackgroundColor(Qt.white)
+                self.imageFilename.lineEdit().setPaletteBackgroundColor(Qt.white)
             
             try:
                 self.imageDisplay.setData(data_array)
@@ -362,6 +587,9 @@ class ImageAnalysisBrick(BlissWidget):
             self.lineSelection.setState(True)
 
             self.currentImage=filename
+            key=self.getImageKey(filename)
+            if key is not None:
+                self.imageContrast=self.contrastCache.get(key)
             self.contrastChanged(self.contrastBox.selectedId())
             self.zoomLevelChanged(self.zoomBox.selectedId())
 
@@ -375,6 +603,7 @@ class ImageAnalysisBrick(BlissWidget):
     def clearImage(self):
         #print "ImageAnalysisBrick.clearImage"
         self.currentImage=None
+        self.imageContrast=None
         self.updateHeaders(())
 
         try:
@@ -188,7 +188,7 @@ class Qt4_CatsSimpleBrick(Qt4_SampleChangerBrick3):
 
         if self.has_basket_HT:
              vials = [[VialView.VIAL_BARCODE]] *10 
-             self.baskets[-1].setMatrices(vials)
+             self.baskets[-1].set_matrices(vials)
 
     def sc_state_changed(self, state, previous_state=None):
         Qt4_SampleChangerBrick3.sc_state_changed(self, state, previous_state)
@@ -122,6 +122,10 @@ class Qt4_InstanceListBrick(BlissWidget):
              "ACTING_AS_CLIENT", "CONNECTING_TO_SERVER")
     IDS = ("UNKNOWN", "USER", "INHOUSE_USER", "INHOUSE_IMPERSONATION")
     RECONNECT_TIME = 5000
+    # brick updates sent at high rate (typing in a line edit, spinbox steps)
+    # are coalesced per brick and widget and sent every BRICK_UPDATE_INTERVAL
+    COALESCED_METHODS = ("setText", "setValue")
+    BRICK_UPDATE_INTERVAL = 100
 
     def __init__(self, *args):
         """
@@ -245,6 +249,10 @@ class Qt4_InstanceListBrick(BlissWidget):
         # Other ---------------------------------------------------------------
         self.timeout_timer = QTimer(self)
         self.timeout_timer.timeout.connect(self.timeout_approaching)
+        self.pending_brick_updates = collections.OrderedDict()
+        self.brick_update_timer = QTimer(self)
+        self.brick_update_timer.setSingleShot(True)
+        self.brick_update_timer.timeout.connect(self.flush_brick_updates)
         _main_gbox.setChecked(False)
 
     def propertyChanged(self, property_name, old_value, new_value):
@@ -439,11 +447,7 @@ class Qt4_InstanceListBrick(BlissWidget):
             local = BlissWidget.INSTANCE_LOCATION_EXTERNAL
         BlissWidget.setInstanceLocation(local)
 
-        for widget in QApplication.allWidgets():
-            if hasattr(widget, "configuration"):
-                active_window = widget
-                break 
-
+        active_window = BlissWidget.get_top_level_widget()
         active_window.brickChangedSignal.connect(\
               self.application_brick_changed)
         active_window.tabChangedSignal.connect(\
@@ -618,6 +622,31 @@ class Qt4_InstanceListBrick(BlissWidget):
         Descript. :
         """
         if not master_sync or self.instance_server_hwobj is not None:
+            if method_name in Qt4_InstanceListBrick.COALESCED_METHODS:
+                # only the last value of a widget is sent
+                self.pending_brick_updates[(brick_name, widget_name)] = \
+                    (method_name, method_args, master_sync)
+                if not self.brick_update_timer.isActive():
+                    self.brick_update_timer.start(\
+                         Qt4_InstanceListBrick.BRICK_UPDATE_INTERVAL)
+            else:
+                # keep the order of updates
+                self.flush_brick_updates()
+                brick_event = AppBrickEvent(brick_name,
+                                            widget_name,
+                                            method_name,
+                                            method_args,
+                                            master_sync)
+                QApplication.postEvent(self, brick_event)
+
+    def flush_brick_updates(self):
+        """
+        Descript. : Posts coalesced brick updates
+        """
+        self.brick_update_timer.stop()
+        while self.pending_brick_updates:
+            (brick_name, widget_name), (method_name, method_args, \
+                master_sync) = self.pending_brick_updates.popitem(last=False)
             brick_event = AppBrickEvent(brick_name,
                                         widget_name,
                                         method_name,
@@ -85,28 +85,58 @@ class Qt4_LogBarBrick(BlissWidget):
             BlissWidget.propertyChanged(self, property_name, old_value, new_value)
 
     def customEvent(self, event):
-        """Event to add a new log record"""
-        self.append_log_record(event.record)
+        """Event to add a new log record or a batch of log records"""
+        if isinstance(event, Qt4_GUILogHandler.LogBatchEvent):
+            self.append_log_records(event.records)
+        else:
+            self.append_log_record(event.record)
 
     def append_log_record(self, record):
         """Appends a new log line to the text edit
         """
-        if self.isRunning() and record.name in ('user_level_log', 'GUI'):
+        self.append_log_records([record])
+
+    def append_log_records(self, records):
+        """Appends a list of log records to the text edit with one
+           repaint and one trim of the document
+        """
+        if not self.isRunning():
+            return
+
+        html_lines = []
+        toggle_color = False
+        for record in records:
+            if record.name not in ('user_level_log', 'GUI'):
+                continue
             msg = record.getMessage()#.replace('\n',' ').strip()
             level = record.getLevel()
             color = Qt4_LogBarBrick.COLORS[level]
             date_time = "%s %s" % (record.getDate(), record.getTime())
-
-            self._status_bar_widget.text_edit.\
-                append("<font color=%s>[%s]" % (color, date_time) + \
-                           " "*5 + "<b>%s</b></font>" % msg)
-
+            html_lines.append("<font color=%s>[%s]" % (color, date_time) + \
+                              " "*5 + "<b>%s</b></font>" % msg)
             if level == logging.WARNING or level == logging.ERROR:
-                self._status_bar_widget.toggle_background_color()
-            text_document = self._status_bar_widget.text_edit.document()
-            if self.max_log_lines > -1 and \
-               text_document.blockCount() > self.max_log_lines:
-                cursor = QTextCursor(text_document.firstBlock())
-                cursor.select(QTextCursor.BlockUnderCursor)
-                cursor.removeSelectedText()
-                cursor.deleteChar()
+                toggle_color = True
+
+        if not html_lines:
+            return
+
+        if self.max_log_lines > 0:
+            html_lines = html_lines[-self.max_log_lines:]
+
+        text_edit = self._status_bar_widget.text_edit
+        text_edit.setUpdatesEnabled(False)
+        for html_line in html_lines:
+            text_edit.append(html_line)
+        text_edit.setUpdatesEnabled(True)
+
+        if toggle_color:
+            self._status_bar_widget.toggle_background_color()
+        text_document = text_edit.document()
+        if self.max_log_lines > -1 and \
+           text_document.blockCount() > self.max_log_lines:
+            cursor = QTextCursor(text_document.firstBlock())
+            cursor.movePosition(QTextCursor.NextBlock,
+                                QTextCursor.KeepAnchor,
+                                text_document.blockCount() - \
+                                self.max_log_lines)
+            cursor.removeSelectedText()
@@ -100,22 +100,39 @@ class CustomTreeWidget(QTreeWidget):
         self.clipboard = QApplication.clipboard()
  
     def add_log_line(self, record):
-        msg = record.getMessage().replace('\n', ' ').strip()
-        info_str_list = []
-
-        info_str_list.append(record.getLevelName())
-        info_str_list.append(record.getDate())
-        info_str_list.append(record.getTime())
-        info_str_list.append(record.getMessage())
-        new_item = QTreeWidgetItem(info_str_list)
-        self.addTopLevelItem(new_item)
-        if self.topLevelItemCount() % 10 == 0:
-            for col in range(4):
-                new_item.setBackground(col, QBrush(Qt4_widget_colors.LIGHT_2_GRAY))
-              
+        self.add_log_lines([record])
+
+    def add_log_lines(self, records):
+        """Adds a list of records with one scroll and one trim of the list
+        """
+        if self.max_log_lines and self.max_log_lines > 0:
+            records = records[-self.max_log_lines:]
+
+        new_items = []
+        item_count = self.topLevelItemCount()
+        for record in records:
+            info_str_list = []
+
+            info_str_list.append(record.getLevelName())
+            info_str_list.append(record.getDate())
+            info_str_list.append(record.getTime())
+            info_str_list.append(record.getMessage())
+            new_item = QTreeWidgetItem(info_str_list)
+            item_count += 1
+            if item_count % 10 == 0:
+                for col in range(4):
+                    new_item.setBackground(col, QBrush(Qt4_widget_colors.LIGHT_2_GRAY))
+            new_items.append(new_item)
+
+        if not new_items:
+            return
+
+        self.setUpdatesEnabled(False)
+        self.addTopLevelItems(new_items)
         if self.max_log_lines and self.max_log_lines > 0:
-            if self.topLevelItemCount() > self.max_log_lines:
-                self.takeTopLevelItem(0) 
+            for index in range(self.topLevelItemCount() - self.max_log_lines):
+                self.takeTopLevelItem(0)
+        self.setUpdatesEnabled(True)
         self.scrollToBottom()
 
     def set_max_log_lines(self, max_log_lines):
@@ -359,29 +376,38 @@ class Qt4_LogViewBrick(BlissWidget):
                 self.resetUnreadMessagesSignal.emit(True)
 
     def append_log_record(self, record):
-        rec_level = record.getLevel()
-
-        if rec_level == logging.DEBUG and not self['showDebug']:
-            return
-        else:
-            if rec_level < self.filter_level:
-                return
-
-        tab = self.tab_levels[rec_level]
-        level = None
-        tab.add_log_line(record)
-
-        if self["appearance"] == "tabs":
-            if self.tab_widget.currentWidget() != tab:
-                if self["autoSwitchTabs"]:
-                    self.tab_widget.setCurrentWidget(tab)
-                else:
-                    tab.unread_messages += 1
-                    tab_label = "%s (%d)" % (tab.tab_label, tab.unread_messages)
-                    self.tab_widget.setTabText(self.tab_widget.indexOf(tab), tab_label)
-        elif self["appearance"] == "list":
-            self.incUnreadMessagesSignal.emit(1, True)
-
+        self.append_log_records([record])
+
+    def append_log_records(self, records):
+        """Sorts records by tab and adds them with one call per tab
+        """
+        tab_records = {}
+        for record in records:
+            rec_level = record.getLevel()
+
+            if rec_level == logging.DEBUG and not self['showDebug']:
+                continue
+            elif rec_level < self.filter_level:
+                continue
+
+            tab = self.tab_levels[rec_level]
+            if tab not in tab_records:
+                tab_records[tab] = []
+            tab_records[tab].append(record)
+
+        for tab, records in tab_records.items():
+            tab.add_log_lines(records)
+
+            if self["appearance"] == "tabs":
+                if self.tab_widget.currentWidget() != tab:
+                    if self["autoSwitchTabs"]:
+                        self.tab_widget.setCurrentWidget(tab)
+                    else:
+                        tab.unread_messages += len(records)
+                        tab_label = "%s (%d)" % (tab.tab_label, tab.unread_messages)
+                        self.tab_widget.setTabText(self.tab_widget.indexOf(tab), tab_label)
+            elif self["appearance"] == "list":
+                self.incUnreadMessagesSignal.emit(len(records), True)
 
     def resetUnreadMessages(self, tab_index):
         selected_tab = self.tab_widget.widget(tab_index)
@@ -391,7 +417,10 @@ class Qt4_LogViewBrick(BlissWidget):
                           
     def customEvent(self, event):
         if self.isRunning():
-            self.append_log_record(event.record)
+            if isinstance(event, Qt4_GUILogHandler.LogBatchEvent):
+                self.append_log_records(event.records)
+            else:
+                self.append_log_record(event.record)
 
     def blockSignals(self, block):
         pass
@@ -23,12 +23,14 @@ __category__ = "General"
 
 
 import os
+import re
 from QtImport import *
 
 from widgets.Qt4_matplot_widget import TwoAxisPlotWidget
 
 from BlissFramework import Qt4_Icons
 from BlissFramework.Utils import Qt4_widget_colors
+from BlissFramework.Utils.TimeSeriesHistory import TimeSeriesHistory
 from BlissFramework.Qt4_BaseComponents import BlissWidget
 
 
@@ -67,6 +69,10 @@ class Qt4_MachineInfoBrick(BlissWidget):
                          'boolean',
                          True,
                          comment="Display information about disk size")
+        self.addProperty('saveHistory',
+                         'boolean',
+                         True,
+                         comment="Save history in the user file directory")
 
         # Properties for hwobj initialization ---------------------------------
         self.addProperty('hwobj_mach_info', 'string', '')
@@ -117,7 +123,8 @@ class Qt4_MachineInfoBrick(BlissWidget):
         if self.graphics_initialized is None:
             for item in values_list:
                 temp_widget = CustomInfoWidget(self)
-                temp_widget.init_info(item, self['maxPlotPoints'])
+                temp_widget.init_info(item, self['maxPlotPoints'],
+                                      self.get_history_filename(item))
                 self.value_label_list.append(temp_widget)
                 self.main_vlayout.addWidget(temp_widget)
             if self['showDiskSize']:
@@ -129,6 +136,22 @@ class Qt4_MachineInfoBrick(BlissWidget):
         for index, value in enumerate(values_list):
             self.value_label_list[index].update_info(value)
 
+    def get_history_filename(self, info_dict):
+        """Returns history file of a value or None"""
+
+        user_file_directory = getattr(BlissWidget, "user_file_directory", None)
+        if not self['saveHistory'] or not user_file_directory:
+            return None
+        name = re.sub(r"\W+", "_", str(info_dict.get("title", ""))).strip("_")
+        return os.path.join(user_file_directory,
+                            "machine_info_%s.dat" % name.lower())
+
+    def stop(self):
+        """Closes history files"""
+
+        for info_widget in self.value_label_list:
+            info_widget.close_history()
+
     def sizeof_fmt(self, num):
         """Returns disk space formated in string"""
 
@@ -186,6 +209,7 @@ class CustomInfoWidget(QWidget):
         QWidget.__init__(self, *args)
 
         self.value_plot = None
+        self.history = None
 
         self.title_label = QLabel(self)
         self.value_widget = QWidget(self)
@@ -211,7 +235,7 @@ class CustomInfoWidget(QWidget):
 
         self.history_button.clicked.connect(self.open_history_view)
 
-    def init_info(self, info_dict, max_plot_points=None):
+    def init_info(self, info_dict, max_plot_points=None, history_filename=None):
         self.title_label.setText(info_dict.get("title", "???"))
         self.history_button.setVisible(info_dict.get("history", False))
         font = self.value_label.font()
@@ -237,8 +261,12 @@ class CustomInfoWidget(QWidget):
             self.main_vlayout.addWidget(self.value_plot)
             self.value_plot.set_tight_layout()
             self.value_plot.clear()
-            self.value_plot.set_max_plot_point(max_plot_points)
             #self.value_plot.set_y_axis_limits([0, None])
+            # Values are recorded in the history, the hidden plot is
+            # drawn from it when shown
+            self.history = TimeSeriesHistory(max_plot_points or 100,
+                                             history_filename)
+            self.value_plot.set_realtime_buffer(self.history.buffer)
         self.update_info(info_dict)
 
     def update_info(self, info_dict):
@@ -257,8 +285,13 @@ class CustomInfoWidget(QWidget):
             Qt4_widget_colors.set_widget_color(self.value_label,
                                                Qt4_widget_colors.LIGHT_RED)
         value = info_dict.get('value')
-        if type(value) in (int, float) and self.value_plot:
-            self.value_plot.add_new_plot_value(value)
+        if type(value) in (int, float) and self.history is not None:
+            self.history.append(value)
+            self.value_plot.update_realtime_plot()
 
     def open_history_view(self):
         self.value_plot.setVisible(not self.value_plot.isVisible())
+
+    def close_history(self):
+        if self.history is not None:
+            self.history.close()
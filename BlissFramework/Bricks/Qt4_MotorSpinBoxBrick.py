@@ -90,6 +90,8 @@ class Qt4_MotorSpinBoxBrick(BlissWidget):
         self.addProperty('hideInUser', 'boolean', False)
         self.addProperty('defaultSteps', 'string', '180 90 45 30 10')
         self.addProperty('enableSliderTracking', 'boolean', False)
+        # max number of position updates per second, 0 updates on every event
+        self.addProperty('positionUpdateRate', 'integer', 25)
 
         # Signals ------------------------------------------------------------
 
@@ -629,15 +631,15 @@ class Qt4_MotorSpinBoxBrick(BlissWidget):
         Return.   : 
         """
         if self.motor_hwobj is not None:
-            self.disconnect(self.motor_hwobj, 
-                            'limitsChanged',
-                            self.limits_changed)
-            self.disconnect(self.motor_hwobj,
-                            'positionChanged', 
-                            self.position_changed)
-            self.disconnect(self.motor_hwobj,
-                            'stateChanged',
-                            self.state_changed)
+            self.disconnect_hwobj(self.motor_hwobj,
+                                  'limitsChanged',
+                                  self.limits_changed)
+            self.disconnect_hwobj(self.motor_hwobj,
+                                  'positionChanged',
+                                  self.position_changed)
+            self.disconnect_hwobj(self.motor_hwobj,
+                                  'stateChanged',
+                                  self.state_changed)
 
         if motor_ho_name is not None:
             self.motor_hwobj = self.getHardwareObject(motor_ho_name)
@@ -660,7 +662,8 @@ class Qt4_MotorSpinBoxBrick(BlissWidget):
             self.connect(self.motor_hwobj,
                          'positionChanged',
                          self.position_changed,
-                         instanceFilter=True)
+                         instanceFilter=True,
+                         max_rate=self['positionUpdateRate'])
             self.connect(self.motor_hwobj,
                          'stateChanged',
                          self.state_changed,
@@ -752,6 +755,9 @@ class Qt4_MotorSpinBoxBrick(BlissWidget):
             self.position_slider.setVisible(new_value)
         elif property_name == 'enableSliderTracking':
             self.position_slider.setTracking(new_value)  
+        elif property_name == 'positionUpdateRate':
+            if self.motor_hwobj is not None:
+                self.set_motor(self.motor_hwobj, self['mnemonic'])
         else:
             BlissWidget.propertyChanged(self, property_name, old_value, new_value)
 
@@ -56,12 +56,16 @@ class VialView(QWidget):
         self.vial_code = ""
 
     def set_vial(self, vial_state):
-        """Sets vial state"""
-        self.vial_state = vial_state[0]
+        """Sets vial state. Repaints only if the state has changed"""
+        state = vial_state[0]
         try:
-            self.vial_code = vial_state[1]
+            code = vial_state[1]
         except:
-            self.vial_code = ""
+            code = ""
+        if state == self.vial_state and code == self.vial_code:
+            return
+        self.vial_state = state
+        self.vial_code = code
         self.setEnabled(self.vial_state != VialView.VIAL_NONE)
         self.setToolTip(self.vial_code)
         self.update()
@@ -167,22 +171,32 @@ class SamplesView(QWidget):
     loadSampleSignal = pyqtSignal(int, int)
     selectSampleSignal = pyqtSignal(int, int)
 
-    def __init__(self, parent, basket_index):
+    def __init__(self, parent, basket_index, sample_count=SAMPLE_COUNT):
         QWidget.__init__(self, parent)
 
         self.basket_index = basket_index
         self.vials = []
         self.numbers = []
         self.sample_boxes = []
+        self.sample_count = 0
         self.loaded_vial = None
         self.current_location = None
         self.standard_color = None
 
-        _main_hlayout = QHBoxLayout(self)
-        _main_hlayout.setSpacing(0)
-        _main_hlayout.setContentsMargins(0, 0, 0, 0)
+        self._main_hlayout = QHBoxLayout(self)
+        self._main_hlayout.setSpacing(0)
+        self._main_hlayout.setContentsMargins(0, 0, 0, 0)
+
+        self.set_sample_count(sample_count)
+
+        self.setSizePolicy(QSizePolicy.MinimumExpanding,
+                           QSizePolicy.Fixed)
 
-        for index in range(SamplesView.SAMPLE_COUNT):
+    def set_sample_count(self, sample_count):
+        """Sets the number of vials (puck geometry). Missing vial
+           views are created, unused ones are hidden
+        """
+        for index in range(len(self.vials), sample_count):
             sample_box = SampleBox(self)
             label = VialNumberView(index + 1, sample_box)
             label.set_vial([VialView.VIAL_UNKNOWN])
@@ -195,7 +209,7 @@ class SamplesView(QWidget):
 
             sample_box.layout().addWidget(label)
             sample_box.layout().addWidget(vial_view)
-            _main_hlayout.addWidget(sample_box)
+            self._main_hlayout.addWidget(sample_box)
             self.sample_boxes.append(sample_box)
 
             label.singleClickSignal.connect(self.user_select_this_sample)
@@ -204,8 +218,12 @@ class SamplesView(QWidget):
             label.doubleClickSignal.connect(self.load_sample)
             vial_view.doubleClickSignal.connect(self.load_sample)
 
-        self.setSizePolicy(QSizePolicy.MinimumExpanding,
-                           QSizePolicy.Fixed)
+        for index, sample_box in enumerate(self.sample_boxes):
+            sample_box.setVisible(index < sample_count)
+        self.sample_count = sample_count
+
+    def get_sample_count(self):
+        return self.sample_count
 
     def load_sample(self, vial_index):
         """Loads sample"""
@@ -233,15 +251,18 @@ class SamplesView(QWidget):
             number.set_vial([VialView.VIAL_UNKNOWN])
 
     def set_matrices(self, vial_states):
-        index = 0
-        for vial in self.vials:
+        for index in range(self.sample_count):
             try:
                 state = vial_states[index]
             except IndexError:
                 state = [VialView.VIAL_UNKNOWN]
-            vial.set_vial(state)
-            self.numbers[index].set_vial(state)
-            index += 1
+            self.set_vial(index, state)
+
+    def set_vial(self, vial_index, vial_state):
+        """Sets state of one vial (index starts from 0)"""
+        if vial_index < len(self.vials):
+            self.vials[vial_index].set_vial(vial_state)
+            self.numbers[vial_index].set_vial(vial_state)
 
     def set_current_vial(self, location=None):
         if self.standard_color is None:
@@ -260,7 +281,8 @@ class BasketView(QWidget):
     selectSampleSignal = pyqtSignal(int, int)
     basketPresenceSignal = pyqtSignal(int, bool)
 
-    def __init__(self, parent, basket_index):
+    def __init__(self, parent, basket_index,
+                 sample_count=SamplesView.SAMPLE_COUNT):
         QWidget.__init__(self, parent)
 
         self.basket_index = basket_index
@@ -268,7 +290,8 @@ class BasketView(QWidget):
         #self.contents_widget = QVGroupBox("Basket %s" % basket_index,self)
         self.contents_widget = QGroupBox("Basket %s" % basket_index, self)
         self.contents_widget.setCheckable(True)
-        self.samples_view = SamplesView(self.contents_widget, basket_index)
+        self.samples_view = SamplesView(self.contents_widget, basket_index,
+                                        sample_count)
 
         _contents_widget_vlayout = QVBoxLayout(self.contents_widget)
         _contents_widget_vlayout.addWidget(self.samples_view)
@@ -298,6 +321,15 @@ class BasketView(QWidget):
     def set_matrices(self, vial_states):
         self.samples_view.set_matrices(vial_states)
 
+    def set_vial(self, vial_index, vial_state):
+        self.samples_view.set_vial(vial_index, vial_state)
+
+    def set_sample_count(self, sample_count):
+        self.samples_view.set_sample_count(sample_count)
+
+    def get_sample_count(self):
+        return self.samples_view.get_sample_count()
+
     """
     def setLoadedVial(self,vial_index=None):
         self.samples_view.setLoadedVial(vial_index)
@@ -835,6 +867,10 @@ class Qt4_SampleChangerBrick3(BlissWidget):
         self.single_click_selection = False
         self.user_selected_sample = (None, None)
 
+        # (basket index, vial index) -> (vial state, code) as displayed
+        self.vial_states = {}
+        self.info_update_pending = False
+
         self.contents_widget = QWidget(self)
         self.status = self.build_status_view(self.contents_widget)
         self.switch_to_sample_transfer_button = QPushButton(\
@@ -1152,6 +1188,7 @@ class Qt4_SampleChangerBrick3(BlissWidget):
             self.sampleUnloadSuccess, self.sampleUnloadFail, wait=False)
 
     def clear_matrices(self):
+        self.vial_states = {}
         for basket in self.baskets:
             basket.clear_matrices()
         self.scanBasketUpdateSignal.emit()
@@ -1182,40 +1219,79 @@ class Qt4_SampleChangerBrick3(BlissWidget):
              recursive=True, wait=False)
 
     def infoChanged(self):
-        baskets_at_sc = self.sample_changer_hwobj.getComponents()
-        presences = []
-        for basket in baskets_at_sc:
-            presences.append([[VialView.VIAL_UNKNOWN]] * 10 if \
-               basket.isPresent() else [[VialView.VIAL_NONE]] * 10)
+        """Schedules an update of the vial states. A burst of info
+           changes (basket scan) is handled once in the next event loop
+        """
+        if not self.info_update_pending:
+            self.info_update_pending = True
+            QTimer.singleShot(0, self.update_vial_states)
+
+    def get_vial_states(self):
+        """Returns dict (basket index, vial index) -> (vial state, code)
+           read from the sample changer
+        """
+        vial_states = {}
+        for basket in self.sample_changer_hwobj.getComponents():
+            basket_index = basket.getIndex()
+            if basket_index >= self.basket_count or \
+               basket_index >= len(self.baskets):
+                continue
+            sample_count = len(basket.getComponents())
+            if sample_count and \
+               self.baskets[basket_index].get_sample_count() != sample_count:
+                self.baskets[basket_index].set_sample_count(sample_count)
+                self.current_sample_view.selected_spinbox.setMaximum(\
+                    max(sample_count,
+                        self.current_sample_view.selected_spinbox.maximum()))
+            state = VialView.VIAL_UNKNOWN if basket.isPresent() \
+                    else VialView.VIAL_NONE
+            for vial_index in range(self.baskets[basket_index].\
+                                    get_sample_count()):
+                vial_states[(basket_index, vial_index)] = (state, "")
 
         for sample in self.sample_changer_hwobj.getSampleList():
             matrix = sample.getID() or ""
-            basket_index = sample.getContainer().getIndex()
-            vial_index = sample.getIndex()
-            basket_code = sample.getContainer().getID()
-            if sample.isPresent():
+            location = (sample.getContainer().getIndex(), sample.getIndex())
+            if location not in vial_states:
+                continue
+            if sample.isLoaded():
+                vial_states[location] = (VialView.VIAL_AXIS, matrix)
+            elif sample.isPresent():
                 if matrix:
                     if sample.hasBeenLoaded():
-                        presences[basket_index][vial_index] = \
-                            [VialView.VIAL_ALREADY_LOADED, matrix]
+                        vial_states[location] = \
+                            (VialView.VIAL_ALREADY_LOADED, matrix)
                     else:
-                        presences[basket_index][vial_index] = \
-                            [VialView.VIAL_BARCODE, matrix]
+                        vial_states[location] = \
+                            (VialView.VIAL_BARCODE, matrix)
                 else:
                     if sample.hasBeenLoaded():
-                        presences[basket_index][vial_index] = \
-                           [VialView.VIAL_NOBARCODE_LOADED, matrix]
+                        vial_states[location] = \
+                           (VialView.VIAL_NOBARCODE_LOADED, matrix)
                     else:
-                        presences[basket_index][vial_index] = \
-                           [VialView.VIAL_NOBARCODE, matrix]
+                        vial_states[location] = \
+                           (VialView.VIAL_NOBARCODE, matrix)
             else:
-                presences[basket_index][vial_index] = [VialView.VIAL_NONE, ""]
-            if sample.isLoaded():
-                presences[basket_index][vial_index] = [VialView.VIAL_AXIS, matrix]
+                vial_states[location] = (VialView.VIAL_NONE, "")
+        return vial_states
+
+    def update_vial_states(self):
+        """Compares vial states with the displayed ones and updates
+           only the changed vial views
+        """
+        self.info_update_pending = False
+        if self.sample_changer_hwobj is None:
+            return
 
-        for basket_index in range(self.basket_count):
-            presence = presences[basket_index]
-            self.baskets[basket_index].set_matrices(presence)
+        vial_states = self.get_vial_states()
+        unknown_state = (VialView.VIAL_UNKNOWN, "")
+        for location, vial_state in vial_states.iteritems():
+            if self.vial_states.get(location, unknown_state) != vial_state:
+                self.baskets[location[0]].set_vial(location[1], vial_state)
+        for location in self.vial_states:
+            if location not in vial_states:
+                self.baskets[location[0]].set_vial(location[1], unknown_state)
+        self.vial_states = vial_states
 
     def select_baskets_samples(self):
         retval = self.basketsSamplesSelectionDialog.exec_loop()
@@ -18,14 +18,19 @@
 #  along with MXCuBE.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import time
 import logging
 from collections import namedtuple
 
+import gevent
+
 from QtImport import *
 
 import Qt4_queue_item
 from BlissFramework import Qt4_Icons
 from BlissFramework.Utils import Qt4_widget_colors
+from BlissFramework.Utils.LimsSampleCache import LimsSampleCache, \
+     get_sample_hash
 from BlissFramework.Qt4_BaseComponents import BlissWidget
 from Qt4_sample_changer_helper import SC_STATE_COLOR, SampleChanger
 from widgets.Qt4_dc_tree_widget import DataCollectTree
@@ -37,6 +42,11 @@ __version__ = "2.3"
 __category__ = "General"
 
 
+# Delay in ms between the last key press in the filter line edit
+# and the filtering of the tree
+FILTER_DELAY = 200
+
+
 #ViewType = namedtuple('ViewType', ['ISPYB', 'MANUAL', 'SC'])
 #TREE_VIEW_TYPE = ViewType(0, 1, 2)
 
@@ -96,6 +106,22 @@ class Qt4_TreeBrick(BlissWidget):
         self.current_queue_entry = None
         self.lims_samples = None
         self.filtered_lims_samples = None
+        self.lims_sample_cache = LimsSampleCache()
+        self.lims_refresh_greenlet = None
+        # session, mount method and tree generation of the tree populated
+        # with LIMS samples and hash of the LIMS sample per location
+        self.lims_tree_key = None
+        self.lims_tree_signatures = {}
+        self.queue_autosave_interval = 5
+        self.queue_autosave_greenlet = None
+        self.queue_changed = False
+        self.queue_save_metrics = {"requests": 0,
+                                   "saves": 0,
+                                   "last_latency": 0,
+                                   "max_latency": 0,
+                                   "total_latency": 0,
+                                   "last_bytes": 0,
+                                   "total_bytes": 0}
 
         # Properties ---------------------------------------------------------- 
         self.addProperty("queue", "string", "/queue")
@@ -109,8 +135,10 @@ class Qt4_TreeBrick(BlissWidget):
         self.addProperty("scTwoName", "string", "Plate")
         self.addProperty("usePlateNavigator", "boolean", False)
         self.addProperty("useHistoryView", "boolean", True)
+        self.addProperty("limsCacheTTL", "integer", 300)
         self.addProperty("useCentringMethods", "boolean", True)
         self.addProperty("enableQueueAutoSave", "boolean", True)
+        self.addProperty("queueAutoSaveInterval", "float", 5.0)
 
         # Properties to initialize hardware objects --------------------------
         self.addProperty("hwobj_state_machine", "string", "")
@@ -192,6 +220,9 @@ class Qt4_TreeBrick(BlissWidget):
              self.filter_combo_changed)
         self.sample_changer_widget.filter_ledit.textChanged.connect(\
              self.filter_text_changed)
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.timeout.connect(self.apply_filter)
         self.sample_changer_widget.sample_combo.activated.connect(\
              self.sample_combo_changed)
 
@@ -385,6 +416,10 @@ class Qt4_TreeBrick(BlissWidget):
                              self.open_xmlrpc_dialog)
         elif property_name == 'hwobj_state_machine':
               self.state_machine_hwobj = self.getHardwareObject(new_value, optional=True)
+        elif property_name == 'queueAutoSaveInterval':
+            self.queue_autosave_interval = new_value
+        elif property_name == 'limsCacheTTL':
+            self.lims_sample_cache.ttl = new_value
         elif property_name == 'redis_client':
               self.redis_client_hwobj = self.getHardwareObject(new_value, optional=True)
         elif property_name == 'scOneName':
@@ -584,22 +619,58 @@ class Qt4_TreeBrick(BlissWidget):
     def refresh_sample_list(self):
         """
         Retrives sample information from ISPyB and populates the sample list
-        accordingly.
+        accordingly. Samples are fetched and matched with the sample changer
+        content in a greenlet. Samples of the session cached for less than
+        limsCacheTTL seconds are shown straight away. The fetched samples
+        are always matched again with the sample changer content, that
+        may have changed even if the LIMS samples did not, and only the
+        samples that have changed are updated.
         """
-        lims_client = self.lims_hwobj
-        log = logging.getLogger("user_level_log") 
+        session_key = (self.session_hwobj.proposal_id,
+                       self.session_hwobj.session_id)
 
-        self.lims_samples = lims_client.get_samples(\
-             self.session_hwobj.proposal_id,
-             self.session_hwobj.session_id)
+        cached_samples = self.lims_sample_cache.get(session_key)
+        if cached_samples is not None and \
+           self.lims_tree_key != self.get_lims_tree_key(session_key):
+            self.apply_lims_samples(session_key, cached_samples)
 
-        basket_list = []
-        sample_list = []        
-        self.filtered_lims_samples = [] 
-        sample_changer = None
+        if self.lims_refresh_greenlet is not None:
+            self.lims_refresh_greenlet.kill(block=False)
+        self.lims_refresh_greenlet = gevent.spawn(self.fetch_lims_samples,
+                                                  session_key)
+
+    def get_lims_tree_key(self, session_key):
+        """
+        Descript. : Returns the key of the tree populated with the samples
+                    of a session. The tree generation changes when the
+                    tree is cleared
+        """
+        return (session_key, self.dc_tree_widget.sample_mount_method,
+                self.dc_tree_widget.tree_generation)
+
+    def fetch_lims_samples(self, session_key):
+        """
+        Descript. : Gets the samples of a session from LIMS and applies
+                    them to the tree
+        """
+        try:
+            lims_samples = self.lims_hwobj.get_samples(*session_key) or []
+        except:
+            logging.getLogger("user_level_log").\
+                exception("Unable to get the samples from LIMS")
+            self.lims_refresh_greenlet = None
+            return
 
+        self.lims_sample_cache.put(session_key, lims_samples)
+        self.lims_refresh_greenlet = None
+        self.apply_lims_samples(session_key, lims_samples)
+
+    def update_lims_sample_combo(self):
+        """
+        Descript. : Lists the LIMS samples with a sample changer location
+        """
+        self.filtered_lims_samples = []
         self.sample_changer_widget.sample_combo.clear()
-        log.debug("LIMS samples: %s" % self.lims_samples)
         for sample in self.lims_samples:
             if sample.containerSampleChangerLocation:
                 self.filtered_lims_samples.append(sample)
@@ -611,68 +682,134 @@ class Qt4_TreeBrick(BlissWidget):
         self.sample_changer_widget.sample_label.setEnabled(True)
         self.sample_changer_widget.sample_combo.setEnabled(True)
         self.sample_changer_widget.sample_combo.setCurrentIndex(-1)
-                 
+
+    def apply_lims_samples(self, session_key, lims_samples):
+        """
+        Descript. : Shows LIMS samples. If the tree already shows samples of
+                    the session at the same locations only the changed
+                    samples are updated, otherwise the tree is populated
+        """
+        log = logging.getLogger("user_level_log")
+        self.lims_samples = lims_samples
+        log.debug("LIMS samples: %s" % self.lims_samples)
+        self.update_lims_sample_combo()
+
+        sample_changer = None
         if self.dc_tree_widget.sample_mount_method == 1:
             sample_changer = self.sample_changer_hwobj
         elif self.dc_tree_widget.sample_mount_method == 2:
             sample_changer = self.plate_manipulator_hwobj
-     
-        if self.lims_samples and sample_changer is not None:
-            (barcode_samples, location_samples) = \
-             self.dc_tree_widget.samples_from_lims(self.lims_samples)
-            sc_basket_content, sc_sample_content = self.get_sc_content()
-            sc_basket_list, sc_sample_list = self.dc_tree_widget.\
-              samples_from_sc_content(sc_basket_content, sc_sample_content)
-
-            basket_list = sc_basket_list
+
+        if not self.lims_samples or sample_changer is None:
+            return
+
+        basket_list, matched_samples = self.match_lims_samples(lims_samples)
+        # the barcode read by the sample changer is part of the signature,
+        # a new sample at a location is shown even if LIMS has not changed
+        signatures = {}
+        for sample, lims_sample in matched_samples:
+            if lims_sample is not None:
+                signatures[sample.location] = (get_sample_hash(lims_sample),
+                                               sample.code)
+            else:
+                signatures[sample.location] = (None, sample.code)
+
+        if self.lims_tree_key == self.get_lims_tree_key(session_key) and \
+           set(signatures) == set(self.lims_tree_signatures):
+            changed_samples = [(sample, lims_sample) for sample, lims_sample \
+                               in matched_samples if signatures[sample.location] \
+                               != self.lims_tree_signatures[sample.location]]
+            if self.update_changed_samples(changed_samples):
+                log.debug("LIMS samples: %d changed samples updated" % \
+                          len(changed_samples))
+                self.lims_tree_signatures = signatures
+                return
+
+        self.dc_tree_widget.populate_tree_widget(basket_list, 
+             [sample for sample, lims_sample in matched_samples],
+             self.dc_tree_widget.sample_mount_method)
+        self.dc_tree_widget.de_select_items()
+        self.lims_tree_key = self.get_lims_tree_key(session_key)
+        self.lims_tree_signatures = signatures
+
+    def update_changed_samples(self, changed_samples):
+        """
+        Descript. : Updates the sample models and items of changed LIMS
+                    samples. Returns False if a sample can not be updated
+                    in place
+        """
+        location_items = {}
+        for item in self.dc_tree_widget.sample_item_index.values():
+            location_items[item.get_model().location] = item
+
+        for sample, lims_sample in changed_samples:
+            if lims_sample is None or sample.location not in location_items:
+                return False
+
+        for sample, lims_sample in changed_samples:
+            item = location_items[sample.location]
+            item.get_model().init_from_lims_object(lims_sample)
+            item.update_display_name()
+            self.dc_tree_widget.search_index.update(id(item.get_model()))
+        return True
+
+    def match_lims_samples(self, lims_samples):
+        """
+        Descript. : Matches LIMS samples with the sample changer content by
+                    barcode and then by location.
+        :returns: basket list and list of (sample, LIMS sample or None if
+                  the sample is only known by the sample changer)
+        """
+        log = logging.getLogger("user_level_log") 
+        lims_objects = {}
+        (barcode_samples, location_samples) = \
+         self.dc_tree_widget.samples_from_lims(lims_samples, lims_objects)
+        sc_basket_content, sc_sample_content = self.get_sc_content()
+        sc_basket_list, sc_sample_list = self.dc_tree_widget.\
+          samples_from_sc_content(sc_basket_content, sc_sample_content)
+
+        basket_list = sc_basket_list
+        sample_list = []
             
-            #self.queue_sync_action.setEnabled(True)
-            for sc_sample in sc_sample_list:
-                # Get the sample in lims with the barcode
-                # sc_sample.code
-                lims_sample = barcode_samples.get(sc_sample.code)
-                # There was a sample with that barcode
+        #self.queue_sync_action.setEnabled(True)
+        for sc_sample in sc_sample_list:
+            # Get the sample in lims with the barcode
+            # sc_sample.code
+            lims_sample = barcode_samples.get(sc_sample.code)
+            # There was a sample with that barcode
+            if lims_sample:
+                if lims_sample.lims_location == sc_sample.location:
+                    log.debug("Found sample in ISPyB for location %s" % \
+                              str(sc_sample.location))
+                    sample_list.append(lims_sample)
+                else:
+                    log.warning(("The sample with the barcode (%s) exists" + \
+                                 " in LIMS but the location does not mat"  + \
+                                 "ch. Sample changer location: %s, LIMS "  + \
+                                 "location %s") % (sc_sample.code,
+                                                   sc_sample.location,
+                                                   lims_sample.lims_location))
+                    sample_list.append(sc_sample)
+            else: # No sample with that barcode, continue with location
+                lims_sample = location_samples.get(sc_sample.location)
                 if lims_sample:
-                    if lims_sample.lims_location == sc_sample.location:
+                    if lims_sample.lims_code:
+                        log.warning("The sample has a barcode in LIMS, but " + \
+                                    "the SC has no barcode information for " + \
+                                    "this sample. For location: %s" % \
+                                    str(sc_sample.location))
+                        sample_list.append(lims_sample)
+                    else:
                         log.debug("Found sample in ISPyB for location %s" % \
                                   str(sc_sample.location))
                         sample_list.append(lims_sample)
-                    else:
-                        log.warning("The sample with the barcode (%s) exists" + \
-                                    " in LIMS but the location does not mat"  + \
-                                    "ch. Sample changer location: %s, LIMS "  + \
-                                    "location %s" % (sc_sample.code,
-                                                     sc_sample.location,
-                                                     lims_sample.lims_location))
-                        sample_list.append(sc_sample)
-                else: # No sample with that barcode, continue with location
-                    lims_sample = location_samples.get(sc_sample.location)
-                    if lims_sample:
-                        if lims_sample.lims_code:
-                            log.warning("The sample has a barcode in LIMS, but " + \
-                                        "the SC has no barcode information for " + \
-                                        "this sample. For location: %s" % \
-                                        str(sc_sample.location))
-                            sample_list.append(lims_sample)
-                        else:
-                            log.debug("Found sample in ISPyB for location %s" % \
-                                      str(sc_sample.location))
-                            sample_list.append(lims_sample)
-                    else:
-                        if lims_sample:
-                            if lims_sample.lims_location != None:
-                                log.warning("No barcode was provided in ISPyB " + \
-                                            "which makes it impossible to verify if" + \
-                                            "the locations are correct, assuming " + \
-                                            "that the positions are correct.")
-                                sample_list.append(lims_sample)
-                        else:
-                            log.warning("No sample in ISPyB for location %s" % \
-                                        str(sc_sample.location))
-                            sample_list.append(sc_sample)
-            self.dc_tree_widget.populate_tree_widget(basket_list, sample_list, 
-                 self.dc_tree_widget.sample_mount_method)
-            self.dc_tree_widget.de_select_items()
+                else:
+                    log.warning("No sample in ISPyB for location %s" % \
+                                str(sc_sample.location))
+                    sample_list.append(sc_sample)
+
+        return basket_list, [(sample, lims_objects.get(id(sample))) \
+                             for sample in sample_list]
 
     def sample_combo_changed(self, index):
         """
@@ -683,7 +820,7 @@ class Qt4_TreeBrick(BlissWidget):
         sample_model = root_model.get_children()[0]
 
         sample_model.init_from_lims_object(self.filtered_lims_samples[index])
-        self.dc_tree_widget.sample_tree_widget.clear()
+        self.dc_tree_widget.clear_sample_tree()
         self.dc_tree_widget.populate_free_pin(sample_model)
 
     def get_sc_content(self):
@@ -1112,90 +1249,24 @@ class Qt4_TreeBrick(BlissWidget):
         """
         self.sample_changer_widget.filter_ledit.setEnabled(\
              filter_index in (2, 3, 4))
-        self.clear_filter()
-        if filter_index > 0:
-            item_iterator = QTreeWidgetItemIterator(\
-                  self.dc_tree_widget.sample_tree_widget)
-            item = item_iterator.value()
-            while item:
-                  hide = False
-                  item_model = item.get_model()
-                  if filter_index == 1:
-                      hide = not item.has_star()
-                  elif filter_index == 5:
-                      if isinstance(item, Qt4_queue_item.DataCollectionQueueItem):
-                          hide = not item_model.is_executed()
-                  elif filter_index == 6:
-                      if isinstance(item, Qt4_queue_item.DataCollectionQueueItem):
-                          hide = item_model.is_executed()
-                  elif filter_index == 7:
-                      if isinstance(item, Qt4_queue_item.DataCollectionQueueItem):
-                          hide = item_model.is_helical()
-                      else:
-                          hide = True
-                  elif filter_index == 8:
-                      if isinstance(item, Qt4_queue_item.DataCollectionQueueItem):
-                          hide = not item_model.is_helical()
-                      else:
-                          hide = True
-                  elif filter_index == 9:
-                      hide = not isinstance(item, Qt4_queue_item.CharacterisationQueueItem)
-                  elif filter_index == 10:
-                      hide = not isinstance(item, Qt4_queue_item.EnergyScanQueueItem)
-                  elif filter_index == 11:
-                      hide = not isinstance(item, Qt4_queue_item.XRFSpectrumQueueItem)
-                  #elif filter_index == 11:
-                  #    hide = not isinstance(item, Qt4_queue_item.AdvancedQueueItem)
-                  if type(item) not in (Qt4_queue_item.TaskQueueItem,
-                                        Qt4_queue_item.SampleQueueItem,
-                                        Qt4_queue_item.BasketQueueItem,
-                                        Qt4_queue_item.DataCollectionGroupQueueItem):
-                      item.set_hidden(hide)
-                  item_iterator += 1
-                  item = item_iterator.value()
-
-        self.dc_tree_widget.hide_empty_baskets()     
+        self.filter_timer.stop()
+        self.apply_filter()
 
     def filter_text_changed(self, new_text):
-        item_iterator = QTreeWidgetItemIterator(\
-             self.dc_tree_widget.sample_tree_widget) 
-        item = item_iterator.value()
+        """Filtering is delayed until typing pauses"""
+        self.filter_timer.start(FILTER_DELAY)
+
+    def apply_filter(self):
+        """Applies the selected filter using the tree search index"""
         filter_index = self.sample_changer_widget.filter_combo.currentIndex()
+        if filter_index in (2, 3, 4):
+            filter_text = self.sample_changer_widget.filter_ledit.text()
+        else:
+            filter_text = ""
+        self.dc_tree_widget.filter_items(filter_index, filter_text)
 
-        while item:
-              hide = False
-              new_text = str(new_text)
-              if filter_index == 2:
-                  if isinstance(item, Qt4_queue_item.SampleQueueItem):
-                      hide = not new_text in item.text(0)
-              elif filter_index == 3:
-                  if isinstance(item, Qt4_queue_item.SampleQueueItem):
-                      hide = not new_text in item.get_model().crystals[0].protein_acronym
-              elif filter_index == 4:
-                  if isinstance(item, Qt4_queue_item.BasketQueueItem):
-                      if new_text.isdigit(): 
-                          # Display one basket
-                          hide = int(new_text) != item.get_model().location[0]
-                      else: 
-                          # Display several baskets. Separated with ","
-                          enable_baskat_list = new_text.split(',')
-                          if len(enable_baskat_list) > 1:
-                              hide = item.get_model().location[0] not in enable_baskat_list
-              item.set_hidden(hide) 
-              item_iterator += 1
-              item = item_iterator.value()
-
-        if filter_index != 3:
-            self.dc_tree_widget.hide_empty_baskets()
-        
     def clear_filter(self):
-        item_iterator = QTreeWidgetItemIterator(\
-             self.dc_tree_widget.sample_tree_widget)
-        item = item_iterator.value()
-        while item:
-              item.set_hidden(False)
-              item_iterator += 1
-              item = item_iterator.value() 
+        self.dc_tree_widget.filter_items(0)
 
     def diffractometer_phase_changed(self, phase):
         if self.enable_collect_conditions.get("diffractometer") != (phase != "BeamLocation"):
@@ -1246,21 +1317,79 @@ class Qt4_TreeBrick(BlissWidget):
         self.dc_tree_widget.enable_collect_condition = enable_collect
         self.dc_tree_widget.toggle_collect_button_enabled()
 
+    # Framework 2 method
+    def stop(self):
+        """Saves pending queue changes before exit"""
+        self.flush_queue_autosave()
+
     def save_queue(self):
         """Saves queue in the file"""
         if self.redis_client_hwobj is not None:
-            self.redis_client_hwobj.save_queue()
+            self.cancel_queue_autosave()
+            self.queue_changed = False
+            self.do_save_queue()
         #else:
         #    self.dc_tree_widget.save_queue()
 
     def auto_save_queue(self):
-        """Saves queue in the file"""
+        """Marks the queue as changed. The whole queue is saved by a
+           greenlet at most once per queueAutoSaveInterval seconds
+        """
         if self.queue_autosave_action.isChecked():
             if self.redis_client_hwobj is not None:
-                self.redis_client_hwobj.save_queue()
+                self.queue_save_metrics["requests"] += 1
+                self.queue_changed = True
+                if self.queue_autosave_greenlet is None:
+                    self.queue_autosave_greenlet = gevent.spawn_later(\
+                         self.queue_autosave_interval,
+                         self.flush_queue_autosave)
             #else:
             #    self.dc_tree_widget.save_queue()
 
+    def cancel_queue_autosave(self):
+        """Cancels a scheduled auto save"""
+        if self.queue_autosave_greenlet is not None:
+            if self.queue_autosave_greenlet is not gevent.getcurrent():
+                self.queue_autosave_greenlet.kill(block=False)
+            self.queue_autosave_greenlet = None
+
+    def flush_queue_autosave(self):
+        """Saves the queue if there are unsaved changes"""
+        self.cancel_queue_autosave()
+        if self.queue_changed and self.redis_client_hwobj is not None:
+            self.queue_changed = False
+            self.do_save_queue()
+
+    def do_save_queue(self):
+        """Saves the queue and updates save metrics"""
+        start_time = time.time()
+        try:
+            result = self.redis_client_hwobj.save_queue()
+        except:
+            logging.getLogger("HWR").exception("Unable to save the queue")
+            return
+        latency = time.time() - start_time
+
+        try:
+            num_bytes = len(result)
+        except TypeError:
+            num_bytes = 0
+
+        metrics = self.queue_save_metrics
+        metrics["saves"] += 1
+        metrics["last_latency"] = latency
+        metrics["max_latency"] = max(metrics["max_latency"], latency)
+        metrics["total_latency"] += latency
+        metrics["last_bytes"] = num_bytes
+        metrics["total_bytes"] += num_bytes
+        logging.getLogger("HWR").debug("Queue saved in %.3f s " % latency + \
+            "(%d bytes, %d save requests, %d saves)" % \
+            (num_bytes, metrics["requests"], metrics["saves"]))
+
+    def get_queue_save_metrics(self):
+        """Returns a copy of queue save metrics"""
+        return dict(self.queue_save_metrics)
+
     def load_queue(self):
         """Loads queue from file"""
 
@@ -1269,7 +1398,7 @@ class Qt4_TreeBrick(BlissWidget):
             loaded_model = self.redis_client_hwobj.load_queue()
 
             if loaded_model is not None:
-                self.dc_tree_widget.sample_tree_widget.clear()
+                self.dc_tree_widget.clear_sample_tree()
                 model_map = {"free-pin" : 0,
                              "ispyb" : 1,
                              "plate" : 2}
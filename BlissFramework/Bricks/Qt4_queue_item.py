@@ -115,6 +115,17 @@ class QueueItem(QTreeWidgetItem):
         if self._data_model:
             self._data_model.set_enabled(not hidden)
 
+    def set_filtered(self, hidden, update_model=True):
+        """Hides the item without changing the visibility of its children"""
+        self.setHidden(hidden)
+
+        if not update_model:
+            return
+        if self._queue_entry:
+            self._queue_entry.set_enabled(not hidden)
+        if self._data_model:
+            self._data_model.set_enabled(not hidden)
+
     def update_check_state(self, new_state):
         """
         Descript. : in qt3 method was called stateChanged.
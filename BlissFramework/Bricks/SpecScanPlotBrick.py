@@ -12,6 +12,7 @@ try:
 except ImportError:
     from PyMca5.PyMca.QtBlissGraph import QtBlissGraph
 from BlissFramework.BaseComponents import BlissWidget
+from BlissFramework.Utils.ScanPlotUpdater import ScanPlotUpdater
 try:
   from SpecClient_gevent import SpecScan
 except ImportError:
@@ -41,7 +42,6 @@ class SpecScanPlotBrick(BlissWidget):
         self.defineSignal('newScan', ())
 
         self.scanObject = None
-        self.xdata = []
         self.ylable = ""
         self.mylog = 0
 
@@ -52,6 +52,7 @@ class SpecScanPlotBrick(BlissWidget):
         self.addProperty('specVersion', 'string', '')
         self.addProperty('backgroundColor', 'combo', ('white', 'default'), 'white')
         self.addProperty('graphColor', 'combo', ('white', 'default'), 'white')
+        self.addProperty('maxRefreshRate', 'float', 10.)
         self.lblTitle = QLabel(self)
         self.graphPanel = QFrame(self)
         buttonBox = QHBox(self)
@@ -59,6 +60,8 @@ class SpecScanPlotBrick(BlissWidget):
         #self.cmdZoomOut = QToolButton(buttonBox)
         self.lblPosition = QLabel(buttonBox)
         self.graph = QtBlissGraph(self.graphPanel)
+        # points are drawn in batches
+        self.plotUpdater = ScanPlotUpdater(self.graph)
                          
         QObject.connect(self.graph, PYSIGNAL('QtBlissGraphSignal'), self.handleBlissGraphSignal)
         QObject.disconnect(self.graph, SIGNAL('plotMousePressed(const QMouseEvent&)'), self.graph.onMousePressed)
@@ -113,6 +116,9 @@ class SpecScanPlotBrick(BlissWidget):
             elif newValue == 'default':
                 self.graph.canvas().setPaletteBackgroundColor(QWidget.paletteBackgroundColor(self))
 
+        elif property == 'maxRefreshRate':
+            self.plotUpdater.maxRefreshRate = newValue
+
         else:
             BlissWidget.propertyChanged(self,property,oldValue,newValue)
                
@@ -121,16 +127,12 @@ class SpecScanPlotBrick(BlissWidget):
         #self.canAddPoint = True
         self.emit(PYSIGNAL('newScan'), ())
         self.lblTitle.setText('<nobr><b>%s</b></nobr>' % scanParameters['title'])
-        self.xdata = []
 
         self.graph.clearcurves()
         self.graph.xlabel(scanParameters['xlabel'])
         self.ylabel = scanParameters['ylabel']
 
-        ylabels = self.ylabel.split()
-        self.ydatas = [[] for x in range(len(ylabels))]
-        for labels,ydata in zip(ylabels,self.ydatas):
-            self.graph.newcurve(labels,self.xdata,ydata)
+        self.plotUpdater.newScan(self.ylabel.split())
             
         
         self.graph.ylabel(self.ylabel)
@@ -148,15 +150,12 @@ class SpecScanPlotBrick(BlissWidget):
             if self.mylog == 1:
               self.graph.toggleLogY()
               self.mylog = 0
+        self.plotUpdater.logY = self.mylog == 1
 
         self.graph.replot()
         
     def newScanPoint(self, x, y):
-        self.xdata.append(x)
-        for label,ydata,yvalue in zip(self.ylabel.split(),self.ydatas,str(y).split()) :
-            ydata.append(float(yvalue))
-            self.graph.newcurve(label,self.xdata,ydata)
-        self.graph.replot()
+        self.plotUpdater.addPoint(x, str(y).split())
         
     def handleBlissGraphSignal(self, signalDict):
         if signalDict['event'] == 'MouseAt':
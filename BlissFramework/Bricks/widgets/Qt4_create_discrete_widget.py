@@ -218,7 +218,7 @@ class CreateDiscreteWidget(CreateTaskBase):
             cpos.snapshot_image = snapshot
         else:
             cpos = queue_model_objects.CentredPosition()
-            cpos.snapshot_image = self._graphics_manager_hwobj.get_scene_snapshot() 
+            cpos.snapshot_image = self.get_scene_snapshot() 
 
         tasks.extend(self.create_dc(sample, cpos=cpos))
         self._path_template.run_number += 1
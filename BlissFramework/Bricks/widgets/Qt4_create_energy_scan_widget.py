@@ -180,7 +180,7 @@ class CreateEnergyScanWidget(CreateTaskBase):
         if selected_element:
             if not shape:
                 cpos = queue_model_objects.CentredPosition()
-                cpos.snapshot_image = self._graphics_manager_hwobj.get_scene_snapshot()
+                cpos.snapshot_image = self.get_scene_snapshot()
             else:
                 # Shapes selected and sample is mounted, get the
                 # centred positions for the shapes
@@ -182,11 +182,26 @@ class CreateTaskBase(QWidget):
         self._data_path_widget.update_file_name()
         if self._tree_brick is not None:
             self._tree_brick.dc_tree_widget.check_for_path_collisions()
-            path_conflict = self._beamline_setup_hwobj.queue_model_hwobj.\
-                            check_for_path_collisions(self._path_template)
+            path_conflict = self.check_for_path_collisions(self._path_template)
             self._data_path_widget.indicate_path_conflict(path_conflict)
             self._tree_brick.data_path_changed(path_conflict)
+
+    def check_for_path_collisions(self, path_template):
+        """Uses the path index of the tree if available"""
+        if self._tree_brick is not None:
+            return self._tree_brick.dc_tree_widget.path_collides(path_template)
+        return self._beamline_setup_hwobj.queue_model_hwobj.\
+            check_for_path_collisions(path_template)
         
+    def get_scene_snapshot(self):
+        """Returns scene snapshot. Within a user action of the tree
+           brick, the snapshot is captured once and shared by all tasks
+        """
+        if self._tree_brick is not None:
+            return self._tree_brick.dc_tree_widget.snapshot_store.\
+                get_scene_snapshot(self._graphics_manager_hwobj)
+        return self._graphics_manager_hwobj.get_scene_snapshot()
+
     def set_tree_brick(self, brick):
         self._tree_brick = brick
 
@@ -549,8 +564,7 @@ class CreateTaskBase(QWidget):
     def approve_creation(self):
         result = True
         
-        path_conflict = self._beamline_setup_hwobj.queue_model_hwobj.\
-                        check_for_path_collisions(self._path_template)
+        path_conflict = self.check_for_path_collisions(self._path_template)
 
         if path_conflict:
             logging.getLogger("GUI").\
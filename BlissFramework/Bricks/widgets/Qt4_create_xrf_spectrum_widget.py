@@ -134,7 +134,7 @@ class CreateXRFSpectrumWidget(CreateTaskBase):
         if self.count_time is not None:
             if not shape:
                 cpos = queue_model_objects.CentredPosition()
-                cpos.snapshot_image = self._graphics_manager_hwobj.get_scene_snapshot()
+                cpos.snapshot_image = self.get_scene_snapshot()
             else:
                 # Shapes selected and sample is mounted, get the
                 # centred positions for the shapes
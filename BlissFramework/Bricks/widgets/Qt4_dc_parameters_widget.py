@@ -111,10 +111,9 @@ class DCParametersWidget(QWidget):
  
         #TODO  get tree view in another way
         dc_tree_widget = self._tree_view_item.listView().parent().parent()
-        dc_tree_widget.check_for_path_collisions()
+        dc_tree_widget.check_for_path_collisions([self._tree_view_item])
         path_template = self._data_collection.acquisitions[0].path_template
-        path_conflict = self.queue_model_hwobj.\
-                        check_for_path_collisions(path_template)
+        path_conflict = dc_tree_widget.path_collides(path_template)
 
     def __add_data_collection(self):
         return self.add_dc_cb(self._data_collection, self.collection_type)
@@ -41,6 +41,11 @@ from BlissFramework.Utils import Qt4_widget_colors
 from BlissFramework.Qt4_BaseComponents import BlissWidget
 from widgets.Qt4_confirm_dialog import ConfirmDialog
 from widgets.Qt4_plate_navigator_widget import PlateNavigatorWidget
+from widgets.Qt4_tree_search_index import TreeSearchIndex, \
+     CONTAINER_ITEM_TYPES
+from widgets.Qt4_path_collision_index import PathCollisionIndex
+from widgets.Qt4_snapshot_store import SnapshotStore
+from widgets.Qt4_history_model import HistoryModel, encode_entry
 from queue_model_enumerables_v1 import CENTRING_METHOD
 
 
@@ -57,6 +62,10 @@ SCFilterOptions = namedtuple('SCFilterOptions',
 
 SC_FILTER_OPTIONS = SCFilterOptions(0, 1, 2, 3)
 
+# Delay in ms between a history entry and the resize of the history
+# columns, entries added meanwhile are resized together
+HISTORY_RESIZE_DELAY = 500
+
 
 class DataCollectTree(QWidget):
     """
@@ -96,7 +105,26 @@ class DataCollectTree(QWidget):
         #self.clear_centred_positions_cb = None
         self.run_cb = None
         self.item_menu = None
-        self.item_history_list = []
+        self.history_filename = None
+
+        # Index of tree items by the id of their queue model node and
+        # typed sub indexes. Kept in sync by add_to_view, delete_click
+        # and clear_sample_tree
+        self.item_index = {}
+        self.basket_item_index = {}
+        self.sample_item_index = {}
+        self.task_item_index = {}
+        self.dc_item_index = {}
+        self.search_index = TreeSearchIndex()
+        self.path_index = PathCollisionIndex()
+        self.path_conflict_keys = set()
+        self.snapshot_store = SnapshotStore()
+        self.collect_button_update_suspended = False
+        # Incremented when the tree is cleared
+        self.tree_generation = 0
+        # Items added during a bulk update, see begin_bulk_update
+        self.bulk_update_depth = 0
+        self.bulk_added_items = []
 
         # Signals ------------------------------------------------------------
 
@@ -149,8 +177,12 @@ class DataCollectTree(QWidget):
 
         self.tree_splitter = QSplitter(Qt.Vertical, self)
         self.sample_tree_widget = QTreeWidget(self.tree_splitter)
-        self.history_tree_widget = QTreeWidget(self.tree_splitter)
+        self.history_tree_widget = QTreeView(self.tree_splitter)
+        self.history_model = HistoryModel(self)
+        self.history_tree_widget.setModel(self.history_model)
         self.history_tree_widget.setHidden(True)
+        self.history_resize_timer = QTimer(self)
+        self.history_resize_timer.setSingleShot(True)
         self.history_enable_cbox = QCheckBox("Queue history", self)
         self.history_enable_cbox.setChecked(False)
  
@@ -201,7 +233,9 @@ class DataCollectTree(QWidget):
         #self.history_tree_widget.cellDoubleClicked.\
         #     connect(self.history_table_double_click)
         self.history_enable_cbox.stateChanged.\
-             connect(self.history_tree_widget.setVisible)
+             connect(self.history_enable_toggled)
+        self.history_resize_timer.timeout.\
+             connect(self.resize_history_columns)
 
         self.plate_navigator_cbox.stateChanged.\
              connect(self.use_plate_navigator)
@@ -225,9 +259,6 @@ class DataCollectTree(QWidget):
 
         self.history_tree_widget.setEditTriggers(\
              QAbstractItemView.NoEditTriggers)
-        self.history_tree_widget.setColumnCount(5)
-        self.history_tree_widget.setHeaderLabels(\
-             ("Date/Time", "Sample", "Type", "Status", "Details"))
         self.tree_splitter.setSizes([200, 20])
 
     def init_plate_navigator(self, plate_navigator_hwobj):
@@ -360,7 +391,14 @@ class DataCollectTree(QWidget):
         # QTreeWidgetItem type and method was not found. Interesting...
 
         if isinstance(item, Qt4_queue_item.QueueItem):
+            check_state_changed = column == 0 and \
+                item.checkState(0) != item.get_previous_check_state()
             item.update_check_state(item.checkState(0))
+            if check_state_changed:
+                # check state cascades to the children and the parent
+                self.update_path_conflicts(item)
+                if isinstance(item.parent(), Qt4_queue_item.QueueItem):
+                    self.update_path_conflict(item.parent())
 
     def use_plate_navigator(self, state):
         """Toggles visibility of the plate navigator"""
@@ -371,6 +409,7 @@ class DataCollectTree(QWidget):
         items = self.get_selected_items()
         for item in items:
             item.update_display_name()
+            self.search_index.update(id(item.get_model()))
 
     def context_collect_item(self):
         """Calls collect_items method"""
@@ -580,23 +619,76 @@ class DataCollectTree(QWidget):
         self.toggle_collect_button_enabled()
 
     def toggle_collect_button_enabled(self):
-        self.collect_button.setEnabled((len(self.get_checked_items()) > 1 and \
+        if self.collect_button_update_suspended:
+            return
+        self.collect_button.setEnabled((self.has_checked_items(2) and \
                                        len(self.get_checked_samples()) and
                                        self.enable_collect_condition) or \
                                        self.collecting)
 
+    def index_item(self, item):
+        """Adds item to the model to item index"""
+        key = id(item.get_model())
+        self.item_index[key] = item
+        if isinstance(item, Qt4_queue_item.SampleQueueItem):
+            self.sample_item_index[key] = item
+        elif isinstance(item, Qt4_queue_item.BasketQueueItem):
+            self.basket_item_index[key] = item
+        elif isinstance(item, Qt4_queue_item.TaskQueueItem):
+            self.task_item_index[key] = item
+            if isinstance(item.get_model(), queue_model_objects.DataCollection):
+                self.dc_item_index[key] = item
+
+        parent = item.parent()
+        if parent is not None:
+            self.search_index.add(key, item, id(parent.get_model()))
+        else:
+            self.search_index.add(key, item, None)
+
+        path_template = self.get_item_path_template(item)
+        if path_template:
+            self.path_index.add(key, path_template)
+
+    def unindex_item(self, item):
+        """Removes item and all its children from the index"""
+        for index in range(item.childCount()):
+            self.unindex_item(item.child(index))
+        key = id(item.get_model())
+        if self.item_index.get(key) is item:
+            for item_index in (self.item_index,
+                               self.basket_item_index,
+                               self.sample_item_index,
+                               self.task_item_index,
+                               self.dc_item_index):
+                item_index.pop(key, None)
+            self.search_index.remove(key)
+            self.path_index.remove(key)
+            self.path_conflict_keys.discard(key)
+
+    def clear_item_index(self):
+        """Clears the model to item index"""
+        self.item_index.clear()
+        self.basket_item_index.clear()
+        self.sample_item_index.clear()
+        self.task_item_index.clear()
+        self.dc_item_index.clear()
+        self.search_index.clear()
+        self.path_index.clear()
+        self.path_conflict_keys.clear()
+
+    def clear_sample_tree(self):
+        """Clears the sample tree and its index"""
+        self.tree_generation += 1
+        self.clear_item_index()
+        self.last_added_item = None
+        self.sample_tree_widget.clear()
+
     def get_item_by_model(self, parent_node):
         """Returns tree item by its model
         """
-        it = QTreeWidgetItemIterator(self.sample_tree_widget)
-        item = it.value()
-    
-        while item:
-            if item.get_model() is parent_node:
-                return item
-
-            it += 1
-            item = it.value()
+        item = self.item_index.get(id(parent_node))
+        if item is not None and item.get_model() is parent_node:
+            return item
 
         return self.sample_tree_widget
 
@@ -629,12 +721,15 @@ class DataCollectTree(QWidget):
             view_item.setExpanded(True)
 
         self.queue_model_hwobj.view_created(view_item, task)
+        self.index_item(view_item)
         #self.sample_tree_widget_selection()
         self.toggle_collect_button_enabled()
 
         self.last_added_item = view_item
 
-        if isinstance(view_item, Qt4_queue_item.TaskQueueItem) and \
+        if self.bulk_update_depth > 0:
+            self.bulk_added_items.append(view_item)
+        elif isinstance(view_item, Qt4_queue_item.TaskQueueItem) and \
             self.samples_initialized:
             self.tree_brick.auto_save_queue()
         #self.sample_tree_widget.resizeColumnToContents(0)
@@ -643,6 +738,51 @@ class DataCollectTree(QWidget):
             view_item.init_tool_tip()
             view_item.init_processing_info() 
 
+    def begin_bulk_update(self):
+        """Starts adding many nodes to the tree. Tree repaint, collect
+           button update, path collision check and queue auto save are
+           done once in end_bulk_update. Bulk updates can be nested
+        """
+        if self.bulk_update_depth == 0:
+            self.bulk_added_items = []
+            self.collect_button_update_suspended = True
+            self.sample_tree_widget.setUpdatesEnabled(False)
+        self.bulk_update_depth += 1
+
+    def end_bulk_update(self):
+        """Ends a bulk update started by begin_bulk_update"""
+        self.bulk_update_depth = max(0, self.bulk_update_depth - 1)
+        if self.bulk_update_depth > 0:
+            return
+
+        added_items = self.bulk_added_items
+        self.bulk_added_items = []
+        self.collect_button_update_suspended = False
+        self.sample_tree_widget.setUpdatesEnabled(True)
+        if not added_items:
+            return
+
+        self.check_for_path_collisions(added_items)
+        self.toggle_collect_button_enabled()
+        if self.samples_initialized:
+            # auto saves are coalesced, the queue is saved once
+            for item in added_items:
+                if isinstance(item, Qt4_queue_item.TaskQueueItem):
+                    self.tree_brick.auto_save_queue()
+                    break
+
+    def add_nodes(self, nodes):
+        """Adds a list of (parent node, node) to the queue model and
+           to the tree in one bulk update. Parents are added before
+           their children
+        """
+        self.begin_bulk_update()
+        try:
+            for parent_node, node in nodes:
+                self.queue_model_hwobj.add_child(parent_node, node)
+        finally:
+            self.end_bulk_update()
+
     def get_selected_items(self):
         """Return a list with selected items"""
         items = self.sample_tree_widget.selectedItems()
@@ -706,23 +846,32 @@ class DataCollectTree(QWidget):
 
     def get_mounted_sample_item(self):
         """Returns mounted sample item"""
-        it = QTreeWidgetItemIterator(self.sample_tree_widget)
-        item = it.value()
-
-        while item:
-           if isinstance(item, Qt4_queue_item.SampleQueueItem):
-              if item.mounted_style:
-                  return item
-           it += 1
-           item = it.value()
+        for item in self.sample_item_index.values():
+            if item.mounted_style:
+                return item
 
     def get_checked_samples(self):
         res_list = []
-        for item in self.get_checked_items():
-            if isinstance(item,  Qt4_queue_item.SampleQueueItem):
-               res_list.append(item)
+        for item in self.sample_item_index.values():
+            if item.checkState(0) > 0 and not item.isHidden():
+                res_list.append(item)
         return res_list
 
+    def has_checked_items(self, min_count=1):
+        """Returns True if at least min_count items are checked.
+           Stops at the first min_count checked items
+        """
+        count = 0
+        for item_index in (self.sample_item_index,
+                           self.basket_item_index,
+                           self.task_item_index):
+            for item in item_index.values():
+                if item.checkState(0) > 0 and not item.isHidden():
+                    count += 1
+                    if count >= min_count:
+                        return True
+        return False
+
     def filter_sample_list(self, option):
         """Updates sample tree based on the sample mount"""
         self.sample_tree_widget.clearSelection()
@@ -730,11 +879,11 @@ class DataCollectTree(QWidget):
         self.confirm_dialog.set_plate_mode(False)      
         self.sample_mount_method = option
         if option == SC_FILTER_OPTIONS.SAMPLE_CHANGER:
-            self.sample_tree_widget.clear()
+            self.clear_sample_tree()
             self.queue_model_hwobj.select_model('ispyb')
             self.set_sample_pin_icon()
         elif option == SC_FILTER_OPTIONS.PLATE:
-            self.sample_tree_widget.clear()
+            self.clear_sample_tree()
             self.queue_model_hwobj.select_model('plate')
             self.set_sample_pin_icon()
         elif option == SC_FILTER_OPTIONS.MOUNTED_SAMPLE:
@@ -755,25 +904,18 @@ class DataCollectTree(QWidget):
                    loaded_sample_loc = loaded_sample.getCoords() 
                 except:
                    pass
-            it = QTreeWidgetItemIterator(self.sample_tree_widget)
-            item = it.value()
-        
-            while item:
-                if isinstance(item, Qt4_queue_item.SampleQueueItem):
-                    #TODO fix this to actual plate sample!!!
-                    if item.get_model().location == loaded_sample_loc:
-                        item.setSelected(True)
-                        item.setHidden(False)
-                    else:
-                        item.setHidden(True)
-
-                it += 1
-                item = it.value()
+            for key, item in self.sample_item_index.items():
+                #TODO fix this to actual plate sample!!!
+                if item.get_model().location == loaded_sample_loc:
+                    item.setSelected(True)
+                    self.search_index.set_hidden(key, False, False)
+                else:
+                    self.search_index.set_hidden(key, True, False)
 
             self.hide_empty_baskets()
 
         elif option == SC_FILTER_OPTIONS.FREE_PIN:
-            self.sample_tree_widget.clear()
+            self.clear_sample_tree()
             self.queue_model_hwobj.select_model('free-pin')
             self.set_sample_pin_icon()
         self.sample_tree_widget_selection()
@@ -827,7 +969,7 @@ class DataCollectTree(QWidget):
             self.stop_collection()
 
         else:
-            path_conflict = self.check_for_path_collisions()
+            path_conflict = self.check_all_path_collisions()
 
             if path_conflict:
                 self.queue_hwobj.disable(True)
@@ -1000,53 +1142,28 @@ class DataCollectTree(QWidget):
                                    view_item)
  
     def add_history_entry(self, sample_name, date, time, entry_type, status, entry_details, view_item=None):        
-        # At the top level insert date
-        date_item = None
-        for item_index in range(self.history_tree_widget.topLevelItemCount()):
-            if self.history_tree_widget.topLevelItem(item_index).text(0) == date:
-                date_item = self.history_tree_widget.topLevelItem(item_index)
-                break
-        if not date_item:
-            date_item = QTreeWidgetItem()
-            date_item.setText(0, date)
-            self.history_tree_widget.insertTopLevelItem(0, date_item)
-
-        time_item = None
-        for item_index in range(date_item.childCount()):
-            if date_item.child(item_index).text(0) == time.split(":")[0] + "h":
-                time_item = date_item.child(item_index)
-       
-        if not time_item:
-            time_item = QTreeWidgetItem()
-            time_item.setText(0, time.split(":")[0] + "h")
-            date_item.insertChild(0, time_item)
-
-        entry_item = QTreeWidgetItem()
-        entry_item.setText(0, time)
-        entry_item.setText(1, sample_name)
-        entry_item.setText(2, entry_type)
-        entry_item.setText(3, status)
-        entry_item.setText(4, entry_details)
-
-        if status == "Successful":
-            entry_item.setBackground(3, QBrush(Qt4_widget_colors.LIGHT_GREEN))
-        else:
-            entry_item.setBackground(3, QBrush(Qt4_widget_colors.LIGHT_RED))
-
-        time_item.insertChild(0, entry_item)
-
-        for col in range(1, 4):
-            self.history_tree_widget.resizeColumnToContents(col)
-        """
-        self.history_tree_widget.setItem(0, 4, QTableWidgetItem(entry_details))
-        self.history_tree_widget.resizeRowsToContents()
-        self.history_tree_widget.resizeColumnsToContents()
-        self.history_tree_widget.setRowHeight(0, 17)
-        self.history_tree_widget.setVerticalHeaderItem(\
-             0, QTableWidgetItem(str(self.history_tree_widget.rowCount())))
+        """Adds an entry on top of the history and appends it to the
+           history file. Columns are resized once for the entries added
+           within HISTORY_RESIZE_DELAY
         """
-        self.item_history_list.append((sample_name, date, time, entry_type,
-                                       status, entry_details))
+        self.load_history_queue_from_file()
+        self.history_model.add_entry(date, time, sample_name, entry_type,
+                                     status, entry_details)
+        if not self.history_resize_timer.isActive():
+            self.history_resize_timer.start(HISTORY_RESIZE_DELAY)
+
+    def resize_history_columns(self):
+        """Resizes the history columns to the contents of visible rows"""
+        if self.history_tree_widget.isVisible():
+            for col in range(1, 4):
+                self.history_tree_widget.resizeColumnToContents(col)
+
+    def history_enable_toggled(self, state):
+        """Shows the history, loaded at the first show"""
+        if state:
+            self.load_history_queue_from_file()
+        self.history_tree_widget.setVisible(state)
+        self.resize_history_columns()
 
     def queue_execution_completed(self, status):
         """Restores normal cursors, changes collect button
@@ -1111,14 +1228,17 @@ class DataCollectTree(QWidget):
         if not isinstance(selected_items, list):
             selected_items = self.get_selected_items()
 
-        for item in selected_items:
-            if type(item) not in (Qt4_queue_item.BasketQueueItem,
-                                  Qt4_queue_item.SampleQueueItem,
-                                  Qt4_queue_item.DataCollectionGroupQueueItem):
-                new_node = self.queue_model_hwobj.copy_node(item.get_model())
-                new_node.set_snapshot(self.beamline_setup_hwobj.\
-                         shape_history_hwobj.get_scene_snapshot())
-                self.queue_model_hwobj.add_child(item.get_model().get_parent(), new_node)
+        self.snapshot_store.begin_action()
+        try:
+            for item in selected_items:
+                if type(item) not in (Qt4_queue_item.BasketQueueItem,
+                                      Qt4_queue_item.SampleQueueItem,
+                                      Qt4_queue_item.DataCollectionGroupQueueItem):
+                    new_node = self.queue_model_hwobj.copy_node(item.get_model())
+                    new_node.set_snapshot(self.get_scene_snapshot())
+                    self.queue_model_hwobj.add_child(item.get_model().get_parent(), new_node)
+        finally:
+            self.snapshot_store.end_action()
         self.sample_tree_widget_selection()
  
     def delete_click(self, selected_items=None):
@@ -1138,6 +1258,7 @@ class DataCollectTree(QWidget):
                                                      item.get_model())
                     qe = item.get_queue_entry()
                     parent.get_queue_entry().dequeue(qe)
+                    self.unindex_item(item)
                     parent.takeChild(parent.indexOfChild(item))
 
                     if not parent.child(0):
@@ -1246,14 +1367,18 @@ class DataCollectTree(QWidget):
         return row_list, sample_list
     """
 
-    def samples_from_lims(self, lims_sample_list):
-        """Sync samples with ispyb"""
+    def samples_from_lims(self, lims_sample_list, lims_objects=None):
+        """Sync samples with ispyb. If lims_objects is given, it is
+           filled with id of sample -> LIMS sample
+        """
         barcode_samples = {}
         location_samples = {}
 
         for lims_sample in lims_sample_list:
             sample = queue_model_objects.Sample()
             sample.init_from_lims_object(lims_sample)
+            if lims_objects is not None:
+                lims_objects[id(sample)] = lims_sample
 
             if sample.lims_code:
                 barcode_samples[sample.lims_code] = sample
@@ -1265,10 +1390,15 @@ class DataCollectTree(QWidget):
 
     def enqueue_samples(self, sample_list):
         """Adds items to the queue"""
-        for sample in sample_list:
-            self.queue_model_hwobj.add_child(self.queue_model_hwobj.\
-                                             get_model_root(), sample)
-            self.add_to_queue([sample], self.sample_tree_widget, False)
+        self.collect_button_update_suspended = True
+        try:
+            for sample in sample_list:
+                self.queue_model_hwobj.add_child(self.queue_model_hwobj.\
+                                                 get_model_root(), sample)
+                self.add_to_queue([sample], self.sample_tree_widget, False)
+        finally:
+            self.collect_button_update_suspended = False
+        self.toggle_collect_button_enabled()
 
     def populate_free_pin(self, sample=None):
         """Populates manualy mounted sample"""
@@ -1291,18 +1421,26 @@ class DataCollectTree(QWidget):
             mode_str = "plate" 
         self.queue_hwobj.clear()
         self.queue_model_hwobj.clear_model(mode_str)
-        self.sample_tree_widget.clear()
+        self.clear_sample_tree()
         self.queue_model_hwobj.select_model(mode_str)
 
-        for basket_index, basket in enumerate(basket_list):
-            self.queue_model_hwobj.add_child(self.queue_model_hwobj.\
-                                             get_model_root(), basket)
-            basket.set_enabled(False)
-            for sample in sample_list:
-                if sample.location[0] == basket_index + 1:
+        basket_samples = {}
+        for sample in sample_list:
+            basket_samples.setdefault(sample.location[0], []).append(sample)
+
+        self.collect_button_update_suspended = True
+        try:
+            for basket_index, basket in enumerate(basket_list):
+                self.queue_model_hwobj.add_child(self.queue_model_hwobj.\
+                                                 get_model_root(), basket)
+                basket.set_enabled(False)
+                for sample in basket_samples.get(basket_index + 1, []):
                     basket.add_sample(sample)
                     self.queue_model_hwobj.add_child(basket, sample)
                     sample.set_enabled(False)
+        finally:
+            self.collect_button_update_suspended = False
+        self.toggle_collect_button_enabled()
         self.set_sample_pin_icon()
 
     def set_sample_pin_icon(self):
@@ -1359,33 +1497,90 @@ class DataCollectTree(QWidget):
             it += 1
             item = it.value()
 
-    def check_for_path_collisions(self):
-        """Checks for path conflicts"""
-        conflict = False
-        it = QTreeWidgetItemIterator(self.sample_tree_widget)
-        item = it.value()
+    def get_scene_snapshot(self):
+        """Returns scene snapshot shared by the nodes of the current action"""
+        return self.snapshot_store.get_scene_snapshot(\
+            self.beamline_setup_hwobj.shape_history_hwobj)
 
-        while item:
-            if item.checkState(0) == Qt.Checked:
-                pt = item.get_model().get_path_template()
-                
-                if pt:
-                     path_conflict = self.queue_model_hwobj.\
-                                check_for_path_collisions(pt)
-
-                     if path_conflict:
-                         conflict = True
-                         item.setIcon(0, self.caution_icon)
-                     else:
-                         if item.has_star():
-                             item.setIcon(0, self.star_icon)
-                         else:
-                             item.setIcon(0, QIcon())
-                         
-            it += 1
-            item = it.value()
+    def get_item_path_template(self, item):
+        """Returns path template of the item model or None"""
+        try:
+            return item.get_model().get_path_template()
+        except AttributeError:
+            return None
+
+    def check_for_path_collisions(self, items=None):
+        """Checks for path conflicts. Path templates of the given items
+           (by default the selected, edited ones) and of their children
+           are updated in the path index. Only items sharing a directory,
+           prefix and run number with a changed template are revalidated.
+           Returns True if any checked item has a path conflict
+        """
+        if items is None:
+            items = self.get_selected_items()
+
+        for item in items:
+            for edited_item in [item] + \
+                [item.child(index) for index in range(item.childCount())]:
+                path_template = self.get_item_path_template(edited_item)
+                if path_template:
+                    self.path_index.update(id(edited_item.get_model()),
+                                           path_template)
+
+        for key in self.path_index.take_dirty_owners():
+            item = self.item_index.get(key)
+            if item is not None:
+                self.update_path_conflict(item)
+        for item in items:
+            self.update_path_conflict(item)
+
+        return len(self.path_conflict_keys) > 0
+
+    def check_all_path_collisions(self):
+        """Revalidates the path templates and the conflict states of all
+           items of the tree. Returns True if any checked item has a path
+           conflict
+        """
+        for key, item in self.item_index.items():
+            path_template = self.get_item_path_template(item)
+            if path_template:
+                self.path_index.update(key, path_template)
+        self.path_index.take_dirty_owners()
+        for item in self.item_index.values():
+            self.update_path_conflict(item)
+
+        return len(self.path_conflict_keys) > 0
+
+    def update_path_conflicts(self, item):
+        """Updates path conflict state of an item and of its children"""
+        self.update_path_conflict(item)
+        for index in range(item.childCount()):
+            self.update_path_conflicts(item.child(index))
+
+    def update_path_conflict(self, item):
+        """Updates path conflict state and caution icon of an item"""
+        key = id(item.get_model())
+        path_template = self.get_item_path_template(item)
+        conflict = False
+        if path_template and item.checkState(0) == Qt.Checked:
+            conflict = self.path_index.collides(path_template, key)
+
+        if conflict:
+            if key not in self.path_conflict_keys:
+                self.path_conflict_keys.add(key)
+                item.setIcon(0, self.caution_icon)
+        elif key in self.path_conflict_keys:
+            self.path_conflict_keys.discard(key)
+            if item.has_star():
+                item.setIcon(0, self.star_icon)
+            else:
+                item.setIcon(0, QIcon())
 
-        return conflict
+    def path_collides(self, path_template):
+        """Returns True if the path template collides with a template
+           of the queue
+        """
+        return self.path_index.collides(path_template)
 
     def select_last_added_item(self):
         """Selects last added item"""
@@ -1395,24 +1590,16 @@ class DataCollectTree(QWidget):
             self.sample_tree_widget_selection()
 
     def hide_empty_baskets(self):
-        """Hides empty baskets after the tree filtering"""
-        self.item_iterator = QTreeWidgetItemIterator(\
-             self.sample_tree_widget)
-        item = self.item_iterator.value()
-        while item:
-              hide = True
-
-              if type(item) in(Qt4_queue_item.BasketQueueItem,
-                               Qt4_queue_item.DataCollectionGroupQueueItem):
-                  for index in range(item.childCount()):
-                      if not item.child(index).isHidden():
-                          hide = False
-                          break
-                  if hide:
-                      item.set_hidden(hide)
+        """Hides empty baskets and groups after the tree filtering.
+           Uses the visible children counters of the search index
+        """
+        self.search_index.update_containers(\
+             [key for key, entry in self.search_index.entries.items() \
+              if entry.item_type in CONTAINER_ITEM_TYPES])
 
-              self.item_iterator += 1
-              item = self.item_iterator.value()
+    def filter_items(self, filter_index, text=""):
+        """Filters tree items, see Qt4_tree_search_index for the filters"""
+        self.search_index.apply_filter(filter_index, text)
 
     def delete_empty_finished_items(self):
         """Deletes collected items"""
@@ -1446,6 +1633,20 @@ class DataCollectTree(QWidget):
     def paste_item(self, new_node=None):
         """Paste item. If item was cut then remove item from clipboard"""
 
+        self.snapshot_store.begin_action()
+        self.begin_bulk_update()
+        try:
+            self.paste_selected_items(new_node)
+        finally:
+            self.end_bulk_update()
+            self.snapshot_store.end_action()
+        self.sample_tree_widget_selection()
+
+        if self.item_copy[1]:
+            self.item_copy = None
+
+    def paste_selected_items(self, new_node):
+        """Pastes node (or a copy of the clipboard) to the selected items"""
         for item in self.get_selected_items():
             parent_nodes = []
             if new_node is None:
@@ -1456,8 +1657,7 @@ class DataCollectTree(QWidget):
                     self.queue_model_hwobj.get_next_run_number(\
                     new_node.acquisitions[0].path_template)
 
-            new_node.set_snapshot(self.beamline_setup_hwobj.\
-                shape_history_hwobj.get_scene_snapshot())
+            new_node.set_snapshot(self.get_scene_snapshot())
 
             if isinstance(item, Qt4_queue_item.DataCollectionQueueItem):
                 parent_nodes = [item.get_model().get_parent()]
@@ -1472,11 +1672,7 @@ class DataCollectTree(QWidget):
                 
             for parent_node in parent_nodes:
                 self.queue_model_hwobj.add_child(parent_node, new_node)
-        self.sample_tree_widget_selection()
 
-        if self.item_copy[1]:
-            self.item_copy = None
-        
     def save_item(self):
         """Saves a single item in a file"""
 
@@ -1580,7 +1776,7 @@ class DataCollectTree(QWidget):
             "Open file", os.environ["HOME"],
             "Item file (*.dat)", "Choose queue file to open"))
         if len(filename) > 0:
-            self.sample_tree_widget.clear()
+            self.clear_sample_tree()
             loaded_model = self.queue_model_hwobj.load_queue(filename, 
                self.beamline_setup_hwobj.shape_history_hwobj.get_scene_snapshot())
             return loaded_model
@@ -1588,36 +1784,48 @@ class DataCollectTree(QWidget):
     def save_history_queue(self):
         pass
 
-    def save_history_in_file(self):
-        filename = os.path.join(self.tree_brick.user_file_directory,
-                                "queue_history.dat")
-        save_file = None
+    def get_history_filename(self):
+        """Returns the history file of the user file directory"""
         try:
-           save_file = open(filename, 'w')
-           #items_to_save = []
-           #for item in self.item_history_list:
-           #    items_to_save.append(item.get_model())
-           #save_file.write(jsonpickle.encode(items_to_save))
-           save_file.write(jsonpickle.encode(self.item_history_list))
-        except:
-           logging.getLogger().exception("Cannot save file %s", filename)
-           if save_file:
-               save_file.close()
+            return os.path.join(self.tree_brick.user_file_directory,
+                                "queue_history.jsonl")
+        except (AttributeError, TypeError):
+            return None
+
+    def save_history_in_file(self):
+        """Entries are appended to the history file when added, the file
+           is closed and reopened by the next entry
+        """
+        if self.history_model.history_file is not None:
+            self.history_model.history_file.close()
 
     def load_history_queue_from_file(self):
-        filename = os.path.join(self.tree_brick.user_file_directory,
-                                "queue_history.dat")
+        """Loads the history file of the user file directory, if not
+           loaded yet. A history saved in the former jsonpickle file
+           queue_history.dat is converted
+        """
+        filename = self.get_history_filename()
+        if filename is None or filename == self.history_filename:
+            return
+        self.history_filename = filename
+
+        old_filename = os.path.join(os.path.dirname(filename),
+                                    "queue_history.dat")
+        if not os.path.exists(filename) and os.path.exists(old_filename):
+            try:
+                with open(old_filename) as old_file:
+                    items = jsonpickle.decode(old_file.read())
+                with open(filename, "w") as history_file:
+                    for item in items:
+                        (sample_name, date, time, entry_type,
+                         status, entry_details) = item[:6]
+                        history_file.write(encode_entry(date, time,
+                            sample_name, entry_type, status, entry_details))
+            except:
+                logging.getLogger().exception("Cannot convert file %s",
+                                              old_filename)
 
-        load_file = None
-        try:
-            load_file = open(filename, 'r')
-            for item in jsonpickle.decode(load_file.read()):
-                self.add_history_entry(*item)
-        except:
-            pass
-        finally:
-            if load_file:
-                load_file.close()
+        self.history_model.load(filename)
 
     def undo_queue(self):
         """Undo last change"""
@@ -1637,30 +1845,29 @@ class DataCollectTree(QWidget):
 
     def shape_changed(self, shape, shape_type):
         """Updates tree item if its related shape has changed"""
-        self.item_iterator = QTreeWidgetItemIterator(\
-             self.sample_tree_widget)
-        item = self.item_iterator.value()
-        while item:
-              item_model = item.get_model()
-              if shape_type == "Line" and \
-                 isinstance(item_model, queue_model_objects.DataCollection):
-                  if item_model.is_helical():
-                      (cp_start, cp_end) = item_model.get_centred_positions()
-                      item_model.set_centred_positions((cp_end, cp_start))
-                      item.update_display_name()
-              self.item_iterator += 1
-              item = self.item_iterator.value()
+        if shape_type != "Line":
+            return
+        for item in self.dc_item_index.values():
+            item_model = item.get_model()
+            if item_model.is_helical():
+                (cp_start, cp_end) = item_model.get_centred_positions()
+                item_model.set_centred_positions((cp_end, cp_start))
+                item.update_display_name()
 
     def sync_diffraction_plan(self):
         """Adds data collection items defined in ispyb diffraction plan"""
-        for item in self.get_selected_items():
-            if isinstance(item, Qt4_queue_item.SampleQueueItem):
-                if item.get_model().diffraction_plan is not None:
-                    self.add_sample_diffraction_plan(item.get_model())
-            elif isinstance(item, Qt4_queue_item.BasketQueueItem):
-                for sample in item.get_model().get_sample_list():
-                    if sample.diffraction_plan is not None:
-                        self.add_sample_diffraction_plan(sample)
+        self.snapshot_store.begin_action()
+        try:
+            for item in self.get_selected_items():
+                if isinstance(item, Qt4_queue_item.SampleQueueItem):
+                    if item.get_model().diffraction_plan is not None:
+                        self.add_sample_diffraction_plan(item.get_model())
+                elif isinstance(item, Qt4_queue_item.BasketQueueItem):
+                    for sample in item.get_model().get_sample_list():
+                        if sample.diffraction_plan is not None:
+                            self.add_sample_diffraction_plan(sample)
+        finally:
+            self.snapshot_store.end_action()
     
     def add_sample_diffraction_plan(self, sample_model):
         """Adds diffraction plan defined in ispyb
@@ -1671,7 +1878,7 @@ class DataCollectTree(QWidget):
         #                               str(sample_model.diffraction_plan))
         task_node = self.create_task_group(sample_model)
         prefix = self.beamline_setup_hwobj.session_hwobj.get_default_prefix(sample_model)
-        snapshot = self.beamline_setup_hwobj.shape_history_hwobj.get_scene_snapshot()
+        snapshot = self.get_scene_snapshot()
 
         if sample_model.diffraction_plan.experimentKind in ("OSC", "Default"):
             acq = queue_model_objects.Acquisition()
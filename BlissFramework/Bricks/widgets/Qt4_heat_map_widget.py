@@ -27,6 +27,10 @@ from BlissFramework.Utils import Qt4_widget_colors
 from widgets.Qt4_matplot_widget import TwoDimenisonalPlotWidget
 
 
+# Minimal time between two heat map redraws (ms)
+HEAT_MAP_REFRESH_INTERVAL = 250
+
+
 class HeatMapWidget(QWidget):
     def __init__(self, parent=None):
         QWidget.__init__(self, parent)
@@ -43,7 +47,9 @@ class HeatMapWidget(QWidget):
 
         # Internal values -----------------------------------------------------
         self.__results = None
-        self.__result_display = {}
+        self.__display_cache = {}
+        self.__pending_cells = []
+        self.__full_refresh_pending = False
         self.__associated_grid = None
         self.__associated_data_collection = None
         self.__selected_x = 0
@@ -83,6 +89,9 @@ class HeatMapWidget(QWidget):
         self._best_pos_table = QTableWidget(self._best_pos_gbox)
         self._best_pos_popup_menu = QMenu(self._heat_map_gbox)
         self._best_pos_gbox.setHidden(True)
+        self.__refresh_timer = QTimer(self)
+        self.__refresh_timer.setSingleShot(True)
+        self.__refresh_timer.setInterval(HEAT_MAP_REFRESH_INTERVAL)
 
         # Layout --------------------------------------------------------------
         _heat_map_tools_hlayout = QHBoxLayout(self._heat_map_tools_widget)
@@ -141,6 +150,7 @@ class HeatMapWidget(QWidget):
              connect(self.move_to_position_clicked)
         self._heat_map_plot.mouseLeftSignal.connect(\
              self.mouse_left_plot)
+        self.__refresh_timer.timeout.connect(self.scheduled_refresh)
              
 
         # Other ---------------------------------------------------------------
@@ -281,22 +291,42 @@ class HeatMapWidget(QWidget):
             self.__score_key = "image_num"
         self.refresh()         
 
+    def get_display_result(self, score_key=None):
+        """
+        Returns thresholded results used for display. Source results are
+        not modified. Thresholded arrays are cached per score key
+        """
+        if score_key is None:
+            score_key = self.__score_key
+        result = self.__results[score_key]
+        filter_min_value = result.max() * \
+             self._threshold_slider.value() / 100.0
+
+        cached = self.__display_cache.get(score_key)
+        if cached is None or cached[0] != filter_min_value:
+            if filter_min_value > 0:
+                result_display = numpy.where(result < filter_min_value,
+                                             0, result)
+            else:
+                result_display = result.copy()
+            cached = (filter_min_value, result_display)
+            self.__display_cache[score_key] = cached
+        self.__filter_min_value = filter_min_value
+        return cached[1]
+
     def refresh(self):
+        self.__refresh_timer.stop()
+        self.__full_refresh_pending = False
+        self.__pending_cells = []
+
         self._summary_textbrowser.clear()
         if self.__results is None:
             return         
 
-        #for key in self.__results.keys():
-        #    self.__result_display[key] = copy(self.__results[key])
-
-        self.__filter_min_value = \
-             self.__result_display[self.__score_key].max() * \
-             self._threshold_slider.value() / 100.0
-        self.__result_display[self.__score_key][self.__result_display[self.__score_key] < \
-                                                self.__filter_min_value] = 0
+        result_display = self.get_display_result()
     
-        if len(self.__result_display[self.__score_key].shape) == 1:
-            x_data = numpy.arange(1, self.__result_display[self.__score_key].shape[0] + 1)
+        if len(result_display.shape) == 1:
+            x_data = numpy.arange(1, result_display.shape[0] + 1)
             self._heat_map_plot.clear()
             #self._heat_map_plot.add_curve(self.__result_display, x_data, "Dozor result")
             self._heat_map_plot.add_curve(self.__results["score"],
@@ -332,7 +362,7 @@ class HeatMapWidget(QWidget):
                 self._summary_textbrowser.append("<b>Mesh parameters</b>")
                 grid_properties = self.__associated_grid.get_properties()
 
-                self._heat_map_plot.plot_result(numpy.transpose(self.__result_display[self.__score_key]),
+                self._heat_map_plot.plot_result(numpy.transpose(result_display),
                                                 aspect=grid_properties["dx_mm"] / \
                                                        grid_properties["dy_mm"])
 
@@ -361,6 +391,36 @@ class HeatMapWidget(QWidget):
         #self.__associated_grid.set_min_score(self._threshold_slider.value() / 100.0)
         self.refresh()
 
+    def schedule_refresh(self):
+        """
+        Schedules a full refresh. Refreshes are throttled to
+        HEAT_MAP_REFRESH_INTERVAL
+        """
+        self.__full_refresh_pending = True
+        if not self.__refresh_timer.isActive():
+            self.__refresh_timer.start()
+
+    def scheduled_refresh(self):
+        """
+        Applies pending changes. Changed cells are written in the
+        displayed image, otherwise the whole heat map is replotted
+        """
+        if self.__full_refresh_pending or not self.__is_map_plot:
+            self.refresh()
+            return
+        if not self.__pending_cells or self.__results is None:
+            return
+
+        cols = numpy.concatenate([cells[0] for cells in self.__pending_cells])
+        rows = numpy.concatenate([cells[1] for cells in self.__pending_cells])
+        self.__pending_cells = []
+        filter_min_value = self.__filter_min_value
+        result_display = self.get_display_result()
+        if filter_min_value != self.__filter_min_value or \
+           not self._heat_map_plot.update_result_values(\
+             rows, cols, result_display[cols, rows]):
+            self.refresh()
+
     def mouse_moved(self, pos_x, pos_y):
         if self.__enable_continues_image_display and \
            self.__heatmap_clicked:
@@ -380,7 +440,7 @@ class HeatMapWidget(QWidget):
         try:
            col, row = self.get_col_row_from_image_line(line, image)
            msg = "Image: %d, value: %.1f" %(self.selected_image_serial,
-                 self.__result_display[self.__score_key][col][row])
+                 self.__results[self.__score_key][col][row])
         except:
            msg = "Image: %d" % self.selected_image_serial
         self._image_info_label.setText(msg)
@@ -397,19 +457,86 @@ class HeatMapWidget(QWidget):
 
     def set_results(self, results, last_results=False):
         """
-        Displays results on the widget
+        Displays results on the widget. Intermediate results of a mesh
+        only update the cells that have changed since the previous
+        results, other results are displayed with a throttled refresh
         """
-        self.__results = results
-        self.__result_display = results
-        self.refresh()
+        new_results = {}
+        for key, value in results.items():
+            if isinstance(value, numpy.ndarray):
+                value = value.copy()
+            new_results[key] = value
+
+        changed_cells = None
+        if self.__is_map_plot and not last_results:
+            changed_cells = self.get_changed_cells(new_results)
+        self.__results = new_results
+
+        if changed_cells is None:
+            self.__display_cache = {}
+            if last_results:
+                self.refresh()
+            else:
+                self.schedule_refresh()
+        elif len(changed_cells[0]):
+            self.update_cells(changed_cells)
         #self.set_best_pos()
 
+    def get_changed_cells(self, new_results):
+        """
+        Returns arrays of columns and rows of the cells that differ
+        between the displayed results and new_results, or None if the
+        results can not be compared (no results, other keys or shapes)
+        """
+        if self.__results is None or \
+           set(self.__results.keys()) != set(new_results.keys()):
+            return None
+
+        changed = None
+        for key, value in new_results.items():
+            if not isinstance(value, numpy.ndarray):
+                continue
+            old_value = self.__results[key]
+            if not isinstance(old_value, numpy.ndarray) or \
+               old_value.shape != value.shape or value.ndim != 2:
+                return None
+            if changed is None:
+                changed = old_value != value
+            else:
+                changed |= old_value != value
+        if changed is None:
+            return None
+        return numpy.nonzero(changed)
+
+    def update_cells(self, cells):
+        """
+        Updates the cached display arrays of changed cells and schedules
+        the redraw of these cells only
+        """
+        cols, rows = cells
+        for score_key, result in self.__results.items():
+            cached = self.__display_cache.get(score_key)
+            if cached is None:
+                continue
+            if cached[0] == 0 and self._threshold_slider.value() == 0:
+                cached[1][cols, rows] = result[cols, rows]
+            else:
+                self.__display_cache.pop(score_key, None)
+
+        self.__pending_cells.append((cols, rows))
+        if not self.__refresh_timer.isActive():
+            self.__refresh_timer.start()
+
     def clean_result(self):
         """
         Method to clean heat map, summary log and table with best positions
         """
         #self.setEnabled(False)
         self.__results = None
+        self.__display_cache = {}
+        self.__pending_cells = []
+        self.__full_refresh_pending = False
+        self.__refresh_timer.stop()
         self.__associated_grid = None
         self.__associated_data_collection = None
         self._heat_map_plot.clear()
@@ -431,11 +558,11 @@ class HeatMapWidget(QWidget):
         All images are checked and if the value is over the threshold
          then screen x and y coordinates are estimated.
         """
+        result_display = self.get_display_result()
         if self.__is_map_plot:
-            #result_display = numpy.transpose(self.__result_display[self.__score_key])
-            result_display = self.__result_display[self.__score_key]
-            #step_x = pix_width / self.__result_display.shape[0]
-            #step_y = pix_height / self.__result_display.shape[1]
+            #result_display = numpy.transpose(result_display)
+            #step_x = pix_width / result_display.shape[0]
+            #step_y = pix_height / result_display.shape[1]
             for col in range(result_display.shape[0]):
                 for row in range(result_display.shape[1]):
                     if result_display[col][row] > 0:
@@ -443,8 +570,8 @@ class HeatMapWidget(QWidget):
                         row = result_display.shape[1] - row - 1
                         self.create_centring_point(col + 0.5, row + 0.5)
         else:
-            for col in range(self.__result_display.shape[0]):
-                if self.__result_display[col] > 0:
+            for col in range(result_display.shape[0]):
+                if result_display[col] > 0:
                     self.create_centring_point(col + 0.5)
         self._beamline_setup_hwobj.shape_history_hwobj.select_all_points()
   
@@ -466,9 +593,9 @@ class HeatMapWidget(QWidget):
             try:
                 col, row = self.get_col_row_from_image_line(line, image)
                 tooltip_text += "\nTotal score: %.1f" %  \
-                                self.__result_display['score'][col][row] +\
+                                self.__results['score'][col][row] +\
                                 "\nNumber of spots: %d" % \
-                                self.__result_display['spots_num'][col][row]
+                                self.__results['spots_num'][col][row]
             except:
                 pass
         self._heat_map_plot.setToolTip(tooltip_text)
@@ -512,7 +639,7 @@ class HeatMapWidget(QWidget):
         """
         col, row = self.__associated_grid.get_col_row_from_line_image(line, image)
         ## TODO check if next line needs to be removed
-        row = self.__result_display[self.__score_key].shape[1] - row - 1    
+        row = self.__results[self.__score_key].shape[1] - row - 1    
         return col, row
 
     def create_centring_point(self, coord_x=None, coord_y=None):
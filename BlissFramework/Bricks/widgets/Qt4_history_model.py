@@ -0,0 +1,302 @@
+#
+#  Project: MXCuBE
+#  https://github.com/mxcube.
+#
+#  This file is part of MXCuBE software.
+#
+#  MXCuBE is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MXCuBE is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MXCuBE. If not, see <http://www.gnu.org/licenses/>.
+#
+#  Please user PEP 0008 -- "Style Guide for Python Code" to format code
+#  https://www.python.org/dev/peps/pep-0008/
+
+"""
+History of the executed queue entries.
+
+Entries (date, time, sample name, type, status, details) are appended
+to a JSON lines file, one entry per line, so adding an entry does not
+rewrite the history. HistoryModel shows the entries in a tree of date
+and hour buckets, newest first. Buckets are indexed by dicts and the row
+of a node is derived from its insertion position, so adding an entry
+does not depend on the size of the history. When the file is loaded only
+the last HISTORY_LOADED_DAYS days are parsed, the lines of older days
+are kept and parsed when their date is expanded (fetchMore).
+"""
+
+import os
+import json
+import logging
+
+from QtImport import *
+
+from BlissFramework.Utils import Qt4_widget_colors
+
+
+__credits__ = ["MxCuBE colaboration"]
+__version__ = "2.3"
+__status__ = "Production"
+
+
+HISTORY_LOADED_DAYS = 7
+HISTORY_COLUMNS = ("Date/Time", "Sample", "Type", "Status", "Details")
+
+
+def encode_entry(date, time, sample_name, entry_type, status, details):
+    """Returns the JSON line of an entry. The date is the first element,
+       so the date of a line is read without decoding it
+    """
+    return json.dumps([date, time, sample_name, entry_type,
+                       status, details]) + "\n"
+
+
+def get_line_date(line):
+    """Returns the date of a JSON line written by encode_entry"""
+    return line[2:line.index('"', 2)]
+
+
+class HistoryNode(object):
+    """Date, hour or entry node of the history tree"""
+
+    __slots__ = ("parent", "position", "key", "values",
+                 "children", "child_index", "pending_lines")
+
+    def __init__(self, parent, key, values=None):
+        self.parent = parent
+        self.position = 0
+        self.key = key
+        # entry values (time, sample name, type, status, details)
+        self.values = values
+        # children in insertion order, the newest is shown first
+        self.children = []
+        self.child_index = {}
+        # JSON lines of a date that are not parsed yet
+        self.pending_lines = None
+
+    def add_child(self, child):
+        child.position = len(self.children)
+        self.children.append(child)
+        if child.key is not None:
+            self.child_index[child.key] = child
+        return child
+
+    def get_row(self):
+        return len(self.parent.children) - 1 - self.position
+
+    def get_child(self, row):
+        return self.children[len(self.children) - 1 - row]
+
+
+class HistoryFile(object):
+    """Append only JSON lines file of history entries"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = None
+
+    def read_lines(self):
+        """Returns the lines of the file"""
+        if not os.path.exists(self.filename):
+            return []
+        try:
+            with open(self.filename) as history_file:
+                return [line for line in history_file if line.startswith('["')]
+        except IOError:
+            logging.getLogger("HWR").exception(\
+                "Unable to read history file %s" % self.filename)
+            return []
+
+    def append(self, line):
+        try:
+            if self._file is None:
+                # line buffered, an entry is written per line
+                self._file = open(self.filename, "a", 1)
+            self._file.write(line)
+        except IOError:
+            logging.getLogger("HWR").exception(\
+                "Unable to write history file %s" % self.filename)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class HistoryModel(QAbstractItemModel):
+    """Tree model of the history with date and hour buckets"""
+
+    def __init__(self, parent=None):
+        QAbstractItemModel.__init__(self, parent)
+        self.root = HistoryNode(None, None)
+        self.history_file = None
+
+    def clear(self):
+        self.beginResetModel()
+        self.root = HistoryNode(None, None)
+        self.endResetModel()
+        if self.history_file is not None:
+            self.history_file.close()
+            self.history_file = None
+
+    def load(self, filename):
+        """Shows the entries of a history file and appends the new
+           entries to it. Only the last days are parsed
+        """
+        self.clear()
+        self.history_file = HistoryFile(filename)
+
+        lines_by_date = {}
+        dates = []
+        for line in self.history_file.read_lines():
+            try:
+                date = get_line_date(line)
+            except ValueError:
+                continue
+            if date not in lines_by_date:
+                lines_by_date[date] = []
+                dates.append(date)
+            lines_by_date[date].append(line)
+
+        self.beginResetModel()
+        for index, date in enumerate(dates):
+            date_node = self.root.add_child(HistoryNode(self.root, date))
+            date_node.pending_lines = lines_by_date[date]
+            if index >= len(dates) - HISTORY_LOADED_DAYS:
+                self.parse_pending_lines(date_node)
+        self.endResetModel()
+
+    def parse_pending_lines(self, date_node):
+        """Adds the entries of the pending lines of a date to its node"""
+        lines = date_node.pending_lines
+        date_node.pending_lines = None
+        for line in lines:
+            try:
+                values = json.loads(line)
+            except ValueError:
+                continue
+            self.get_hour_node(date_node, values[1]).add_child(\
+                HistoryNode(None, None, values[1:]))
+        for hour_node in date_node.children:
+            for entry_node in hour_node.children:
+                entry_node.parent = hour_node
+
+    def get_hour_node(self, date_node, time):
+        hour = time.split(":")[0] + "h"
+        hour_node = date_node.child_index.get(hour)
+        if hour_node is None:
+            hour_node = date_node.add_child(HistoryNode(date_node, hour))
+        return hour_node
+
+    def add_entry(self, date, time, sample_name, entry_type, status, details):
+        """Adds an entry on top of its hour and date and appends it to
+           the history file
+        """
+        if self.history_file is not None:
+            self.history_file.append(encode_entry(date, time, sample_name,
+                                     entry_type, status, details))
+
+        date_node = self.root.child_index.get(date)
+        if date_node is None:
+            self.beginInsertRows(QModelIndex(), 0, 0)
+            date_node = self.root.add_child(HistoryNode(self.root, date))
+            self.endInsertRows()
+        elif date_node.pending_lines is not None:
+            self.fetchMore(self.get_index(date_node))
+        date_index = self.get_index(date_node)
+
+        hour = time.split(":")[0] + "h"
+        hour_node = date_node.child_index.get(hour)
+        if hour_node is None:
+            self.beginInsertRows(date_index, 0, 0)
+            hour_node = date_node.add_child(HistoryNode(date_node, hour))
+            self.endInsertRows()
+
+        self.beginInsertRows(self.get_index(hour_node), 0, 0)
+        hour_node.add_child(HistoryNode(hour_node, None, (time, sample_name,
+                            entry_type, status, details)))
+        self.endInsertRows()
+
+    def get_index(self, node):
+        if node is self.root:
+            return QModelIndex()
+        return self.createIndex(node.get_row(), 0, node)
+
+    def get_node(self, index):
+        if index.isValid():
+            return index.internalPointer()
+        return self.root
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self.get_node(parent)
+        if row < 0 or row >= len(node.children) or \
+           column < 0 or column >= len(HISTORY_COLUMNS):
+            return QModelIndex()
+        return self.createIndex(row, column, node.get_child(row))
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        return self.get_index(index.internalPointer().parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.get_node(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(HISTORY_COLUMNS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self.get_node(parent)
+        return len(node.children) > 0 or node.pending_lines is not None
+
+    def canFetchMore(self, parent):
+        return self.get_node(parent).pending_lines is not None
+
+    def fetchMore(self, parent):
+        date_node = self.get_node(parent)
+        if date_node.pending_lines is None:
+            return
+        # children are built before being announced to the view
+        pending_node = HistoryNode(None, None)
+        pending_node.pending_lines = date_node.pending_lines
+        date_node.pending_lines = None
+        self.parse_pending_lines(pending_node)
+        if pending_node.children:
+            self.beginInsertRows(parent, 0, len(pending_node.children) - 1)
+            for hour_node in pending_node.children:
+                hour_node.parent = date_node
+                date_node.add_child(hour_node)
+            self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if node.values is None:
+                if column == 0:
+                    return node.key
+            else:
+                return node.values[column]
+        elif role == Qt.BackgroundRole and column == 3 and \
+             node.values is not None:
+            if node.values[3] == "Successful":
+                return QBrush(Qt4_widget_colors.LIGHT_GREEN)
+            return QBrush(Qt4_widget_colors.LIGHT_RED)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return HISTORY_COLUMNS[section]
+        return None
@@ -45,6 +45,14 @@ else:
 import matplotlib.pyplot as plt
 
 from BlissFramework.Utils import Qt4_widget_colors
+from BlissFramework.Utils.RingBuffer import RingBuffer
+
+
+# Initial capacity of the realtime data buffer. Without max plot points
+# the buffer doubles its capacity when full
+REALTIME_BUFFER_SIZE = 1024
+# Realtime redraws are coalesced to this frame rate (frames per second)
+DEFAULT_MAX_FRAME_RATE = 10
 
 
 class TwoAxisPlotWidget(QWidget):
@@ -123,6 +131,18 @@ class TwoAxisPlotWidget(QWidget):
         if self._realtime_plot:
             self._two_axis_figure_canvas.append_new_point(y, x)
 
+    def set_realtime_buffer(self, ring_buffer):
+        """
+        Descript. : Plots the columns x and y of an external RingBuffer
+        """
+        self._two_axis_figure_canvas.set_realtime_buffer(ring_buffer)
+
+    def update_realtime_plot(self):
+        """
+        Descript. : Redraws the realtime plot if it is visible
+        """
+        self._two_axis_figure_canvas.schedule_realtime_refresh()
+
     def set_tight_layout(self):
         self._two_axis_figure_canvas.axes.xaxis.set_visible(False)
         #self._two_axis_figure_canvas.fig.tight_layout()
@@ -130,6 +150,9 @@ class TwoAxisPlotWidget(QWidget):
     def set_max_plot_point(self, max_points):
         self._two_axis_figure_canvas.set_max_plot_points(max_points)
 
+    def set_max_frame_rate(self, frame_rate):
+        self._two_axis_figure_canvas.set_max_frame_rate(frame_rate)
+
     def showGrid(self):
         pass
 
@@ -181,10 +204,25 @@ class MplCanvas(FigureCanvas):
         FigureCanvas.updateGeometry(self)
 
         self.curves = []
-        self._axis_x_array = np.empty(0)
-        self._axis_y_array = np.empty(0)
+        self.real_time = False
+        self._realtime_data = None
+        self._realtime_buffer_external = False
+        self._realtime_x_given = False
+        self.create_realtime_buffer()
         self._axis_x_limits = [None, None]
         self._axis_y_limits = [None, None]
+        self._blit_background = None
+        # number of full redraws and of blitted redraws of realtime data
+        self.realtime_draws = 0
+        self.realtime_blits = 0
+        # realtime data changed while the canvas was hidden
+        self._realtime_pending = False
+
+        self._redraw_timer = QTimer(self)
+        self._redraw_timer.setSingleShot(True)
+        self._redraw_timer.timeout.connect(self.refresh_realtime_plot)
+        self.set_max_frame_rate(DEFAULT_MAX_FRAME_RATE)
+        self.mpl_connect("draw_event", self._on_draw_event)
 
     def set_real_time(self, real_time):
         self.real_time = real_time
@@ -194,10 +232,54 @@ class MplCanvas(FigureCanvas):
 
     def set_max_plot_points(self, max_points):
         self.max_plot_points = max_points
+        if max_points:
+            self._realtime_data.growable = False
+            self._realtime_data.set_capacity(max_points)
+        else:
+            self._realtime_data.growable = True
+
+    def create_realtime_buffer(self):
+        """
+        Descript. : Creates the own realtime buffer of the canvas
+        """
+        if self.max_plot_points:
+            self._realtime_data = RingBuffer(self.max_plot_points,
+                                             columns=("x", "y"),
+                                             growable=False)
+        else:
+            self._realtime_data = RingBuffer(REALTIME_BUFFER_SIZE,
+                                             columns=("x", "y"),
+                                             growable=True)
+        self._realtime_buffer_external = False
+        self._realtime_x_given = False
+
+    def set_realtime_buffer(self, ring_buffer):
+        """
+        Descript. : Uses an external RingBuffer with columns x and y as
+                    realtime data (the owner appends points)
+        """
+        self._realtime_data = ring_buffer
+        self._realtime_buffer_external = True
+        self._realtime_x_given = True
+        self.schedule_realtime_refresh()
+
+    def set_max_frame_rate(self, frame_rate):
+        """
+        Descript. : Sets the maximal number of realtime redraws per second
+        """
+        self._redraw_timer.setInterval(int(1000.0 / max(frame_rate, 0.1)))
 
     def clear(self):
         self.curves = []
         self.single_curve = None
+        self._blit_background = None
+        self._axis_x_limits = [None, None]
+        self._axis_y_limits = [None, None]
+        if self._realtime_buffer_external:
+            # the buffer belongs to its owner, the canvas only detaches
+            self.create_realtime_buffer()
+        else:
+            self._realtime_data.clear()
         self.axes.cla()
         self.axes.grid(True)
 
@@ -214,40 +296,101 @@ class MplCanvas(FigureCanvas):
         self.draw()
 
     def append_new_point(self, y, x=None):
-        self._axis_y_array = np.append(self._axis_y_array, y)
-        if x:
-             self._axis_x_array = np.append(self._axis_x_array, x)
+        """
+        Descript. : Stores the point in the realtime buffer and schedules
+                    a redraw. Redraws are coalesced to the max frame rate
+        """
+        if x is not None:
+            self._realtime_x_given = True
         else:
-             self._axis_x_array = np.arange(len(self._axis_y_array)) 
+            x = self._realtime_data.total_appended
+        self._realtime_data.append(x, y)
+        self.schedule_realtime_refresh()
 
-        if self.max_plot_points:
-            if self._axis_y_array.size > self.max_plot_points:
-                self._axis_y_array = np.delete(self._axis_y_array, 0)
-                self._axis_x_array = np.delete(self._axis_x_array, 0)
+    def schedule_realtime_refresh(self):
+        """
+        Descript. : Schedules a redraw. A hidden canvas is not drawn, it
+                    is redrawn once with all new points when shown
+        """
+        if not self.isVisible():
+            self._realtime_pending = True
+        elif not self._redraw_timer.isActive():
+            self._redraw_timer.start()
+
+    def showEvent(self, event):
+        FigureCanvas.showEvent(self, event)
+        if self._realtime_pending:
+            self._realtime_pending = False
+            self._blit_background = None
+            QTimer.singleShot(0, self.refresh_realtime_plot)
+
+    def refresh_realtime_plot(self):
+        """
+        Descript. : Draws the content of the realtime buffer. Only the
+                    curve is redrawn (blitting) if the data fits in the
+                    axes limits. Limits grow in steps (the x span is
+                    doubled when the data overflows it), so most frames
+                    are blitted while points are appended. A full redraw
+                    sets the y limits from the data shown
+        """
+        if len(self._realtime_data) == 0:
+            return
+        if not self.isVisible():
+            self._realtime_pending = True
+            return
+
+        y_array = self._realtime_data.get_column("y")
+        if self._realtime_x_given:
+            x_array = self._realtime_data.get_column("x")
+        else:
+            x_array = np.arange(y_array.size)
 
         if self.single_curve is None:
-            self.single_curve, = self.axes.plot(self._axis_y_array,
+            self.single_curve, = self.axes.plot(x_array, y_array,
                                                 linewidth=2,
-                                                marker='s')
-        else:  
-            self.axes.fill(self._axis_y_array, 'r', linewidth=2)
-
-        self._axis_y_limits[1]= self._axis_y_array.max() + self._axis_y_array.max() * 0.05
-        self.axes.set_ylim(self._axis_y_limits) 
-        self.single_curve.set_xdata(self._axis_x_array)
-        self.single_curve.set_ydata(self._axis_y_array)
-        self.axes.relim()
-        self.axes.autoscale_view()
-        #We need to draw *and* flush
-        self.fig.canvas.draw()
-        self.fig.canvas.flush_events()
-        self.axes.grid(True)
-       
-        #TODO move y lims as propery 
-        self.axes.set_ylim((0, self._axis_y_array.max() + \
-                               self._axis_y_array.max() * 0.05))
-        #self.draw()
-        #self.set_title("Scan in progress. Please wait...")
+                                                marker='s',
+                                                animated=True)
+            self._blit_background = None
+        else:
+            self.single_curve.set_data(x_array, y_array)
+
+        #TODO move y lims as propery
+        y_max = y_array.max()
+        x_limits = self._axis_x_limits
+        if x_limits[0] is None or x_array[0] < x_limits[0] or \
+           x_array[-1] > x_limits[1]:
+            x_span = max(x_array[-1] - x_array[0], 1)
+            x_limits = [x_array[0], x_array[0] + 2 * x_span]
+        y_limits = self._axis_y_limits
+
+        if self._blit_background is not None and \
+           x_limits == self._axis_x_limits and \
+           y_limits[1] is not None and y_max <= y_limits[1]:
+            self.restore_region(self._blit_background)
+            self.axes.draw_artist(self.single_curve)
+            self.blit(self.axes.bbox)
+            self.realtime_blits += 1
+        else:
+            y_limits = [0, y_max + abs(y_max) * 0.05]
+            self._axis_x_limits = x_limits
+            self._axis_y_limits = y_limits
+            self.axes.set_xlim(x_limits)
+            self.axes.set_ylim(y_limits)
+            self.axes.grid(True)
+            #We need to draw *and* flush
+            self.draw()
+            self.realtime_draws += 1
+        self.flush_events()
+
+    def _on_draw_event(self, event):
+        """
+        Descript. : After a full draw stores the background for blitting
+                    and draws the animated realtime curve on top of it
+        """
+        if self.single_curve is not None:
+            self._blit_background = self.copy_from_bbox(self.axes.bbox)
+            self.axes.draw_artist(self.single_curve)
+            self.blit(self.axes.bbox)
 
     def set_axes_labels(self, x_label, y_label):
         self.axes.set_xlabel(x_label)
@@ -448,6 +591,21 @@ class TwoDimenisonalPlotWidget(QWidget):
         #    self.add_divider()
         #    plt.colorbar(im, cax = self.cax)
 
+    def update_result_values(self, rows, cols, values):
+        """
+        Descript. : Writes values in the displayed image data and schedules
+                    a redraw. Returns False if there is no image to update
+        """
+        if self.im is None:
+            return False
+
+        image_data = self.im.get_array()
+        image_data[rows, cols] = values
+        self.im.changed()
+        self.im.autoscale()
+        self.mpl_canvas.draw_idle()
+        return True
+
     def get_current_coord(self):
         return self.mpl_canvas.get_mouse_coord()
 
@@ -0,0 +1,165 @@
+#
+#  Project: MXCuBE
+#  https://github.com/mxcube.
+#
+#  This file is part of MXCuBE software.
+#
+#  MXCuBE is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MXCuBE is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MXCuBE. If not, see <http://www.gnu.org/licenses/>.
+#
+#  Please user PEP 0008 -- "Style Guide for Python Code" to format code
+#  https://www.python.org/dev/peps/pep-0008/
+
+"""
+Index of the path templates of the queue used to detect path collisions.
+
+Two path templates collide if they have the same directory, prefix and
+run number and their image ranges overlap (same rule as
+PathTemplate.intersection). Templates are hashed by (directory, prefix,
+run number) and the image ranges of a group are kept sorted by their
+first image, so a collision test is a dict lookup and a binary search.
+Groups touched since the last validation are kept as dirty, so only the
+items of these groups need to be revalidated.
+"""
+
+import os
+import bisect
+
+
+__credits__ = ["MxCuBE colaboration"]
+__version__ = "2.3"
+__status__ = "Production"
+
+
+def get_path_group_key(path_template):
+    """Returns (directory, prefix, run number) of a path template"""
+    return (os.path.normpath(path_template.directory),
+            path_template.get_prefix(),
+            path_template.run_number)
+
+
+def get_image_range(path_template):
+    """Returns [first image, last image + 1) of a path template"""
+    start = int(path_template.start_num)
+    return (start, start + int(path_template.num_files))
+
+
+class PathCollisionIndex(object):
+    """Hashed interval index of path templates"""
+
+    def __init__(self):
+        # owner key -> (group key, start, end, id of path template)
+        self.entries = {}
+        # group key -> sorted list of (start, end, owner key)
+        self.groups = {}
+        # group key -> longest image range of the group
+        self.max_range = {}
+        # id of path template -> owner key
+        self.template_owners = {}
+        self.dirty_groups = set()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        self.groups.clear()
+        self.max_range.clear()
+        self.template_owners.clear()
+        self.dirty_groups.clear()
+
+    def add(self, owner_key, path_template):
+        """Adds or updates the path template of an owner (tree item)"""
+        if owner_key in self.entries:
+            self.remove(owner_key)
+        group_key = get_path_group_key(path_template)
+        start, end = get_image_range(path_template)
+
+        self.entries[owner_key] = (group_key, start, end, id(path_template))
+        self.template_owners[id(path_template)] = owner_key
+        bisect.insort(self.groups.setdefault(group_key, []),
+                      (start, end, owner_key))
+        self.max_range[group_key] = max(self.max_range.get(group_key, 0),
+                                        end - start)
+        self.dirty_groups.add(group_key)
+
+    def remove(self, owner_key):
+        """Removes the path template of an owner"""
+        entry = self.entries.pop(owner_key, None)
+        if entry is None:
+            return
+        group_key, start, end, template_id = entry
+        if self.template_owners.get(template_id) == owner_key:
+            del self.template_owners[template_id]
+        intervals = self.groups[group_key]
+        index = bisect.bisect_left(intervals, (start, end, owner_key))
+        if index < len(intervals) and intervals[index][2] == owner_key:
+            del intervals[index]
+        else:
+            intervals.remove((start, end, owner_key))
+        if not intervals:
+            del self.groups[group_key]
+            del self.max_range[group_key]
+        self.dirty_groups.add(group_key)
+
+    def update(self, owner_key, path_template):
+        """Updates an owner if its path template has been edited.
+           Returns True if the template has changed
+        """
+        entry = self.entries.get(owner_key)
+        if entry is not None and \
+           entry == (get_path_group_key(path_template),) + \
+                    get_image_range(path_template) + (id(path_template),):
+            return False
+        self.add(owner_key, path_template)
+        return True
+
+    def get_group_key(self, owner_key):
+        entry = self.entries.get(owner_key)
+        if entry is not None:
+            return entry[0]
+
+    def collides(self, path_template, owner_key=None):
+        """Returns True if the path template collides with the template
+           of another owner. If owner_key is None and the template is
+           indexed, its owner is excluded
+        """
+        if owner_key is None:
+            owner_key = self.template_owners.get(id(path_template))
+        group_key = get_path_group_key(path_template)
+        intervals = self.groups.get(group_key)
+        if not intervals:
+            return False
+        start, end = get_image_range(path_template)
+
+        # intervals starting before end, an interval can only reach
+        # start if it starts after start - max_range
+        index = bisect.bisect_left(intervals, (end, ))
+        min_start = start - self.max_range[group_key]
+        while index > 0:
+            index -= 1
+            other_start, other_end, other_key = intervals[index]
+            if other_start < min_start:
+                break
+            if other_end > start and other_key != owner_key:
+                return True
+        return False
+
+    def take_dirty_owners(self):
+        """Returns owner keys of the groups changed since the last call"""
+        owners = []
+        for group_key in self.dirty_groups:
+            for interval in self.groups.get(group_key, ()):
+                owners.append(interval[2])
+        self.dirty_groups.clear()
+        return owners
@@ -0,0 +1,80 @@
+#
+#  Project: MXCuBE
+#  https://github.com/mxcube.
+#
+#  This file is part of MXCuBE software.
+#
+#  MXCuBE is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MXCuBE is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MXCuBE. If not, see <http://www.gnu.org/licenses/>.
+#
+#  Please user PEP 0008 -- "Style Guide for Python Code" to format code
+#  https://www.python.org/dev/peps/pep-0008/
+
+"""
+Scene snapshots shared by the queue model nodes of a user action.
+
+A user action that creates many nodes (a template applied to a basket,
+a paste on several samples, a diffraction plan sync) captures the scene
+once: the snapshot taken in the first call of get_scene_snapshot is
+returned to all the following calls of the same action, so all created
+nodes share one image by reference. The store keeps no reference to a
+snapshot once its action has ended, the image lives as long as the
+nodes using it.
+"""
+
+
+__credits__ = ["MxCuBE colaboration"]
+__version__ = "2.3"
+__status__ = "Production"
+
+
+class SnapshotStore(object):
+    """Per action snapshot capture"""
+
+    def __init__(self):
+        self.action_depth = 0
+        self.action_snapshot = None
+
+        self.captured = 0
+        self.shared = 0
+
+    def begin_action(self):
+        """Starts a user action, snapshots are captured once per action.
+           Actions can be nested, the outermost one defines the capture
+        """
+        self.action_depth += 1
+
+    def end_action(self):
+        """Ends a user action"""
+        self.action_depth = max(0, self.action_depth - 1)
+        if self.action_depth == 0:
+            self.action_snapshot = None
+
+    def get_scene_snapshot(self, graphics_hwobj):
+        """Returns the snapshot of the current action. The scene is
+           captured if there is no action or at the first call of it
+        """
+        if self.action_snapshot is not None:
+            self.shared += 1
+            return self.action_snapshot
+
+        image = graphics_hwobj.get_scene_snapshot()
+        self.captured += 1
+        if self.action_depth > 0:
+            self.action_snapshot = image
+        return image
+
+    def get_counters(self):
+        """Returns dict with captured and shared snapshot counts"""
+        return {"captured": self.captured,
+                "shared": self.shared}
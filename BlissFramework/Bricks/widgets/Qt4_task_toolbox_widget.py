@@ -321,47 +321,57 @@ class TaskToolBoxWidget(QWidget):
                     warning("Select the sample or group you "\
                             "would like to add to.")
             else:
-                for item in items:
-                    shapes = self.graphics_manager_hwobj.get_selected_points()
-                    task_model = item.get_model()
-
-                    # TODO Consider if GPhL workflow needs task-per-shape
-                    # like xrf does
-
-                    # Create a new group if sample is selected
-                    if isinstance(task_model, queue_model_objects.Sample):
-                        task_model = self.create_task_group(task_model)
-                        if self.tool_box.currentWidget() in (self.discrete_page, 
-                           self.char_page, self.energy_scan_page, 
-                           self.xrf_spectrum_page) and len(shapes):
-                            #This could be done in more nicer way...
-                            for shape in shapes:
-                                self.create_task(task_model, shape)
-                        else:
-                            self.create_task(task_model)
-                    elif isinstance(task_model, queue_model_objects.Basket):
-                        for sample_node in task_model.get_sample_list():
-                            child_task_model = self.create_task_group(sample_node)
-                            if self.tool_box.currentWidget() in (self.discrete_page,
-                               self.char_page, self.energy_scan_page, 
-                               self.xrf_spectrum_page) and len(shapes):
-                                for shape in shapes:
-                                    self.create_task(child_task_model, shape)
-                            else:
-                                self.create_task(child_task_model)
-                    else:
-                        if self.tool_box.currentWidget() in (self.discrete_page,
-                           self.char_page, self.energy_scan_page, 
-                           self.xrf_spectrum_page) and len(shapes):
-                            for shape in shapes:
-                                self.create_task(task_model, shape)
-                        else:
-                             self.create_task(task_model)
+                # One scene snapshot is shared by all created tasks
+                snapshot_store = self.tree_brick.dc_tree_widget.snapshot_store
+                snapshot_store.begin_action()
+                try:
+                    self.create_tasks(items)
+                finally:
+                    snapshot_store.end_action()
                 self.tree_brick.select_last_added_item()
 
             self.tool_box.currentWidget().update_selection()
 
-    def create_task_group(self, task_model):
+    def create_tasks(self, items):
+        """Creates tasks of the current page for the selected items in
+           one bulk update of the tree. Each node is added to the queue
+           model before the next one is built, so that run numbers taken
+           from the queue model are not given twice
+        """
+        shapes = self.graphics_manager_hwobj.get_selected_points()
+        # TODO Consider if GPhL workflow needs task-per-shape
+        # like xrf does
+        if not (self.tool_box.currentWidget() in (self.discrete_page,
+                self.char_page, self.energy_scan_page,
+                self.xrf_spectrum_page) and len(shapes)):
+            shapes = [None]
+
+        dc_tree_widget = self.tree_brick.dc_tree_widget
+        dc_tree_widget.begin_bulk_update()
+        try:
+            for item in items:
+                task_model = item.get_model()
+
+                # Create a new group per sample if sample or basket
+                # is selected
+                if isinstance(task_model, queue_model_objects.Sample):
+                    sample_list = [task_model]
+                elif isinstance(task_model, queue_model_objects.Basket):
+                    sample_list = task_model.get_sample_list()
+                else:
+                    for shape in shapes:
+                        self.create_task(task_model, shape)
+                    continue
+
+                for sample in sample_list:
+                    group_task_node = self.create_task_group(sample)
+                    for shape in shapes:
+                        self.create_task(group_task_node, shape)
+        finally:
+            dc_tree_widget.end_bulk_update()
+
+    def build_task_group(self, task_model):
+        """Returns a new task group for the sample task_model"""
         group_task_node = queue_model_objects.TaskGroup()
         current_item = self.tool_box.currentWidget()
 
@@ -370,27 +380,25 @@ class TaskToolBoxWidget(QWidget):
         num = task_model.get_next_number_for_name(group_name)
         group_task_node.set_number(num)
 
-        self.tree_brick.queue_model_hwobj.\
-            add_child(task_model, group_task_node)
-
         return group_task_node
 
-
-    def create_task(self, task_node, shape = None):
+    def build_task(self, task_node, shape=None):
+        """Returns a list of (parent node, new node). For a task group
+           the tasks of the current page are created, for a task a copy
+           is made
+        """
         # Selected item is a task group
         if isinstance(task_node, queue_model_objects.TaskGroup):
             sample = task_node.get_parent()
             task_list = self.tool_box.currentWidget().\
                 create_task(sample, shape)
 
-            for child_task_node in task_list:
-                self.tree_brick.queue_model_hwobj.\
-                     add_child(task_node, child_task_node)
+            return [(task_node, child_task_node) for child_task_node \
+                    in task_list or []]
         # The selected item is a task, make a copy.
         else:
             new_node = self.tree_brick.queue_model_hwobj.copy_node(task_node)
-            new_snapshot = self._beamline_setup_hwobj.\
-                shape_history_hwobj.get_scene_snapshot()
+            new_snapshot = self.tree_brick.dc_tree_widget.get_scene_snapshot()
             
             if isinstance(task_node, queue_model_objects.Characterisation):
                 new_node.reference_image_collection.acquisitions[0].\
@@ -403,7 +411,18 @@ class TaskToolBoxWidget(QWidget):
                                      queue_model_objects.XRFSpectrum):
                 new_node.centred_position.snapshot_image = new_snapshot
 
-            self.tree_brick.queue_model_hwobj.add_child(task_node.get_parent(), new_node)
+            return [(task_node.get_parent(), new_node)]
+
+    def create_task_group(self, task_model):
+        group_task_node = self.build_task_group(task_model)
+        self.tree_brick.queue_model_hwobj.\
+            add_child(task_model, group_task_node)
+
+        return group_task_node
+
+    def create_task(self, task_node, shape = None):
+        self.tree_brick.dc_tree_widget.add_nodes(\
+             self.build_task(task_node, shape))
 
     def collect_now_button_click(self):
         if self.is_running:
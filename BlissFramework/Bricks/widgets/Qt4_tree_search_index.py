@@ -0,0 +1,279 @@
+#
+#  Project: MXCuBE
+#  https://github.com/mxcube.
+#
+#  This file is part of MXCuBE software.
+#
+#  MXCuBE is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MXCuBE is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MXCuBE. If not, see <http://www.gnu.org/licenses/>.
+#
+#  Please user PEP 0008 -- "Style Guide for Python Code" to format code
+#  https://www.python.org/dev/peps/pep-0008/
+
+"""
+Search index of the sample tree used by the tree filter.
+
+For every tree item the index keeps the searched values (sample name,
+protein acronym, basket index and item type) and the key of its parent.
+For every parent it keeps the number of visible children, so empty
+baskets and data collection groups are hidden without rescanning the
+tree. Filtering only touches the items whose visibility changes and a
+growing text query only retests the samples that matched before.
+"""
+
+import Qt4_queue_item
+
+
+__credits__ = ["MxCuBE colaboration"]
+__version__ = "2.3"
+__status__ = "Production"
+
+
+# Filter indexes of the tree brick filter combo
+(FILTER_NONE, FILTER_STAR, FILTER_SAMPLE_NAME, FILTER_PROTEIN_NAME,
+ FILTER_BASKET_INDEX, FILTER_EXECUTED, FILTER_NOT_EXECUTED, FILTER_OSC,
+ FILTER_HELICAL, FILTER_CHARACTERISATION, FILTER_ENERGY_SCAN,
+ FILTER_XRF_SPECTRUM) = range(12)
+
+TEXT_FILTERS = (FILTER_SAMPLE_NAME, FILTER_PROTEIN_NAME, FILTER_BASKET_INDEX)
+
+# Items that are not filtered by the item filters
+UNFILTERED_ITEM_TYPES = (Qt4_queue_item.TaskQueueItem,
+                         Qt4_queue_item.SampleQueueItem,
+                         Qt4_queue_item.BasketQueueItem,
+                         Qt4_queue_item.DataCollectionGroupQueueItem)
+
+# Items hidden when all their children are hidden. Groups are
+# updated before baskets
+CONTAINER_ITEM_TYPES = (Qt4_queue_item.DataCollectionGroupQueueItem,
+                        Qt4_queue_item.BasketQueueItem)
+
+
+class TreeSearchEntry(object):
+    """Searched values of one tree item"""
+
+    __slots__ = ("item", "parent_key", "item_type", "is_sample",
+                 "is_basket", "name", "acronym", "basket_index")
+
+    def __init__(self, item, parent_key):
+        self.item = item
+        self.parent_key = parent_key
+        self.item_type = type(item)
+        self.is_sample = isinstance(item, Qt4_queue_item.SampleQueueItem)
+        self.is_basket = isinstance(item, Qt4_queue_item.BasketQueueItem)
+        self.update()
+
+    def update(self):
+        """Reads the searched values from the item model"""
+        model = self.item.get_model()
+        self.name = ""
+        self.acronym = ""
+        self.basket_index = None
+
+        if self.is_sample:
+            self.name = str(model.get_display_name())
+            try:
+                self.acronym = str(model.crystals[0].protein_acronym)
+            except (AttributeError, IndexError):
+                pass
+        elif self.is_basket:
+            try:
+                self.basket_index = model.location[0]
+            except (AttributeError, IndexError, TypeError):
+                pass
+
+
+class TreeSearchIndex(object):
+    """Search index and filter state of the sample tree"""
+
+    def __init__(self):
+        self.entries = {}
+        self.hidden = set()
+        self.visible_children = {}
+
+        self.filter_index = FILTER_NONE
+        self.filter_text = ""
+        self.text_matches = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        """Clears the index and the filter state"""
+        self.entries.clear()
+        self.hidden.clear()
+        self.visible_children.clear()
+        self.text_matches = None
+
+    def add(self, key, item, parent_key):
+        """Adds a visible item"""
+        if key in self.entries:
+            self.remove(key)
+        self.entries[key] = TreeSearchEntry(item, parent_key)
+        if parent_key is not None:
+            self.visible_children[parent_key] = \
+                self.visible_children.get(parent_key, 0) + 1
+        self.text_matches = None
+
+    def remove(self, key):
+        """Removes an item"""
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        if key in self.hidden:
+            self.hidden.discard(key)
+        elif entry.parent_key in self.visible_children:
+            self.visible_children[entry.parent_key] -= 1
+        self.visible_children.pop(key, None)
+        if self.text_matches is not None:
+            self.text_matches.discard(key)
+
+    def update(self, key):
+        """Updates searched values of an item"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry.update()
+            self.text_matches = None
+
+    def set_hidden(self, key, hidden, update_model=True):
+        """Hides or shows an item and updates the parent counter.
+           Returns True if the visibility has changed
+        """
+        if (key in self.hidden) == hidden:
+            return False
+        entry = self.entries[key]
+        if hidden:
+            self.hidden.add(key)
+            delta = -1
+        else:
+            self.hidden.discard(key)
+            delta = 1
+        if entry.parent_key in self.visible_children:
+            self.visible_children[entry.parent_key] += delta
+        entry.item.set_filtered(hidden, update_model)
+        return True
+
+    def is_hidden_by_filter(self, entry, filter_index, text):
+        """Returns True if the item does not pass the filter"""
+        item = entry.item
+        if filter_index == FILTER_NONE:
+            return False
+        elif filter_index == FILTER_SAMPLE_NAME:
+            if entry.is_sample:
+                return not text in entry.name
+            return False
+        elif filter_index == FILTER_PROTEIN_NAME:
+            if entry.is_sample:
+                return not text in entry.acronym
+            return False
+        elif filter_index == FILTER_BASKET_INDEX:
+            if entry.is_basket:
+                if text.isdigit():
+                    # Display one basket
+                    return int(text) != entry.basket_index
+                # Display several baskets. Separated with ","
+                basket_list = [index.strip() for index in text.split(",")]
+                if len(basket_list) > 1:
+                    return str(entry.basket_index) not in basket_list
+            return False
+
+        if entry.item_type in UNFILTERED_ITEM_TYPES:
+            return False
+
+        is_dc = isinstance(item, Qt4_queue_item.DataCollectionQueueItem)
+        if filter_index == FILTER_STAR:
+            return not item.has_star()
+        elif filter_index == FILTER_EXECUTED:
+            return is_dc and not item.get_model().is_executed()
+        elif filter_index == FILTER_NOT_EXECUTED:
+            return is_dc and item.get_model().is_executed()
+        elif filter_index == FILTER_OSC:
+            return not is_dc or item.get_model().is_helical()
+        elif filter_index == FILTER_HELICAL:
+            return not is_dc or not item.get_model().is_helical()
+        elif filter_index == FILTER_CHARACTERISATION:
+            return not isinstance(item, Qt4_queue_item.CharacterisationQueueItem)
+        elif filter_index == FILTER_ENERGY_SCAN:
+            return not isinstance(item, Qt4_queue_item.EnergyScanQueueItem)
+        elif filter_index == FILTER_XRF_SPECTRUM:
+            return not isinstance(item, Qt4_queue_item.XRFSpectrumQueueItem)
+        return False
+
+    def apply_filter(self, filter_index, text=""):
+        """Applies the filter and returns the number of items whose
+           visibility has changed. If the text of a name filter grows,
+           only the samples that matched the previous text are tested
+        """
+        text = str(text)
+        refine = filter_index == self.filter_index and \
+                 filter_index in (FILTER_SAMPLE_NAME, FILTER_PROTEIN_NAME) and \
+                 self.text_matches is not None and \
+                 self.filter_text in text
+
+        if refine:
+            keys = list(self.text_matches)
+        else:
+            keys = list(self.entries.keys())
+
+        changed_parents = set()
+        num_changed = 0
+        for key in keys:
+            entry = self.entries[key]
+            if entry.item_type in CONTAINER_ITEM_TYPES:
+                continue
+            if self.set_hidden(key, self.is_hidden_by_filter(entry,
+                                                             filter_index,
+                                                             text)):
+                changed_parents.add(entry.parent_key)
+                num_changed += 1
+
+        if refine:
+            containers = [key for key in changed_parents \
+                          if key in self.entries]
+        else:
+            containers = [key for key, entry in self.entries.items() \
+                          if entry.item_type in CONTAINER_ITEM_TYPES]
+        num_changed += self.update_containers(containers, filter_index, text)
+
+        self.filter_index = filter_index
+        self.filter_text = text
+        if filter_index in (FILTER_SAMPLE_NAME, FILTER_PROTEIN_NAME):
+            self.text_matches = set(key for key in keys \
+                if key not in self.hidden and self.entries[key].is_sample)
+        else:
+            self.text_matches = None
+
+        return num_changed
+
+    def update_containers(self, keys, filter_index=None, text=None):
+        """Hides containers (groups and baskets) without visible children.
+           Without filter every container is shown, empty ones included
+        """
+        if filter_index is None:
+            filter_index = self.filter_index
+            text = self.filter_text
+
+        num_changed = 0
+        for container_type in CONTAINER_ITEM_TYPES:
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is None or entry.item_type is not container_type:
+                    continue
+                if filter_index == FILTER_NONE:
+                    hide = False
+                else:
+                    hide = self.visible_children.get(key, 0) == 0 or \
+                        self.is_hidden_by_filter(entry, filter_index, text)
+                if self.set_hidden(key, hide):
+                    num_changed += 1
+        return num_changed
@@ -34,6 +34,8 @@ from HardwareRepository import HardwareRepository
 from HardwareRepository.BaseHardwareObjects import HardwareObject
 from BlissFramework.Utils import PropertyBag
 from BlissFramework.Utils import Connectable
+from BlissFramework.Utils import StartupProfiler
+from BlissFramework.Utils.EventJournal import EventJournal
 from BlissFramework import get_splash_screen
 
 try:
@@ -47,6 +49,14 @@ except ImportError:
 
 _emitterCache = weakref.WeakKeyDictionary()
 
+# bounds of the events cache used in slave mode (None means no bound)
+EVENTS_CACHE_MAX_SIZE = 10000
+EVENTS_CACHE_MAX_AGE = None
+# number of cached events replayed per event loop iteration
+EVENTS_REPLAY_CHUNK_SIZE = 50
+# default rate (Hz) of hardware object signals connected with coalesce=True
+SIGNAL_DEFAULT_MAX_RATE = 25
+
 
 class _QObject(QObject):
     def __init__(self, *args, **kwargs):
@@ -140,6 +150,17 @@ def WeakMethod(f):
     return WeakMethodBound(f)
 
 
+def event_key(method):
+    """
+    Descript. : Returns the events cache key of a slot: slot name and
+                receiver object
+    """
+    receiver = getattr(method, "__self__", None)
+    if receiver is None:
+        return method
+    return (getattr(method, "__name__", None), id(receiver))
+
+
 class SignalSlotFilter:
     def __init__(self, signal, slot, should_cache):
         """
@@ -147,6 +168,7 @@ class SignalSlotFilter:
         """
         self.signal = signal
         self.slot = WeakMethod(slot)
+        self.key = (signal, event_key(slot))
         self.should_cache = should_cache
 
     def __call__(self, *args):
@@ -156,14 +178,74 @@ class SignalSlotFilter:
         if (BlissWidget._instanceMode == BlissWidget.INSTANCE_MODE_SLAVE and
             BlissWidget._instanceMirror == BlissWidget.INSTANCE_MIRROR_PREVENT):
             if self.should_cache:
-                BlissWidget._eventsCache[self.slot] = \
-                    (time.time(), self.slot, args)
+                BlissWidget._eventsCache.add(self.key, time.time(),
+                                             self.slot, args)
                 return
 
+        # a cached event would be older than this one
+        BlissWidget._eventsCache.discard(self.key)
+        s = self.slot()
+        if s is not None:
+            s(*args)
+
+
+class RateLimitedSlot:
+    def __init__(self, signal, slot, max_rate):
+        """
+        Descript. : Delivers only the latest arguments of a signal to
+                    the slot, at most max_rate times per second
+        """
+        self.signal = signal
+        self.slot = WeakMethod(slot)
+        self.slot_name = getattr(slot, "__name__", str(slot))
+        self.period = 1.0 / max_rate
+        self.last_args = None
+        self.pending = False
+        self.last_delivery_time = 0
+        self.received = 0
+        self.delivered = 0
+
+    def __call__(self, *args):
+        """
+        Descript. : Keeps the arguments and schedules the delivery
+        """
+        self.received += 1
+        self.last_args = args
+        if not self.pending:
+            self.pending = True
+            delay = self.last_delivery_time + self.period - time.time()
+            QTimer.singleShot(max(0, int(delay * 1000)), self.deliver)
+
+    def deliver(self):
+        """
+        Descript. : Calls the slot with the latest arguments
+        """
+        self.pending = False
+        if self.last_args is None:
+            return
+        args = self.last_args
+        self.last_args = None
+        self.last_delivery_time = time.time()
         s = self.slot()
         if s is not None:
+            self.delivered += 1
             s(*args)
 
+    def cancel(self):
+        """
+        Descript. : Drops the pending arguments
+        """
+        self.last_args = None
+
+    def get_counters(self):
+        """
+        Descript. : Returns dict with received and delivered events
+        """
+        return {"signal": self.signal,
+                "slot": self.slot_name,
+                "received": self.received,
+                "delivered": self.delivered}
+
 
 class BlissWidget(Connectable.Connectable, QFrame):
     (INSTANCE_ROLE_UNKNOWN, INSTANCE_ROLE_SERVER, INSTANCE_ROLE_SERVERSTARTING,
@@ -183,11 +265,15 @@ class BlissWidget(Connectable.Connectable, QFrame):
     _instanceUserId = INSTANCE_USERID_UNKNOWN
     _instanceMirror = INSTANCE_MIRROR_UNKNOWN
     _filterInstalled = False
-    _eventsCache = {}
+    _eventsCache = EventJournal(EVENTS_CACHE_MAX_SIZE, EVENTS_CACHE_MAX_AGE)
+    _eventsReplayScheduled = False
     _menuBackgroundColor = None
     _menuBar = None
     _statusBar = None
     _progressBar = None
+    _topLevelWidget = None
+    _instances = weakref.WeakSet()
+    _bricks = weakref.WeakValueDictionary()
 
     _applicationEventFilter = InstanceEventFilter(None)
 
@@ -628,22 +714,55 @@ class BlissWidget(Connectable.Connectable, QFrame):
                 widget.setWhatsThis(msg)
         QWhatsThis.enterWhatsThisMode()
 
+    @staticmethod
+    def set_top_level_widget(widget):
+        """
+        Descript. : Registers the top level display (widget that has
+                    the gui configuration)
+        """
+        BlissWidget._topLevelWidget = widget
+
+    @staticmethod
+    def get_top_level_widget():
+        """
+        Descript. : Returns the registered top level display. If none
+                    is registered widgets are scanned once
+        """
+        if BlissWidget._topLevelWidget is None:
+            for widget in QApplication.allWidgets():
+                if hasattr(widget, "configuration"):
+                    BlissWidget._topLevelWidget = widget
+                    break
+        return BlissWidget._topLevelWidget
+
+    @staticmethod
+    def get_brick(brick_name):
+        """
+        Descript. : Returns the brick registered with brick_name or None
+        """
+        return BlissWidget._bricks.get(str(brick_name))
+
+    @staticmethod
+    def get_instances():
+        """
+        Descript. : Returns the list of existing BlissWidget instances
+        """
+        return list(BlissWidget._instances)
+
     @staticmethod
     def update_widget(brick_name, widget_name, method_name,
                       method_args, master_sync):
         """Updates widget
         """
-        for widget in QApplication.allWidgets():
-            if hasattr(widget, "configuration"):
-                top_level_widget = widget
-                break
         if not master_sync or BlissWidget._instanceMode == \
                               BlissWidget.INSTANCE_MODE_MASTER:
-            top_level_widget.brickChangedSignal.emit(brick_name,
-                                                     widget_name,
-                                                     method_name,
-                                                     method_args,
-                                                     master_sync)
+            top_level_widget = BlissWidget.get_top_level_widget()
+            if top_level_widget is not None:
+                top_level_widget.brickChangedSignal.emit(brick_name,
+                                                         widget_name,
+                                                         method_name,
+                                                         method_args,
+                                                         master_sync)
 
     @staticmethod
     def update_tab_widget(tab_name, tab_index):
@@ -651,20 +770,20 @@ class BlissWidget(Connectable.Connectable, QFrame):
         Descript. :
         """
         if BlissWidget._instanceMode == BlissWidget.INSTANCE_MODE_MASTER:
-            for widget in QApplication.allWidgets():
-                if hasattr(widget, "configuration"):
-                    widget.tabChangedSignal.emit(tab_name, tab_index)
+            top_level_widget = BlissWidget.get_top_level_widget()
+            if top_level_widget is not None:
+                top_level_widget.tabChangedSignal.emit(tab_name, tab_index)
 
     @staticmethod
     def widgetGroupBoxToggled(brick_name, widget_name, master_sync, state):
         """
         Descript. :
         """
-        BlissWidget.updateWidget(brick_name,
-                                 widget_name,
-                                 "setChecked",
-                                 (state,),
-                                 master_sync)
+        BlissWidget.update_widget(brick_name,
+                                  widget_name,
+                                  "setChecked",
+                                  (state,),
+                                  master_sync)
 
     @staticmethod
     def widget_combobox_activated(brick_name, widget_name, widget, master_sync, index):
@@ -754,35 +873,76 @@ class BlissWidget(Connectable.Connectable, QFrame):
     @staticmethod
     def addEventToCache(timestamp, method, *args):
         """
-        Descript. :
+        Descript. : Caches an event, only the last event of a slot and
+                    receiver is kept
         """
         try:
             method_to_add = WeakMethod(method)
         except TypeError:
-            methos_to_add = method
-        BlissWidget._eventsCache[m] = (timestamp, methos_to_add, args)
+            method_to_add = lambda: method
+        BlissWidget._eventsCache.add(event_key(method), timestamp,
+                                     method_to_add, args)
+
+    @staticmethod
+    def set_events_cache_bounds(max_size=None, max_age=None):
+        """
+        Descript. : Sets the maximal number of cached events and their
+                    maximal age in seconds (None means no bound)
+        """
+        BlissWidget._eventsCache.set_bounds(max_size, max_age)
+
+    @staticmethod
+    def get_events_cache_counters():
+        """
+        Descript. : Returns cached, compacted, dropped, replayed and
+                    pending event counts
+        """
+        return BlissWidget._eventsCache.get_counters()
 
     @staticmethod
     def synchronize_with_cache():
+        """
+        Descript. : Replays cached events in chunks of
+                    EVENTS_REPLAY_CHUNK_SIZE, one chunk per event loop
+                    iteration
+        """
+        if not BlissWidget._eventsReplayScheduled:
+            BlissWidget._replay_events_chunk()
+
+    @staticmethod
+    def _replay_events_chunk():
         """
         Descript. :
         """
-        events = list(BlissWidget._eventsCache.values())
-        ordered_events = sorted(events, key=operator.itemgetter(0))
-        for event_timestamp, event_method, event_args in ordered_events:
+        BlissWidget._eventsReplayScheduled = False
+        events = BlissWidget._eventsCache.take(EVENTS_REPLAY_CHUNK_SIZE)
+        for event_timestamp, event_method, event_args in events:
             try:
                 method = event_method()
                 if method is not None:
                     method(*event_args)
+                    BlissWidget._eventsCache.replayed += 1
             except:
-                pass
-        BlissWidget._eventsCache = {}
+                logging.getLogger().debug("Could not replay cached event",
+                                          exc_info=True)
+
+        if len(BlissWidget._eventsCache) > 0:
+            BlissWidget._eventsReplayScheduled = True
+            QTimer.singleShot(0, BlissWidget._replay_events_chunk)
+        else:
+            counters = BlissWidget._eventsCache.get_counters()
+            logging.getLogger().debug("Cached events replayed: " + \
+                "%(replayed)d, compacted: %(compacted)d, " % counters + \
+                "dropped: %(dropped)d" % counters)
 
     @staticmethod
     def set_gui_enabled(enabled):
-        for widget in QApplication.allWidgets():
-            if isinstance(widget, BlissWidget):
+        for widget in BlissWidget.get_instances():
+            try:
                 widget.setEnabled(enabled)
+            except RuntimeError:
+                # underlying C++ object has been deleted
+                pass
 
     def __init__(self, parent=None, widget_name=''):
         """
@@ -793,11 +953,16 @@ class BlissWidget(Connectable.Connectable, QFrame):
         self.setObjectName(widget_name)
         self.property_bag = PropertyBag.PropertyBag()
 
+        BlissWidget._instances.add(self)
+        if widget_name:
+            BlissWidget._bricks[str(widget_name)] = self
+
         self.__enabledState = True
         self.__loaded_hardware_objects = []
         self.__failed_to_load_hwobj = False
         self.__use_progress_dialog = False
         self._signal_slot_filters = {}
+        self._rate_limited_slots = {}
         self._widget_events = []
 
         self.setWhatsThis("%s (%s)\n" % (widget_name, self.__class__.__name__))
@@ -890,9 +1055,13 @@ class BlissWidget(Connectable.Connectable, QFrame):
 
         QObject.connect(sender, signal, signal_slot_filter)
 
-    def connect_hwobj(self, sender, signal, slot, instanceFilter=False, shouldCache=True):
+    def connect_hwobj(self, sender, signal, slot, instanceFilter=False,
+                      shouldCache=True, max_rate=None, coalesce=False):
         """
-        Descript. :
+        Descript. : Connects signal of sender to slot. If max_rate (Hz)
+                    is given or coalesce is True then only the latest
+                    arguments are delivered to slot, at most max_rate
+                    (default SIGNAL_DEFAULT_MAX_RATE) times per second
         """
         if sys.version_info > (3, 0):
             signal = str(signal.decode('utf8') if \
@@ -906,6 +1075,14 @@ class BlissWidget(Connectable.Connectable, QFrame):
         else:
             pysignal = True
 
+        if max_rate or coalesce:
+            rate_limited_slot = RateLimitedSlot(signal, slot,
+                max_rate or SIGNAL_DEFAULT_MAX_RATE)
+            # keep a reference, hardware object signals use weak refs
+            self._rate_limited_slots[(id(sender), signal, hash(slot))] = \
+                rate_limited_slot
+            slot = rate_limited_slot
+
         if not isinstance(sender, QObject):
             if isinstance(sender, HardwareObject):
                 sender.connect(signal, slot)
@@ -947,6 +1124,12 @@ class BlissWidget(Connectable.Connectable, QFrame):
         else:
             pysignal = True
 
+        rate_limited_slot = self._rate_limited_slots.pop(\
+            (id(sender), signal, hash(slot)), None)
+        if rate_limited_slot is not None:
+            rate_limited_slot.cancel()
+            slot = rate_limited_slot
+
         if isinstance(sender, HardwareObject):
             sender.disconnect(sender, signal, slot)
             return
@@ -982,6 +1165,14 @@ class BlissWidget(Connectable.Connectable, QFrame):
                                       QtCore.SIGNAL(signal),
                                       signalSlotFilter)
 
+    def get_signal_rate_counters(self):
+        """
+        Descript. : Returns list of dicts with signal, slot, received
+                    and delivered events of the rate limited connections
+        """
+        return [rate_limited_slot.get_counters() for rate_limited_slot \
+                in self._rate_limited_slots.values()]
+
     """
     def get_signals(self):
         signals = []
@@ -1089,7 +1280,10 @@ class BlissWidget(Connectable.Connectable, QFrame):
         Descript. :
         """
         for prop in self.property_bag:
-            self._propertyChanged(prop.getName(), None, prop.getUserValue())
+            with StartupProfiler.span("properties", self.objectName(),
+                                      prop.getName()):
+                self._propertyChanged(prop.getName(), None,
+                                      prop.getUserValue())
 
     def addProperty(self, *args, **kwargs):
         """
@@ -1286,9 +1480,7 @@ class BlissWidget(Connectable.Connectable, QFrame):
             self.setEnabled(True)
 
     def get_window_display_widget(self):
-        for widget in QApplication.allWidgets():
-            if hasattr(widget, "configuration"):
-                return widget
+        return BlissWidget.get_top_level_widget()
 
     def set_background_color(self, color):
         Qt4_widget_colors.set_widget_color(self,
@@ -1339,6 +1531,66 @@ class NullBrick(BlissWidget):
             painter.drawLine(0, 0, self.width(), self.height())
             painter.drawLine(0, self.height(), self.width(), 0)
 
+
+class LazyBrick(BlissWidget):
+    """
+    Descript. : Placeholder of a brick that is not visible at startup.
+                The brick is loaded by the loader callback the first
+                time the placeholder is shown and is added to its layout
+    """
+
+    def __init__(self, brick_type, brick_name, loader=None):
+        """
+        Descript. :
+        """
+        BlissWidget.__init__(self, None, brick_name)
+
+        self.brick_type = brick_type
+        self.brick_name = brick_name
+        self.brick = None
+        self.loader = loader
+        self.property_bag = PropertyBag.PropertyBag()
+
+        _main_vlayout = QVBoxLayout(self)
+        _main_vlayout.setSpacing(0)
+        _main_vlayout.setContentsMargins(0, 0, 0, 0)
+        self.setSizePolicy(QSizePolicy.Expanding,
+                           QSizePolicy.Expanding)
+
+    def setPersistentPropertyBag(self, persistent_property_bag):
+        """
+        Descript. : Properties are kept untouched until the brick is loaded
+        """
+        self.property_bag = persistent_property_bag
+
+    def is_loaded(self):
+        """
+        Descript. :
+        """
+        return self.brick is not None
+
+    def load(self):
+        """
+        Descript. : Loads the brick (only once) and returns it
+        """
+        if self.brick is None and self.loader is not None:
+            self.brick = self.loader(self)
+            if self.brick is not None:
+                self.setObjectName("%s_placeholder" % self.brick_name)
+                self.layout().addWidget(self.brick)
+                self.brick.show()
+        return self.brick
+
+    def showEvent(self, event):
+        """
+        Descript. : Brick is loaded when the placeholder is shown
+                    for the first time in run mode
+        """
+        BlissWidget.showEvent(self, event)
+        if self.brick is None and self.isRunning():
+            QTimer.singleShot(0, self.load)
+
+
 def ComboBoxActivated(self, index, lines):
     """
     Descript. :
@@ -20,23 +20,258 @@
 """Configuration
 """
 
+import os
+import sys
+import ast
 import json
+import time
 import yaml
 import logging
 import imp
 import pprint
 import pickle
+import threading
 from BlissFramework.Utils import PropertyBag
+from BlissFramework.Utils import StartupProfiler
 from BlissFramework import Qt4_BaseLayoutItems
-from BlissFramework.Qt4_BaseComponents import NullBrick
+from BlissFramework.Qt4_BaseComponents import NullBrick, LazyBrick
+
+
+_preloader = None
+
+# modules creating Qt objects, they are only imported in the main thread
+QT_MODULES = ("QtImport", "qt", "sip", "PyQt4", "PyQt5", "PySide",
+              "BlissFramework")
+# installed packages known not to import Qt, other installed packages
+# (matplotlib, PyMca...) can load Qt when they are imported
+QT_FREE_PACKAGES = ("numpy", "scipy", "gevent", "greenlet", "yaml",
+                    "lxml", "PyTango", "suds")
+STDLIB_DIR = os.path.dirname(os.__file__)
+
+
+def _find_module_source(module_name, first_path=None, relative=False):
+    """Returns the source file of a module (__init__.py of a package),
+       the file of a compiled module, "" for a builtin module and None
+       if the module is not found. first_path is searched before sys.path for the first
+       component of the name (implicit relative imports), or instead of
+       sys.path if relative is True"""
+    path = None
+    if relative:
+        path = [first_path]
+    elif first_path is not None:
+        path = [first_path] + sys.path
+    source_file = ""
+    for part in module_name.split("."):
+        try:
+            fp, path_name, description = imp.find_module(part, path)
+        except ImportError:
+            return None
+        if fp:
+            fp.close()
+        if description[2] == imp.PKG_DIRECTORY:
+            path = [path_name]
+            source_file = os.path.join(path_name, "__init__.py")
+        elif description[2] in (imp.PY_SOURCE, imp.PY_COMPILED,
+                                imp.C_EXTENSION):
+            path = []
+            source_file = path_name
+        else:
+            path = []
+            source_file = ""
+    return source_file
+
+
+def _get_imported_modules(source_file):
+    """Returns the names of the modules imported by a source file (at
+       module level or not) with their source files"""
+    try:
+        with open(source_file) as module_file:
+            tree = ast.parse(module_file.read(), source_file)
+    except (IOError, SyntaxError, TypeError):
+        return []
+
+    module_dir = os.path.dirname(source_file)
+    # (module name, package directory of a relative import), the names
+    # of relative imports start with a dot
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.extend([(alias.name, None) for alias in node.names])
+        elif isinstance(node, ast.ImportFrom):
+            package_dir = None
+            if node.level:
+                package_dir = module_dir
+                for level in range(node.level - 1):
+                    package_dir = os.path.dirname(package_dir)
+            prefix = "." if node.level else ""
+            if node.module:
+                names.append((prefix + node.module, package_dir))
+                prefix += node.module + "."
+            # imported names can be submodules
+            names.extend([(prefix + alias.name, package_dir) for alias \
+                          in node.names if alias.name != "*"])
+
+    modules = []
+    for name, package_dir in names:
+        if package_dir is None:
+            source_file = _find_module_source(name, module_dir)
+        else:
+            source_file = _find_module_source(name[1:], package_dir, True)
+        if source_file is not None:
+            modules.append((name, source_file))
+    return modules
+
+
+def _is_qt_module_name(module_name):
+    return module_name.split(".")[0] in QT_MODULES or \
+           "qt" in module_name.lower()
+
+
+def _is_package_source(source_file):
+    return "site-packages" in source_file or "dist-packages" in source_file
+
+
+def _is_library_source(source_file):
+    """Returns True for the modules of the standard library and of the
+       installed packages"""
+    return not source_file or source_file.startswith(STDLIB_DIR) or \
+           _is_package_source(source_file)
+
+
+def _is_qt_free_library(module_name, source_file):
+    """Returns True for the modules of the standard library and of the
+       installed packages listed in QT_FREE_PACKAGES. The sources of
+       installed packages are not walked"""
+    if _is_package_source(source_file):
+        return module_name.split(".")[0] in QT_FREE_PACKAGES
+    return True
+
+
+class ModulePreloader(threading.Thread):
+    """Imports the dependencies of the brick modules in a worker
+       thread, in the order of the configuration, while the main thread
+       reads the configuration and requires the hardware objects.
+
+       Qt does not allow to create pixmaps or widgets outside the GUI
+       thread and GUI modules create Qt objects when they are imported
+       (icons of Qt4_queue_item for example). So the brick modules are
+       imported by the main thread. The worker walks the imports of the
+       brick modules and imports the modules that do not import Qt or
+       BlissFramework, directly or through their own imports (hardware
+       object modules, queue model, numpy...). Installed packages and
+       the standard library are not walked: the standard library and
+       the packages of QT_FREE_PACKAGES are the only libraries imported
+       by the worker"""
+
+    def __init__(self, brick_types):
+        threading.Thread.__init__(self, name="BrickPreloader")
+        self.daemon = True
+        self.brick_types = []
+        for brick_type in brick_types:
+            if brick_type not in self.brick_types:
+                self.brick_types.append(brick_type)
+        # source file -> [(module name, source file)]
+        self.imported_modules = {}
+        self.qt_free_modules = {}
+        self.walked_sources = set()
+        self.cancelled = False
+
+    def run(self):
+        for brick_type in self.brick_types:
+            source_file = _find_module_source(brick_type)
+            if not source_file:
+                continue
+            for module_name, module_source in \
+                self.walk_imported_modules(source_file):
+                if self.cancelled:
+                    return
+                if not module_name.startswith(".") and \
+                   module_name not in sys.modules and \
+                   self.is_qt_free(module_name, module_source):
+                    with StartupProfiler.span("preload", module_name):
+                        _preload_module(module_name)
+
+    def get_imported_modules(self, source_file):
+        if source_file not in self.imported_modules:
+            self.imported_modules[source_file] = \
+                _get_imported_modules(source_file)
+        return self.imported_modules[source_file]
+
+    def walk_imported_modules(self, source_file):
+        """Returns the modules imported by a module and by the modules
+           it imports, except the modules already walked"""
+        modules = []
+        pending = [source_file]
+        while pending:
+            source = pending.pop(0)
+            if source in self.walked_sources:
+                continue
+            self.walked_sources.add(source)
+            for name, module_source in self.get_imported_modules(source):
+                modules.append((name, module_source))
+                if module_source.endswith(".py") and \
+                   not _is_library_source(module_source):
+                    pending.append(module_source)
+        return modules
+
+    def is_qt_free(self, module_name, source_file):
+        """Returns True if no module imported by the module, directly
+           or not, is a Qt or BlissFramework module or an installed
+           package that is not known to be Qt free"""
+        if module_name not in self.qt_free_modules:
+            qt_free = True
+            visited = set()
+            pending = [(module_name, source_file)]
+            while pending and qt_free:
+                name, source = pending.pop()
+                if _is_qt_module_name(name) or \
+                   self.qt_free_modules.get(name) is False:
+                    qt_free = False
+                elif _is_library_source(source):
+                    qt_free = _is_qt_free_library(name, source)
+                elif not source.endswith(".py"):
+                    # compiled module of the application
+                    qt_free = False
+                elif source not in visited:
+                    visited.add(source)
+                    pending.extend(self.get_imported_modules(source))
+            self.qt_free_modules[module_name] = qt_free
+        return self.qt_free_modules[module_name]
+
+
+def _preload_module(module_name):
+    try:
+        __import__(module_name)
+    except:
+        # the error is logged when the main thread imports the module
+        pass
+
+
+def start_preloading(brick_types):
+    """Starts to import the dependencies of the brick modules in a
+       worker thread"""
+    global _preloader
+    stop_preloading()
+    _preloader = ModulePreloader(brick_types)
+    _preloader.start()
+    return _preloader
+
+
+def stop_preloading():
+    """Stops the worker after its current import"""
+    global _preloader
+    if _preloader is not None:
+        _preloader.cancelled = True
+        _preloader = None
 
 
 def loadModule(brick_name):
     """Loads module"""
     fp = None
     try:
-        fp, path_name, description = imp.find_module(brick_name)
-        mod = imp.load_module(brick_name, fp, path_name, description)
+        with StartupProfiler.span("import", brick_name):
+            fp, path_name, description = imp.find_module(brick_name)
+            mod = imp.load_module(brick_name, fp, path_name, description)
     except:
         if fp:
             fp.close()
@@ -48,6 +283,15 @@ def loadModule(brick_name):
 
 def load_brick(brick_type, brick_name):
     """Loads brick"""
+    start_time = time.time()
+    brick = _load_brick(brick_type, brick_name)
+    logging.getLogger().debug("Brick %s (%s) loaded in %.3f s" % \
+        (brick_name, brick_type, time.time() - start_time))
+    return brick
+
+
+def _load_brick(brick_type, brick_name):
+    """Imports brick module and instantiates the brick"""
     module = loadModule(brick_type)
 
     if module is not None:
@@ -61,7 +305,8 @@ def load_brick(brick_type, brick_name):
             return NullBrick(None, brick_name)
         else:
             try:
-                new_instance = class_obj(None, brick_name)
+                with StartupProfiler.span("constructor", brick_name):
+                    new_instance = class_obj(None, brick_name)
             except:
                 logging.getLogger().exception(\
                    "Cannot load brick %s : initialization failed", brick_name)
@@ -75,6 +320,22 @@ def load_brick(brick_type, brick_name):
         return NullBrick(None, brick_name)
 
 
+def hidden_at_startup(parent_type, child_index, window_shown=True):
+    """Returns True if the child is not visible when the gui starts:
+       tab pages other than the first one and windows other than the
+       main window that are not shown
+
+    :param parent_type: type of the parent item, None for windows
+    :param child_index: index of the child in the parent children
+    :param window_shown: value of the window show property
+    """
+    if parent_type == "tab":
+        return child_index > 0
+    elif parent_type is None:
+        return child_index > 0 and not window_shown
+    return False
+
+
 class Configuration:
     """Configuration of a BlissWidget"""
     classes = {"hbox": Qt4_BaseLayoutItems.ContainerCfg,
@@ -90,9 +351,10 @@ class Configuration:
                "vsplitter": Qt4_BaseLayoutItems.SplitterCfg}
 
 
-    def __init__(self, config=None, load_from_dict=None):
+    def __init__(self, config=None, load_from_dict=None, lazy=False):
         """__init__ method"""
         self.has_changed = False
+        self.lazy_bricks = {}
 
         if config is None:
             self.windows_list = []
@@ -100,7 +362,7 @@ class Configuration:
             self.bricks = {}
             self.items = {}
         else:
-            self.load(config, load_from_dict)
+            self.load(config, load_from_dict, lazy)
 
     def find_container(self, container_name):
         """Returns container
@@ -513,23 +775,32 @@ class Configuration:
 
                 return True
 
-    def load(self, config, as_json):
-        """Loads config"""
+    def load(self, config, as_json, lazy=False):
+        """Loads config
+
+        :param lazy: if True bricks hidden at startup get a LazyBrick
+                     placeholder and are loaded when shown
+        """
         self.windows_list = []
         self.windows = {}
         self.bricks = {}
         self.items = {}
+        self.lazy_bricks = {}
         self.has_changed = False
         self.windows_list = config
 
-        def load_children(children):
+        def load_children(children, parent_type=None, hidden=False):
             """Loads children"""
             index = 0
             for child in children:
                 new_item = None
 
                 if "brick" in child:
-                    brick = load_brick(child["type"], child["name"])
+                    if hidden:
+                        brick = LazyBrick(child["type"], child["name"])
+                        self.lazy_bricks[child["name"]] = brick
+                    else:
+                        brick = load_brick(child["type"], child["name"])
                     child["brick"] = brick
 
                     new_item = Qt4_BaseLayoutItems.BrickCfg(child["name"],
@@ -575,10 +846,34 @@ class Configuration:
                     #    new_item.signals = new_item_signals
                     #    children[index] = new_item
                     children[index] = new_item
-                    load_children(child["children"])
+                    child_hidden = hidden
+                    if lazy and not hidden:
+                        if parent_type is None:
+                            child_hidden = hidden_at_startup(None, index,
+                                new_item["properties"]["show"])
+                        else:
+                            child_hidden = hidden_at_startup(parent_type,
+                                                             index)
+                    load_children(child["children"], child["type"],
+                                  child_hidden)
                 index += 1
         load_children(self.windows_list)
 
+    def load_lazy_brick(self, brick_name):
+        """Loads a brick that has a LazyBrick placeholder and applies
+           the properties kept by the placeholder
+
+        :returns: loaded brick
+        """
+        placeholder = self.lazy_bricks.pop(brick_name)
+        brick_cfg = self.bricks[brick_name]
+
+        brick = load_brick(brick_cfg["type"], brick_name)
+        brick_cfg["brick"] = brick
+        brick_cfg.setProperties(placeholder.property_bag)
+
+        return brick
+
     def is_container(self, item):
         """
         :returns: True if item is container
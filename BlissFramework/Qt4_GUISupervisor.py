@@ -21,8 +21,7 @@
 
 import os
 import stat
-import json
-import yaml
+import time
 import pickle
 import logging
 import collections
@@ -33,6 +32,8 @@ from BlissFramework import Qt4_Icons
 from BlissFramework import Qt4_Configuration
 from BlissFramework import Qt4_GUIBuilder
 from BlissFramework.Utils import Qt4_GUIDisplay
+from BlissFramework.Utils import ConfigCache
+from BlissFramework.Utils import StartupProfiler
 from BlissFramework.Qt4_BaseComponents import BlissWidget
 
 from BlissFramework import set_splash_screen
@@ -105,7 +106,9 @@ class GUISupervisor(QWidget):
     brickChangedSignal = pyqtSignal(str, str, str, tuple, bool)
     tabChangedSignal = pyqtSignal(str, int)
 
-    def __init__(self, design_mode=False, show_maximized=False, no_border=False):
+    def __init__(self, design_mode=False, show_maximized=False, no_border=False,
+                 lazy_loading=False, preload_bricks=False,
+                 profile_filename=None):
         """init"""
 
         QWidget.__init__(self)
@@ -120,7 +123,11 @@ class GUISupervisor(QWidget):
         self.hardware_repository = HardwareRepository.HardwareRepository()
         self.show_maximized = show_maximized
         self.no_border = no_border
+        self.lazy_loading = lazy_loading and not design_mode
+        self.preload_bricks = preload_bricks
+        self.profile_filename = profile_filename
         self.windows = []
+        self.widgets_dict = {}
         self.splash_screen = BlissSplashScreen(Qt4_Icons.load_pixmap('splash'))
 
         set_splash_screen(self.splash_screen)
@@ -151,31 +158,63 @@ class GUISupervisor(QWidget):
                 if filestat[stat.ST_SIZE] == 0:
                     return self.new_gui()
 
+                failed_msg = "Cannot read configuration from file %s. " % \
+                             gui_config_file
+                failed_msg += "Starting in designer mode with clean GUI."
+
                 try:
-                    gui_file = open(gui_config_file)
+                    # parsed configuration with loaded property bags,
+                    # from the compiled cache if the file is unchanged
+                    with StartupProfiler.span("phase", "read configuration"):
+                        raw_config = ConfigCache.load_config(gui_config_file)
                 except:
-                    logging.getLogger().exception("Cannot open file %s",
-                                                  gui_config_file)
-                    QMessageBox.warning(self, "Error",
-                           "Could not open file %s !" % gui_config_file,
-                           QMessageBox.Ok)
+                    logging.getLogger().exception(failed_msg)
+                    QMessageBox.warning(self, "Error", failed_msg,
+                                        QMessageBox.Ok)
                 else:
                     # find mnemonics to speed up loading
                     # (using the 'require' feature from Hardware Repository)
 
-                    def __get_mnemonics(items_list):
-                        """Gets mnemonics"""
+                    def __get_window_shown(window):
+                        """Gets the show property of a window"""
+
+                        try:
+                            props = window["properties"]
+                            if isinstance(props, bytes):
+                                props = pickle.loads(props)
+                            for prop in props:
+                                if load_from_dict:
+                                    if prop["name"] == "show":
+                                        return prop["value"]
+                                elif prop.getName() == "show":
+                                    return prop.getValue()
+                        except:
+                            pass
+                        return True
+
+                    def __get_mnemonics(items_list, parent_type=None):
+                        """Gets mnemonics. With lazy loading mnemonics of
+                           bricks hidden at startup are skipped, they are
+                           required when the brick is loaded"""
 
                         mne_list = []
 
-                        for item in items_list:
+                        for index, item in enumerate(items_list):
+                            if self.lazy_loading:
+                                if parent_type is None:
+                                    hidden = Qt4_Configuration.hidden_at_startup(\
+                                        None, index, __get_window_shown(item))
+                                else:
+                                    hidden = Qt4_Configuration.hidden_at_startup(\
+                                        parent_type, index)
+                                if hidden:
+                                    continue
                             if "brick" in item:
+                                brick_types.append(item["type"])
                                 try:
-                                    if load_from_dict:
-                                        props = item["properties"]
-                                    else:
-                                        props = pickle.loads(item["properties"])
-                                    #props = pickle.loads(item["properties"].encode('utf8'))
+                                    props = item["properties"]
+                                    if isinstance(props, bytes):
+                                        props = pickle.loads(props)
                                 except:
                                     logging.getLogger().exception(\
                                         "Could not load properties for %s" % \
@@ -198,38 +237,40 @@ class GUISupervisor(QWidget):
 
                                 continue
 
-                            mne_list += __get_mnemonics(item["children"])
+                            mne_list += __get_mnemonics(item["children"],
+                                                        item["type"])
 
                         return mne_list
 
-                    failed_msg = "Cannot read configuration from file %s. " % \
-                                 gui_config_file
-                    failed_msg += "Starting in designer mode with clean GUI."
-
-                    try:
-                        if gui_config_file.endswith(".json"):
-                            raw_config = json.load(gui_file) 
-                        elif gui_config_file.endswith(".yml"):
-                            raw_config = yaml.load(gui_file)
-                        else:
-                            raw_config = eval(gui_file.read())
-                    except:
-                        logging.getLogger().exception(failed_msg)
-
                     self.splash_screen.set_message("Gathering H/O info...")
+                    brick_types = []
                     mnemonics = __get_mnemonics(raw_config)
-                    self.hardware_repository.require(mnemonics)
-                    gui_file.close()
+                    if self.preload_bricks:
+                        # Qt free dependencies of the brick modules are
+                        # imported while the hardware objects are loaded
+                        Qt4_Configuration.start_preloading(brick_types)
+                    with StartupProfiler.span("require", "%d hardware " % \
+                                              len(mnemonics) + "objects"):
+                        self.hardware_repository.require(mnemonics)
 
                     try:
                         self.splash_screen.set_message("Building GUI configuration...")
-                        config = Qt4_Configuration.Configuration(raw_config, load_from_dict)
+                        start_time = time.time()
+                        with StartupProfiler.span("phase",
+                                                  "build configuration"):
+                            config = Qt4_Configuration.Configuration(\
+                                raw_config, load_from_dict, self.lazy_loading)
+                        logging.getLogger().debug("GUI configuration " + \
+                            "built in %.3f s (%d bricks, %d loaded on demand)" % \
+                            (time.time() - start_time, len(config.bricks),
+                             len(config.lazy_bricks)))
                     except:
                         logging.getLogger().exception(failed_msg)
                         QMessageBox.warning(self, "Error", failed_msg,
                                             QMessageBox.Ok)
                     else:
                         self.configuration = config
+                    Qt4_Configuration.stop_preloading()
 
                     try:
                         user_settings_filename = os.path.join(self.user_file_dir, "settings.dat")
@@ -309,13 +350,15 @@ class GUISupervisor(QWidget):
     def execute(self, config):
         """Start in execution mode"""
         self.splash_screen.set_message("Executing configuration...")
-        self.display()
+        with StartupProfiler.span("phase", "display"):
+            self.display()
 
         main_window = None
 
         if len(self.windows) > 0:
             main_window = self.windows[0]
             main_window.configuration = config
+            BlissWidget.set_top_level_widget(main_window)
             QApplication.setActiveWindow(main_window)
             if self.no_border:
                 main_window.move(0, 0)
@@ -323,66 +366,142 @@ class GUISupervisor(QWidget):
                 height = QApplication.desktop().height()
                 main_window.resize(QSize(width, height))
 
-            # make connections
-            widgets_dict = dict([(isinstance(w.objectName, \
+            # make connections: bricks are found in the brick registry,
+            # windows and containers by object name
+            self.widgets_dict = dict([(isinstance(w.objectName, \
                 collections.Callable) and str(w.objectName()) or None, w) \
-                for w in QApplication.allWidgets()])
+                for w in QApplication.allWidgets() \
+                if not isinstance(w, BlissWidget)])
 
             def make_connections(items_list):
                 """Creates connections"""
 
                 for item in items_list:
-                    try:
-                        sender = widgets_dict[item["name"]]
-                    except KeyError:
-                        logging.getLogger().error(\
-                            "Could not find receiver widget %s" % \
-                            item["name"])
-                    else:
-                        for connection in item["connections"]:
-                            _receiver = connection["receiver"] or \
-                                connection["receiverWindow"]
-                            try:
-                                receiver = widgets_dict[_receiver]
-                            except KeyError:
-                                logging.getLogger().error("Could not find " + \
-                                   "receiver widget %s", _receiver)
-                            else:
-                                try:
-                                    slot = getattr(receiver, connection["slot"])
-                                    #etattr(sender, connection["signal"]).connect(slot)
-                                except AttributeError:
-                                    logging.getLogger().error(\
-                                       "No slot '%s' " % connection["slot"] + \
-                                       "in receiver %s" % _receiver)
-                                else:
-                                    getattr(sender, connection["signal"]).connect(slot)
-                                    #sender.connect(sender,
-                                    #    QtCore.SIGNAL(connection["signal"]),
-                                    #    slot)
+                    if item["name"] not in config.lazy_bricks:
+                        sender = self.get_widget(item["name"])
+                        if sender is None:
+                            logging.getLogger().error(\
+                                "Could not find receiver widget %s" % \
+                                item["name"])
+                        else:
+                            for connection in item["connections"]:
+                                self.make_connection(sender, connection)
                     make_connections(item["children"])
 
+            for brick in config.lazy_bricks.values():
+                brick.loader = self.load_lazy_brick
+
             self.splash_screen.set_message("Connecting bricks...")
-            make_connections(config.windows_list)
+            with StartupProfiler.span("phase", "connections"):
+                make_connections(config.windows_list)
 
             # set run mode for every brick
             self.splash_screen.set_message("Setting run mode...")
-            BlissWidget.setRunMode(True)
+            with StartupProfiler.span("phase", "run mode"):
+                BlissWidget.setRunMode(True)
 
-            if self.show_maximized:
-                main_window.showMaximized()
-            else:
-                main_window.show()
+            with StartupProfiler.span("phase", "show windows"):
+                if self.show_maximized:
+                    main_window.showMaximized()
+                else:
+                    main_window.show()
 
-            for window in self.windows:
-                if window._show:
-                    window.show()
+                for window in self.windows:
+                    if window._show:
+                        window.show()
 
         if BlissWidget._menuBar:
             BlissWidget._menuBar.set_exp_mode(False)
 
         return main_window
 
+    def get_widget(self, widget_name):
+        """Returns the brick registered with widget_name, or the window
+           or container with that name. None if there is none"""
+
+        widget = BlissWidget.get_brick(widget_name)
+        if widget is None:
+            widget = self.widgets_dict.get(widget_name)
+        return widget
+
+    def make_connection(self, sender, connection):
+        """Connects sender signal to the receiver slot. Connections to
+           bricks that are not loaded yet are made when they are loaded"""
+
+        _receiver = connection["receiver"] or connection["receiverWindow"]
+        if _receiver in self.configuration.lazy_bricks:
+            return
+        receiver = self.get_widget(_receiver)
+        if receiver is None:
+            logging.getLogger().error("Could not find " + \
+               "receiver widget %s", _receiver)
+        else:
+            try:
+                slot = getattr(receiver, connection["slot"])
+            except AttributeError:
+                logging.getLogger().error(\
+                   "No slot '%s' " % connection["slot"] + \
+                   "in receiver %s" % _receiver)
+            else:
+                getattr(sender, connection["signal"]).connect(slot)
+
+    def load_lazy_brick(self, placeholder):
+        """Loads a brick hidden at startup: requires its hardware objects,
+           instantiates it, makes its connections and sets run mode"""
+
+        start_time = time.time()
+        brick_name = placeholder.brick_name
+
+        mnemonics = []
+        for prop in placeholder.property_bag:
+            if hasattr(prop, "getName"):
+                prop_value = prop.getValue()
+            else:
+                prop_value = prop["value"]
+            if type(prop_value) == type('') and prop_value.startswith("/"):
+                mnemonics.append(prop_value)
+        if mnemonics:
+            with StartupProfiler.span("require", brick_name):
+                self.hardware_repository.require(mnemonics)
+
+        try:
+            brick = self.configuration.load_lazy_brick(brick_name)
+        except:
+            logging.getLogger().exception("Could not load brick %s" % \
+                                          brick_name)
+            return
+
+        # connections from and to the brick
+        for connection in self.configuration.bricks[brick_name]["connections"]:
+            self.make_connection(brick, connection)
+        items = list(self.configuration.windows.values()) + \
+                list(self.configuration.items.values()) + \
+                list(self.configuration.bricks.values())
+        for item in items:
+            if item["name"] == brick_name or \
+               item["name"] in self.configuration.lazy_bricks:
+                continue
+            for connection in item["connections"]:
+                if (connection["receiver"] or \
+                    connection["receiverWindow"]) == brick_name:
+                    sender = self.get_widget(item["name"])
+                    if sender is not None:
+                        self.make_connection(sender, connection)
+
+        if BlissWidget.isRunning():
+            brick._BlissWidget__run()
+            expert_mode = BlissWidget._menuBar is not None and \
+                BlissWidget._menuBar.expert_mode_action.isChecked()
+            try:
+                brick.set_expert_mode(expert_mode)
+            except:
+                logging.getLogger().exception(\
+                   "Could not set expert mode of %s", brick_name)
+
+        logging.getLogger().debug("Brick %s loaded on demand in %.3f s" % \
+                                  (brick_name, time.time() - start_time))
+        return brick
+
     def finalize(self):
         """Finalize gui load"""
 
@@ -424,7 +543,9 @@ class GUISupervisor(QWidget):
 
         while True:
             try:
-                self.hardware_repository.connect()
+                with StartupProfiler.span("phase",
+                                          "connect hardware repository"):
+                    self.hardware_repository.connect()
             except:
                 logging.getLogger().exception("Timeout while trying to " + \
                     "connect to Hardware Repository server.")
@@ -449,7 +570,8 @@ class GUISupervisor(QWidget):
 
         try:
             main_widget = None
-            main_widget = self.load_gui(gui_config_file)
+            with StartupProfiler.span("phase", "load gui"):
+                main_widget = self.load_gui(gui_config_file)
             if main_widget:
                 set_splash_screen(None)
                 self.splash_screen.finish(main_widget)
@@ -458,6 +580,12 @@ class GUISupervisor(QWidget):
             logging.getLogger().exception("exception while loading GUI file")
             QApplication.exit()
 
+        profiler = StartupProfiler.get_profiler()
+        if profiler is not None and self.profile_filename:
+            profiler.save(self.profile_filename)
+            # bricks loaded on demand are not part of the startup
+            StartupProfiler.disable()
+
     def customEvent(self, event):
         """Custom event"""
 
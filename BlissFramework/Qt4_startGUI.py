@@ -35,6 +35,7 @@ import BlissFramework
 from BlissFramework import Qt4_GUISupervisor
 from BlissFramework.Utils import Qt4_ErrorHandler
 from BlissFramework.Utils import Qt4_GUILogHandler
+from BlissFramework.Utils import StartupProfiler
 
 #from BlissFramework.Utils import terminal_server
 
@@ -109,6 +110,19 @@ def run(gui_config_file=None):
     parser.add_option('', '--no-border', action='store_true', dest='noBorder',
                       default=False,
                       help="does not show borders on main window")
+    parser.add_option('', '--lazyLoading', action='store_true',
+                      dest='lazyLoading', default=False,
+                      help="load bricks of hidden tabs and windows when " + \
+                           "they are shown for the first time")
+    parser.add_option('', '--preloadBricks', action='store_true',
+                      dest='preloadBricks', default=False,
+                      help="import the modules used by the bricks that " + \
+                           "do not depend on Qt in a worker thread " + \
+                           "while the hardware objects are loaded")
+    parser.add_option('', '--profileStartup', action='store', type='string',
+                      help="time the startup steps and write a report " + \
+                           "in FILE.txt and a Chrome trace in FILE.json",
+                      dest='profileStartup', metavar='FILE', default='')
     parser.add_option('', '--style', action='store', type='string',
                       help="Visual style of the application (windows, motif," + \
                            "cde, plastique, windowsxp, or macintosh)",
@@ -125,6 +139,9 @@ def run(gui_config_file=None):
 
     (opts, args) = parser.parse_args()
 
+    if opts.profileStartup:
+        StartupProfiler.enable()
+
     if len(args) >= 1:
         if len(args) == 1:
             gui_config_file = os.path.abspath(args[0])
@@ -295,7 +312,9 @@ def run(gui_config_file=None):
 
     main_application.lastWindowClosed.connect(main_application.quit)
     supervisor = Qt4_GUISupervisor.GUISupervisor(design_mode=opts.designMode,
-        show_maximized=opts.showMaximized, no_border=opts.noBorder)
+        show_maximized=opts.showMaximized, no_border=opts.noBorder,
+        lazy_loading=opts.lazyLoading, preload_bricks=opts.preloadBricks,
+        profile_filename=opts.profileStartup)
     supervisor.set_user_file_directory(user_file_dir)
     # post event for GUI creation
     main_application.postEvent(supervisor,
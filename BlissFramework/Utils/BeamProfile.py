@@ -0,0 +1,103 @@
+#
+#  Project: MXCuBE
+#  https://github.com/mxcube.
+#
+#  This file is part of MXCuBE software.
+#
+#  MXCuBE is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MXCuBE is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MXCuBE.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Beam profiles of camera images.
+
+get_image_array returns a numpy view of the buffer of a 32 bits QImage
+(B, G, R, A bytes per pixel) without copying it when sip supports it.
+The luminance is only computed for the pixels of a profile (one row or
+one column) and get_profile_statistics returns the peak, centroid and
+full width at half maximum of a profile, above its minimum.
+"""
+
+import numpy
+
+
+__credits__ = ["MXCuBE colaboration"]
+__version__ = "2.3"
+
+
+# weights of the B, G, R bytes of a 32 bits pixel
+LUMINANCE_WEIGHTS = numpy.array((0.114, 0.587, 0.299))
+
+
+def get_image_array(qimage):
+    """
+    Descript. : Returns a (height, width, 4) uint8 array of a 32 bits
+                QImage. The array is a view of the image buffer if sip
+                exposes it, it is valid as long as the image is
+    """
+    num_bytes = qimage.height() * qimage.bytesPerLine()
+    bits = qimage.bits()
+    try:
+        bits.setsize(num_bytes)
+        data = numpy.frombuffer(bits, dtype=numpy.uint8, count=num_bytes)
+    except (AttributeError, TypeError):
+        # old sip: the buffer is copied once in a string
+        data = numpy.frombuffer(bits.asstring(num_bytes), dtype=numpy.uint8)
+    data = data.reshape(qimage.height(), qimage.bytesPerLine())
+    return data[:, :qimage.width() * 4].reshape(qimage.height(),
+                                                 qimage.width(), 4)
+
+
+def get_luminance(pixels):
+    """
+    Descript. : Returns the luminance of an (..., 4) array of pixels
+    """
+    return numpy.dot(pixels[..., :3], LUMINANCE_WEIGHTS)
+
+
+def get_profile_statistics(profile):
+    """
+    Descript. : Returns dict with peak (value and position), centroid and
+                fwhm of a profile, in pixels. The minimum of the profile
+                is taken as background. fwhm is None if the profile does
+                not go down to half maximum on both sides of the peak
+    """
+    profile = numpy.asarray(profile, dtype=numpy.float64)
+    result = {"peak": None, "peak_position": None,
+              "centroid": None, "fwhm": None}
+    if profile.size == 0:
+        return result
+
+    signal = profile - profile.min()
+    peak_position = int(signal.argmax())
+    peak = signal[peak_position]
+    result["peak"] = profile[peak_position]
+    result["peak_position"] = peak_position
+    if peak <= 0:
+        return result
+
+    positions = numpy.arange(profile.size)
+    result["centroid"] = numpy.dot(signal, positions) / signal.sum()
+
+    # half maximum crossings around the peak, linearly interpolated
+    half = peak / 2.0
+    below = numpy.flatnonzero(signal[:peak_position] < half)
+    above = numpy.flatnonzero(signal[peak_position:] < half)
+    if below.size and above.size:
+        left = below[-1]
+        right = peak_position + above[0]
+        left_cross = left + (half - signal[left]) / \
+                     (signal[left + 1] - signal[left])
+        right_cross = right - (half - signal[right]) / \
+                      (signal[right - 1] - signal[right])
+        result["fwhm"] = right_cross - left_cross
+    return result
@@ -0,0 +1,228 @@
+#
+#  Project: MXCuBE
+#  https://github.com/mxcube.
+#
+#  This file is part of MXCuBE software.
+#
+#  MXCuBE is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MXCuBE is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MXCuBE.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compiled cache of the GUI configuration files.
+
+A GUI file (.json, .yml or repr based .gui) is parsed and the pickled
+property bags of its items are loaded once. The resulting tree is saved
+next to the file (<file>.cache) in a versioned binary file: a magic line
+with the format version, a pickled header (path, mtime, size and sha1 of
+the GUI file) and the pickled tree. Loading a valid cache is one read of
+the cache file. The cache is used if the path, mtime and size of the GUI
+file are unchanged. Otherwise the sha1 of the file is compared and the
+file is parsed again only if its content has changed.
+
+The bricks are not part of the cache: Configuration.load instantiates
+them from the cached tree.
+"""
+
+import os
+import json
+import yaml
+import time
+import hashlib
+import logging
+from io import BytesIO
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+__credits__ = ["MXCuBE colaboration"]
+__version__ = "2.3"
+
+
+CONFIG_CACHE_MAGIC = b"MXCUBE-CONFIG-CACHE"
+CONFIG_CACHE_VERSION = 1
+CONFIG_CACHE_SUFFIX = ".cache"
+
+
+def get_cache_filename(config_filename):
+    """
+    Descript. : Returns the name of the cache file of a GUI file
+    """
+    return config_filename + CONFIG_CACHE_SUFFIX
+
+
+def parse_config(content, config_filename):
+    """
+    Descript. : Parses the content of a GUI file with the parser of its
+                extension
+    """
+    if config_filename.endswith(".json"):
+        return json.loads(content)
+    elif config_filename.endswith(".yml"):
+        return yaml.load(content)
+    else:
+        return eval(content)
+
+
+def decode_properties(items):
+    """
+    Descript. : Replaces the pickled property bags of the items (and of
+                their children) by PropertyBag objects. Properties that
+                can not be loaded are left pickled
+    """
+    for item in items:
+        if isinstance(item.get("properties"), bytes):
+            try:
+                item["properties"] = pickle.loads(item["properties"])
+            except:
+                logging.getLogger().exception(\
+                    "Could not load properties for %s" % item.get("name"))
+        decode_properties(item.get("children", []))
+    return items
+
+
+def encode_properties(items):
+    """
+    Descript. : Pickles the PropertyBag objects of the items, as saved
+                in .gui files
+    """
+    for item in items:
+        properties = item.get("properties")
+        if properties is not None and not isinstance(properties, \
+           (bytes, list, dict)):
+            item["properties"] = pickle.dumps(properties)
+        encode_properties(item.get("children", []))
+    return items
+
+
+def get_content_hash(content):
+    return hashlib.sha1(content).hexdigest()
+
+
+def get_file_key(config_filename):
+    """
+    Descript. : Returns the path, mtime and size of a GUI file
+    """
+    filestat = os.stat(config_filename)
+    return {"path": os.path.abspath(config_filename),
+            "mtime": filestat.st_mtime,
+            "size": filestat.st_size}
+
+
+def read_cache(cache_filename):
+    """
+    Descript. : Returns (header, stream) of a cache file, the tree is the
+                next object of the stream. Returns None if the file does
+                not exist or has another format version
+    """
+    try:
+        with open(cache_filename, "rb") as cache_file:
+            data = cache_file.read()
+    except IOError:
+        return None
+    magic, _, data = data.partition(b"\n")
+    if magic != CONFIG_CACHE_MAGIC + b" %d" % CONFIG_CACHE_VERSION:
+        return None
+    stream = BytesIO(data)
+    try:
+        return pickle.load(stream), stream
+    except:
+        return None
+
+
+def write_cache(cache_filename, header, config):
+    """
+    Descript. : Writes a cache file. The file is written under a
+                temporary name and renamed, so a cache being written is
+                never read. Returns False if it can not be written
+    """
+    temp_filename = "%s.%d" % (cache_filename, os.getpid())
+    try:
+        with open(temp_filename, "wb") as cache_file:
+            cache_file.write(CONFIG_CACHE_MAGIC + \
+                             b" %d\n" % CONFIG_CACHE_VERSION)
+            pickle.dump(header, cache_file, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(config, cache_file, pickle.HIGHEST_PROTOCOL)
+        os.rename(temp_filename, cache_filename)
+    except (IOError, OSError, pickle.PicklingError):
+        logging.getLogger().debug("Could not write configuration " + \
+            "cache %s" % cache_filename)
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+        return False
+    return True
+
+
+def build_cache(config_filename):
+    """
+    Descript. : Parses a GUI file and writes its cache. Returns the tree
+    """
+    file_key = get_file_key(config_filename)
+    with open(config_filename, "rb") as config_file:
+        content = config_file.read()
+    return _build_cache(config_filename, file_key, content)
+
+
+def _build_cache(config_filename, file_key, content):
+    config = decode_properties(parse_config(content, config_filename))
+    header = dict(file_key, sha1=get_content_hash(content))
+    write_cache(get_cache_filename(config_filename), header, config)
+    return config
+
+
+def _load_tree(stream, cache_filename):
+    try:
+        return pickle.load(stream)
+    except:
+        logging.getLogger().exception(\
+            "Could not load configuration cache %s" % cache_filename)
+
+
+def load_config(config_filename, use_cache=True):
+    """
+    Descript. : Returns the tree of a GUI file with loaded property bags,
+                from its cache if it is valid
+    """
+    start_time = time.time()
+    file_key = get_file_key(config_filename)
+    cache_filename = get_cache_filename(config_filename)
+    cache = read_cache(cache_filename) if use_cache else None
+
+    header = {}
+    if cache is not None:
+        header, stream = cache
+        if all([header.get(key) == value for key, value \
+                in file_key.items()]):
+            config = _load_tree(stream, cache_filename)
+            if config is not None:
+                logging.getLogger().debug("GUI configuration %s " % \
+                    config_filename + "loaded from cache in %.3f s" % \
+                    (time.time() - start_time))
+                return config
+            header = {}
+
+    with open(config_filename, "rb") as config_file:
+        content = config_file.read()
+    if header.get("sha1") == get_content_hash(content):
+        # file touched or copied: the cache is valid for the new key
+        config = _load_tree(stream, cache_filename)
+        if config is not None:
+            write_cache(cache_filename, dict(header, **file_key), config)
+            return config
+
+    config = _build_cache(config_filename, file_key, content)
+    logging.getLogger().debug("GUI configuration %s " % config_filename + \
+        "parsed in %.3f s" % (time.time() - start_time))
+    return config
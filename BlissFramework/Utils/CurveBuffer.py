@@ -0,0 +1,119 @@
+#
+#  Project: MXCuBE
+#  https://github.com/mxcube.
+#
+#  This file is part of MXCuBE software.
+#
+#  MXCuBE is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MXCuBE is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MXCuBE.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Bounded storage of a monitored curve.
+
+The newest points are kept at full resolution in a RingBuffer with the
+columns "x" and "y". When it is full its oldest block of
+DECIMATION_BLOCK points is replaced by the points with the minimum and
+the maximum y of the block (min/max decimation keeps the spikes), which
+are appended to a second RingBuffer of decimated history. When the
+history is full its oldest points are dropped, so the memory used by a
+curve is fixed and the number of plotted points is bounded.
+"""
+
+import numpy as np
+
+from BlissFramework.Utils.RingBuffer import RingBuffer
+
+
+__credits__ = ["MXCuBE colaboration"]
+__version__ = "2.3"
+
+
+CURVE_BUFFER_SIZE = 20000
+DECIMATION_BLOCK = 200
+
+
+class CurveBuffer(object):
+    """
+    Descript. : Full resolution recent points and min/max decimated
+                history of a curve
+    """
+
+    def __init__(self, capacity=CURVE_BUFFER_SIZE,
+                 decimation_block=DECIMATION_BLOCK):
+        """
+        Descript. : capacity is the number of points of each buffer
+        """
+        self.decimation_block = max(2, min(int(decimation_block),
+                                           int(capacity)))
+        self.recent = RingBuffer(capacity, columns=("x", "y"))
+        self.history = RingBuffer(capacity, columns=("x", "y"))
+
+    def __len__(self):
+        return len(self.history) + len(self.recent)
+
+    def clear(self):
+        self.recent.clear()
+        self.history.clear()
+
+    def append(self, x, y):
+        """
+        Descript. : Appends a point. The oldest points are decimated if
+                    the buffer of recent points is full
+        """
+        if self.recent.is_full():
+            self._decimate_oldest()
+        self.recent.append(x, y)
+
+    def _decimate_oldest(self):
+        x, y = self.recent.get_data()[:, :self.decimation_block]
+        indexes = sorted(set((int(y.argmin()), int(y.argmax()))))
+        for index in indexes:
+            self.history.append(x[index], y[index])
+        self.recent.discard_first(self.decimation_block)
+
+    def discard_before(self, x):
+        """
+        Descript. : Removes the points with a smaller x, x has to be
+                    monotonic
+        """
+        return self.history.discard_before(x, "x") + \
+               self.recent.discard_before(x, "x")
+
+    def keep_last(self, count):
+        """
+        Descript. : Removes the oldest points to keep at most count
+        """
+        excess = len(self) - max(0, count)
+        if excess > 0:
+            excess -= self.history.discard_first(excess)
+            self.recent.discard_first(excess)
+
+    def get_last(self, name="y"):
+        """
+        Descript. : Returns the last value of a column or None
+        """
+        if len(self.recent):
+            return self.recent.get_last(name)
+        return self.history.get_last(name)
+
+    def get_data(self):
+        """
+        Descript. : Returns (x, y) arrays of the decimated history
+                    followed by the recent points
+        """
+        if not len(self.history):
+            x, y = self.recent.get_data()
+            return x.copy(), y.copy()
+        x, y = np.concatenate((self.history.get_data(),
+                               self.recent.get_data()), axis=1)
+        return x, y
@@ -0,0 +1,129 @@
+#
+#  Project: MXCuBE
+#  https://github.com/mxcube.
+#
+#  This file is part of MXCuBE software.
+#
+#  MXCuBE is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MXCuBE is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MXCuBE.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Journal of gui events cached while an instance is not allowed to run them.
+
+Only the last event of a key (slot and widget) is kept, so replaying the
+journal applies the final state of each widget once. Events are kept in
+the order they were added (a re-added key moves to the end). The journal
+can be bounded in size and in age, the oldest events are dropped first.
+"""
+
+import time
+import collections
+
+
+__credits__ = ["MXCuBE colaboration"]
+__version__ = "2.3"
+
+
+class EventJournal(object):
+    """
+    Descript. : Compacting, optionally bounded event cache
+    """
+
+    def __init__(self, max_size=None, max_age=None):
+        """
+        Descript. : max_size is the maximal number of events kept,
+                    max_age the maximal age of an event in seconds.
+                    None means no bound
+        """
+        self.max_size = max_size
+        self.max_age = max_age
+        self._events = collections.OrderedDict()
+
+        self.cached = 0
+        self.compacted = 0
+        self.dropped = 0
+        self.replayed = 0
+
+    def __len__(self):
+        return len(self._events)
+
+    def set_bounds(self, max_size=None, max_age=None):
+        """
+        Descript. : Sets size and age bounds and applies them
+        """
+        self.max_size = max_size
+        self.max_age = max_age
+        self._apply_bounds()
+
+    def add(self, key, timestamp, method, args):
+        """
+        Descript. : Adds an event. A previous event with the same key
+                    is replaced
+        """
+        if self._events.pop(key, None) is not None:
+            self.compacted += 1
+        self._events[key] = (timestamp, method, args)
+        self.cached += 1
+        self._apply_bounds()
+
+    def discard(self, key):
+        """
+        Descript. : Removes the event of a key (if any), for example
+                    when a newer event has been run directly
+        """
+        if self._events.pop(key, None) is not None:
+            self.compacted += 1
+
+    def take(self, max_events=None):
+        """
+        Descript. : Removes and returns the oldest events as a list of
+                    (timestamp, method, args)
+        """
+        self._apply_bounds()
+        events = []
+        while self._events and (max_events is None or \
+                                len(events) < max_events):
+            events.append(self._events.popitem(last=False)[1])
+        return events
+
+    def clear(self):
+        """
+        Descript. : Removes all events, they are counted as dropped
+        """
+        self.dropped += len(self._events)
+        self._events.clear()
+
+    def get_counters(self):
+        """
+        Descript. : Returns dict with cached, compacted, dropped,
+                    replayed and pending event counts
+        """
+        return {"cached": self.cached,
+                "compacted": self.compacted,
+                "dropped": self.dropped,
+                "replayed": self.replayed,
+                "pending": len(self._events)}
+
+    def _apply_bounds(self):
+        if self.max_size is not None:
+            while len(self._events) > self.max_size:
+                self._events.popitem(last=False)
+                self.dropped += 1
+        if self.max_age is not None and self._events:
+            oldest_timestamp = time.time() - self.max_age
+            while self._events:
+                key = next(iter(self._events))
+                if self._events[key][0] >= oldest_timestamp:
+                    break
+                del self._events[key]
+                self.dropped += 1
@@ -0,0 +1,213 @@
+#
+#  Project: MXCuBE
+#  https://github.com/mxcube.
+#
+#  This file is part of MXCuBE software.
+#
+#  MXCuBE is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MXCuBE is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MXCuBE.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Contrast levels of detector images computed from a histogram.
+
+The cumulative contrast is the smallest value v such that the sum of
+the sorted pixel values up to v is larger than a fraction (97%) of the
+sum of all values. The std. deviation contrast is mean +/- std. dev.
+
+Both are computed from one histogram of the image instead of sorting
+it. Integer images (uint16, uint32...) are binned exactly with bincount
+for values smaller than min + MAX_INTEGER_BINS, the few larger values
+(saturated or masked pixels) are kept sorted apart. Other images use
+HISTOGRAM_BINS bins, the bin that contains the cumulative limit is then
+sorted to get the exact value. Images can be subsampled with a stride.
+"""
+
+import numpy as np
+
+
+__credits__ = ["MXCuBE colaboration"]
+__version__ = "2.3"
+
+
+CUMULATIVE_FRACTION = 0.97
+MAX_INTEGER_BINS = 1 << 20
+# integer images with more values above the bins are binned approximately
+MAX_OUTLIER_FRACTION = 0.01
+HISTOGRAM_BINS = 4096
+
+
+def subsample(data, step=1):
+    """
+    Descript. : Returns a strided view with every step-th pixel in each
+                dimension
+    """
+    data = np.asarray(data)
+    if step > 1:
+        data = data[(slice(None, None, step), ) * data.ndim]
+    return data
+
+
+def sort_cumulative_contrast(data, fraction=CUMULATIVE_FRACTION):
+    """
+    Descript. : Reference implementation based on a full sort
+    """
+    sorted_data = np.sort(np.asarray(data).ravel())
+    cumsum = sorted_data.cumsum()
+    max_val = sorted_data[cumsum > cumsum[-1] * fraction][0]
+    return (sorted_data[0], max_val)
+
+
+class ImageContrast(object):
+    """
+    Descript. : Histogram of an image and contrast levels derived from it.
+                The image is binned at the first request. The reference
+                to an integer image is released afterwards
+    """
+
+    def __init__(self, data, step=1):
+        self._data = subsample(data, step)
+        self.step = step
+        self.num_values = 0
+        self.min_value = None
+        self.max_value = None
+        self.mean = None
+        self.std_dev = None
+        self._cumulative = {}
+
+        # exact integer histogram: counts of values min_value + index
+        # and sorted values above the histogram
+        self._counts = None
+        self._outliers = None
+        # binned histogram: counts and sums of values per bin
+        self._bin_scale = None
+        self._bin_sums = None
+
+    def _build_histogram(self):
+        if self._data is None:
+            return
+        flat = self._data.ravel()
+        self.num_values = flat.size
+        if flat.size == 0:
+            self._data = None
+            return
+        self.min_value = flat.min()
+        self.max_value = flat.max()
+
+        if np.issubdtype(flat.dtype, np.integer):
+            min_value = int(self.min_value)
+            if int(self.max_value) - min_value < MAX_INTEGER_BINS:
+                self._outliers = np.zeros(0)
+            else:
+                high = flat >= min_value + MAX_INTEGER_BINS
+                num_outliers = np.count_nonzero(high)
+                if num_outliers <= flat.size * MAX_OUTLIER_FRACTION:
+                    self._outliers = np.sort(flat[high]).astype(np.float64)
+                    flat = flat[~high]
+            if self._outliers is not None:
+                self._build_integer_histogram(flat, min_value)
+                return
+        self._build_binned_histogram(flat)
+
+    def _build_integer_histogram(self, flat, min_value):
+        if min_value != 0:
+            flat = flat.astype(np.int64) - min_value
+        self._counts = np.bincount(flat)
+        values = np.arange(self._counts.size, dtype=np.float64) + min_value
+        counts = self._counts.astype(np.float64)
+        total = np.dot(counts, values) + self._outliers.sum()
+        total_sq = np.dot(counts, values * values) + \
+                   np.dot(self._outliers, self._outliers)
+        self._set_mean_std_dev(total, total_sq)
+        self._data = None
+
+    def _build_binned_histogram(self, flat):
+        # the data is kept to refine the cumulative limit inside a bin
+        flat = flat.astype(np.float64)
+        bin_indexes = self._get_bin_indexes(flat)
+        self._bin_sums = np.bincount(bin_indexes, weights=flat,
+                                     minlength=HISTOGRAM_BINS)
+        self._set_mean_std_dev(self._bin_sums.sum(), np.dot(flat, flat))
+
+    def _get_bin_indexes(self, flat):
+        if self._bin_scale is None:
+            value_range = float(self.max_value) - float(self.min_value)
+            self._bin_scale = HISTOGRAM_BINS / value_range \
+                              if value_range > 0 else 0.0
+        bin_indexes = ((flat - float(self.min_value)) * \
+                       self._bin_scale).astype(np.intp)
+        np.minimum(bin_indexes, HISTOGRAM_BINS - 1, out=bin_indexes)
+        return bin_indexes
+
+    def _set_mean_std_dev(self, total, total_sq):
+        self.mean = total / self.num_values
+        self.std_dev = np.sqrt(max(0.0, total_sq / self.num_values - \
+                                        self.mean ** 2))
+
+    def get_std_dev_contrast(self):
+        """
+        Descript. : Returns (mean - std. dev, mean + std. dev)
+        """
+        self._build_histogram()
+        if self.mean is None:
+            return None
+        return (self.mean - self.std_dev, self.mean + self.std_dev)
+
+    def get_cumulative_contrast(self, fraction=CUMULATIVE_FRACTION):
+        """
+        Descript. : Returns (min value, value at the cumulative fraction)
+        """
+        if fraction in self._cumulative:
+            return self._cumulative[fraction]
+        self._build_histogram()
+        if self.min_value is None:
+            return None
+
+        if self._counts is not None:
+            max_val = self._get_integer_limit(fraction)
+        else:
+            max_val = self._get_binned_limit(fraction)
+
+        result = (self.min_value, max_val)
+        self._cumulative[fraction] = result
+        return result
+
+    def _get_integer_limit(self, fraction):
+        values = np.arange(self._counts.size, dtype=np.float64) + \
+                 float(self.min_value)
+        cumsum = np.cumsum(self._counts * values)
+        outliers_cumsum = cumsum[-1] + np.cumsum(self._outliers)
+        total = outliers_cumsum[-1] if outliers_cumsum.size else cumsum[-1]
+        limit = total * fraction
+
+        index = np.searchsorted(cumsum, limit, side="right")
+        if index < cumsum.size:
+            return values[index]
+        index = np.searchsorted(outliers_cumsum, limit, side="right")
+        if index < outliers_cumsum.size:
+            return self._outliers[index]
+        return float(self.max_value)
+
+    def _get_binned_limit(self, fraction):
+        cumsum = np.cumsum(self._bin_sums)
+        limit = cumsum[-1] * fraction
+        bin_index = min(np.searchsorted(cumsum, limit, side="right"),
+                        cumsum.size - 1)
+
+        flat = self._data.ravel().astype(np.float64)
+        in_bin = np.sort(flat[self._get_bin_indexes(flat) == bin_index])
+        before = cumsum[bin_index - 1] if bin_index > 0 else 0.0
+        index = np.searchsorted(before + np.cumsum(in_bin), limit,
+                                side="right")
+        if index >= in_bin.size:
+            return float(self.max_value)
+        return in_bin[index]
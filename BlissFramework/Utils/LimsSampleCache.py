@@ -0,0 +1,112 @@
+#
+#  Project: MXCuBE
+#  https://github.com/mxcube.
+#
+#  This file is part of MXCuBE software.
+#
+#  MXCuBE is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MXCuBE is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MXCuBE.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Cache of the LIMS sample lists of the sessions.
+
+The samples returned by LIMS for a session (proposal id, session id) are
+kept with the time they have been fetched and a hash of their content.
+A cached list older than ttl seconds is not returned anymore, but its
+hash is kept so a new list can be compared to it. Samples are hashed
+one by one (get_sample_hash) to find the samples that have changed.
+"""
+
+import time
+import hashlib
+
+
+__credits__ = ["MXCuBE colaboration"]
+__version__ = "2.3"
+
+
+LIMS_CACHE_TTL = 300
+
+
+def get_lims_sample_fields(lims_sample):
+    """
+    Descript. : Returns the sorted (name, value) list of a LIMS sample.
+                Works with suds objects (iterable on their fields) and
+                with plain objects
+    """
+    try:
+        return sorted(dict(lims_sample).items())
+    except (TypeError, ValueError):
+        return sorted(vars(lims_sample).items())
+
+
+def get_sample_hash(lims_sample):
+    """
+    Descript. : Returns a hash of the content of a LIMS sample
+    """
+    return hashlib.md5(repr(get_lims_sample_fields(lims_sample))).hexdigest()
+
+
+def get_content_hash(lims_samples):
+    """
+    Descript. : Returns a hash of the content of a list of LIMS samples
+    """
+    content_hash = hashlib.md5()
+    for lims_sample in lims_samples:
+        content_hash.update(get_sample_hash(lims_sample))
+    return content_hash.hexdigest()
+
+
+class LimsSampleCache(object):
+    """
+    Descript. : LIMS sample lists of the sessions with a time to live
+    """
+
+    def __init__(self, ttl=LIMS_CACHE_TTL):
+        self.ttl = ttl
+        # session key -> (fetch time, content hash, samples)
+        self.entries = {}
+
+    def get(self, session_key):
+        """
+        Descript. : Returns the cached samples of a session or None if
+                    there are none or if they are older than ttl
+        """
+        entry = self.entries.get(session_key)
+        if entry is None or time.time() - entry[0] > self.ttl:
+            return None
+        return entry[2]
+
+    def get_content_hash(self, session_key):
+        entry = self.entries.get(session_key)
+        if entry is not None:
+            return entry[1]
+
+    def put(self, session_key, lims_samples):
+        """
+        Descript. : Caches the samples of a session. Returns True if
+                    their content differs from the cached content
+        """
+        content_hash = get_content_hash(lims_samples)
+        changed = content_hash != self.get_content_hash(session_key)
+        self.entries[session_key] = (time.time(), content_hash, lims_samples)
+        return changed
+
+    def invalidate(self, session_key=None):
+        """
+        Descript. : Removes the samples of a session, by default of all
+        """
+        if session_key is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(session_key, None)
@@ -0,0 +1,106 @@
+#
+#  Project: MXCuBE
+#  https://github.com/mxcube.
+#
+#  This file is part of MXCuBE software.
+#
+#  MXCuBE is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MXCuBE is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MXCuBE.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Local LIMS service to test the sample list without ISPyB.
+
+LimsStub implements get_samples of the LIMS client and returns copies of
+its samples after a configurable delay (gevent.sleep, so other greenlets
+and the GUI keep running). Samples have the attributes of the ISPyB
+sample objects used by Sample.init_from_lims_object. They can be created
+for a sample changer layout, loaded from a JSON file (list of dicts) and
+modified to test the refresh of changed samples. In a brick test:
+
+    brick.lims_hwobj = LimsStub(delay=2)
+    brick.lims_hwobj.create_samples(5, 10)
+"""
+
+import json
+
+import gevent
+
+
+__credits__ = ["MXCuBE colaboration"]
+__version__ = "2.3"
+
+
+class LimsSample(object):
+    """
+    Descript. : Sample with the attributes of an ISPyB sample
+    """
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def __repr__(self):
+        return "LimsSample(%s)" % ", ".join(["%s=%r" % item for item \
+                                             in sorted(vars(self).items())])
+
+
+class LimsStub(object):
+    """
+    Descript. : LIMS client returning a local sample list
+    """
+
+    def __init__(self, samples=None, delay=0):
+        self.samples = list(samples or [])
+        self.delay = delay
+        self.requests = 0
+
+    def create_samples(self, num_baskets, samples_per_basket,
+                       protein_acronym="PROT"):
+        """
+        Descript. : Creates one sample with a barcode per position
+        """
+        self.samples = []
+        for basket_index in range(1, num_baskets + 1):
+            for sample_index in range(1, samples_per_basket + 1):
+                sample_id = len(self.samples) + 1
+                self.samples.append(LimsSample(\
+                    sampleId=sample_id,
+                    sampleName="sample-%d" % sample_id,
+                    proteinAcronym=protein_acronym,
+                    code="BC%05d" % sample_id,
+                    containerCode="PUCK%02d" % basket_index,
+                    containerSampleChangerLocation=str(basket_index),
+                    sampleLocation=str(sample_index)))
+
+    def load(self, filename):
+        """
+        Descript. : Loads the samples from a JSON list of dicts
+        """
+        with open(filename) as samples_file:
+            self.samples = [LimsSample(**dict([(str(key), value) for key, \
+                            value in fields.items()])) for fields \
+                            in json.load(samples_file)]
+
+    def update_sample(self, sample_id, **fields):
+        """
+        Descript. : Changes the fields of a sample
+        """
+        for sample in self.samples:
+            if sample.sampleId == sample_id:
+                sample.__dict__.update(fields)
+                return sample
+
+    def get_samples(self, proposal_id, session_id):
+        self.requests += 1
+        if self.delay:
+            gevent.sleep(self.delay)
+        return [LimsSample(**vars(sample)) for sample in self.samples]
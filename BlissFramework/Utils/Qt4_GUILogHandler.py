@@ -20,6 +20,7 @@
 import logging
 import time
 import weakref
+import collections
 import gevent
 
 from QtImport import *
@@ -27,6 +28,16 @@ from QtImport import *
 _logHandler = None
 _timer = None
 
+# Maximal number of records kept in the handler buffer. When the buffer
+# is full the oldest records are discarded and counted as dropped
+BUFFER_SIZE = 100000
+# Records are delivered to the viewers every PROCESS_INTERVAL seconds
+PROCESS_INTERVAL = 0.2
+# In batch mode the whole buffer is delivered in one LogBatchEvent per viewer.
+# Otherwise at most MAX_RECORDS_PER_TICK records are delivered one by one
+BATCH_MODE = True
+MAX_RECORDS_PER_TICK = 10
+
 
 class LogEvent(QEvent):
     """
@@ -38,25 +49,33 @@ class LogEvent(QEvent):
         """
         QEvent.__init__(self, QEvent.User)
         self.record = record
+
+
+class LogBatchEvent(QEvent):
+    """
+    Descript. : Event carrying a list of log records
+    """
+    def __init__(self, records):
+        """
+        Descript. :
+        """
+        QEvent.__init__(self, QEvent.Type(QEvent.User + 1))
+        self.records = records
         
 
 def processLogMessages():
     """
     Descript. :
     """
-    i = 0
-    while i < 10:
-        if len(_logHandler.buffer) <= i:
-            break
-        
-        record = _logHandler.buffer[i]
-        
-        for viewer in _logHandler.registeredViewers:
-            QApplication.postEvent(viewer, LogEvent(record))
-            
-        i += 1
-        
-    del _logHandler.buffer[0:i]
+    if BATCH_MODE:
+        records = _logHandler.take_records()
+        if records:
+            for viewer in _logHandler.registeredViewers.keys():
+                QApplication.postEvent(viewer, LogBatchEvent(records))
+    else:
+        for record in _logHandler.take_records(MAX_RECORDS_PER_TICK):
+            for viewer in _logHandler.registeredViewers.keys():
+                QApplication.postEvent(viewer, LogEvent(record))
     
 
 def do_process_log_messages(sleep_time):
@@ -65,7 +84,7 @@ def do_process_log_messages(sleep_time):
     """
     while True:
         processLogMessages()
-        time.sleep(sleep_time)  
+        gevent.sleep(sleep_time)  
 
 
 def GUILogHandler():
@@ -78,7 +97,7 @@ def GUILogHandler():
     if _logHandler is None:
         _logHandler = __GUILogHandler()
 
-        _timer =  gevent.spawn(do_process_log_messages, 0.2) 
+        _timer =  gevent.spawn(do_process_log_messages, PROCESS_INTERVAL) 
         #_timer = QtCore.QTimer()
         #QtCore.QObject.connect(_timer, QtCore.SIGNAL("timeout()"), processLogMessages)
         #_timer.start(10)
@@ -149,7 +168,8 @@ class __GUILogHandler(logging.Handler):
         """
         logging.Handler.__init__(self)
         
-        self.buffer = []
+        self.buffer = collections.deque(maxlen=BUFFER_SIZE)
+        self.dropped_records = 0
 
         self.registeredViewers = weakref.WeakKeyDictionary()
         
@@ -158,11 +178,46 @@ class __GUILogHandler(logging.Handler):
         Descript. :
         """
         self.registeredViewers[viewer] = ''
-        for rec in self.buffer:
-            viewer.append_log_record(rec)
+        if hasattr(viewer, "append_log_records"):
+            viewer.append_log_records(list(self.buffer))
+        else:
+            for rec in self.buffer:
+                viewer.append_log_record(rec)
+
+    def set_buffer_size(self, buffer_size):
+        """
+        Descript. : Resizes the ring buffer. If the new size is smaller
+                    than the number of buffered records then the oldest
+                    records are dropped
+        """
+        self.acquire()
+        try:
+            overflow = max(0, len(self.buffer) - buffer_size)
+            self.dropped_records += overflow
+            self.buffer = collections.deque(self.buffer, maxlen=buffer_size)
+        finally:
+            self.release()
+
+    def take_records(self, max_records=None):
+        """
+        Descript. : Removes records from the buffer and returns them.
+                    If max_records is None then the whole buffer is drained
+        """
+        self.acquire()
+        try:
+            if max_records is None or max_records >= len(self.buffer):
+                records = list(self.buffer)
+                self.buffer.clear()
+            else:
+                records = [self.buffer.popleft() for i in range(max_records)]
+        finally:
+            self.release()
+        return records
     
     def emit(self, record):
         """
         Descript. :
         """
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped_records += 1
         self.buffer.append(LogRecord(record))
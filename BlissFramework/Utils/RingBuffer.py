@@ -0,0 +1,179 @@
+#
+#  Project: MXCuBE
+#  https://github.com/mxcube.
+#
+#  This file is part of MXCuBE software.
+#
+#  MXCuBE is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MXCuBE is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MXCuBE.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Preallocated numpy storage for plotted data.
+
+RingBuffer keeps one or more columns of equal length. Every value is
+written twice (at index i and i + capacity), so the most recent values are
+always available as one contiguous slice and get_column() returns a view
+without copying. Appending a point is O(1). When the buffer is full the
+oldest point is overwritten, unless the buffer is growable, in which case
+the capacity is doubled.
+"""
+
+import numpy as np
+
+
+__credits__ = ["MXCuBE colaboration"]
+__version__ = "2.3"
+
+
+class RingBuffer(object):
+    """
+    Descript. : Fixed capacity column store based on numpy arrays
+    """
+
+    def __init__(self, capacity, columns=("y",), dtype=np.float64,
+                 growable=False):
+        """
+        Descript. : capacity is the number of points kept, columns is
+                    a list of column names
+        """
+        self.columns = tuple(columns)
+        self.dtype = dtype
+        self.growable = growable
+        self.capacity = max(1, int(capacity))
+        self._column_index = dict((name, index) for index, name \
+                                  in enumerate(self.columns))
+        self._data = np.zeros((len(self.columns), 2 * self.capacity),
+                              dtype=self.dtype)
+        self._start = 0
+        self._size = 0
+        self.total_appended = 0
+
+    def __len__(self):
+        return self._size
+
+    def clear(self):
+        """
+        Descript. : Removes all points, keeps the allocated memory
+        """
+        self._start = 0
+        self._size = 0
+
+    def is_full(self):
+        return self._size == self.capacity
+
+    def set_capacity(self, capacity):
+        """
+        Descript. : Reallocates the buffer and keeps the newest points
+        """
+        capacity = max(1, int(capacity))
+        total_appended = self.total_appended
+        keep = min(self._size, capacity)
+        data = self.get_data()[:, self._size - keep:]
+        self.capacity = capacity
+        self._data = np.zeros((len(self.columns), 2 * capacity),
+                              dtype=self.dtype)
+        self._start = 0
+        self._size = 0
+        if keep:
+            self.extend(*data)
+        self.total_appended = total_appended
+
+    def append(self, *values):
+        """
+        Descript. : Appends one point. Values are given in column order
+        """
+        if self._size == self.capacity:
+            if self.growable:
+                self.set_capacity(self.capacity * 2)
+            else:
+                self._start = (self._start + 1) % self.capacity
+                self._size -= 1
+        index = (self._start + self._size) % self.capacity
+        self._data[:, index] = values
+        self._data[:, index + self.capacity] = values
+        self._size += 1
+        self.total_appended += 1
+
+    def extend(self, *arrays):
+        """
+        Descript. : Appends several points. One array per column
+        """
+        arrays = np.atleast_2d(np.array(arrays, dtype=self.dtype))
+        num_points = arrays.shape[1]
+        if num_points == 0:
+            return
+        self.total_appended += num_points
+        if self.growable and self._size + num_points > self.capacity:
+            capacity = self.capacity
+            while capacity < self._size + num_points:
+                capacity *= 2
+            self.set_capacity(capacity)
+        if num_points >= self.capacity:
+            arrays = arrays[:, num_points - self.capacity:]
+            self._data[:, :self.capacity] = arrays
+            self._data[:, self.capacity:] = arrays
+            self._start = 0
+            self._size = self.capacity
+            return
+
+        overflow = max(0, self._size + num_points - self.capacity)
+        self._start = (self._start + overflow) % self.capacity
+        self._size -= overflow
+        first = (self._start + self._size) % self.capacity
+        indexes = (np.arange(first, first + num_points) % self.capacity)
+        self._data[:, indexes] = arrays
+        self._data[:, indexes + self.capacity] = arrays
+        self._size += num_points
+
+    def get_column(self, name=None):
+        """
+        Descript. : Returns a view on the ordered points of a column
+        """
+        index = 0 if name is None else self._column_index[name]
+        return self._data[index, self._start:self._start + self._size]
+
+    def get_data(self):
+        """
+        Descript. : Returns a view on all columns, shape (columns, points)
+        """
+        return self._data[:, self._start:self._start + self._size]
+
+    def get_last(self, name=None):
+        """
+        Descript. : Returns the last value of a column or None
+        """
+        if self._size == 0:
+            return None
+        return self.get_column(name)[-1]
+
+    def discard_first(self, count):
+        """
+        Descript. : Removes the count oldest points
+        """
+        count = min(max(0, int(count)), self._size)
+        if count:
+            self._start = (self._start + count) % self.capacity
+            self._size -= count
+        return count
+
+    def discard_before(self, value, name=None):
+        """
+        Descript. : Removes points whose value in a monotonic column is
+                    smaller than value. Uses a binary search
+        """
+        column = self.get_column(name)
+        count = int(np.searchsorted(column, value, side="left"))
+        if count:
+            self._start = (self._start + count) % self.capacity
+            self._size -= count
+        return count
@@ -0,0 +1,119 @@
+#
+#  Project: MXCuBE
+#  https://github.com/mxcube.
+#
+#  This file is part of MXCuBE software.
+#
+#  MXCuBE is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MXCuBE is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MXCuBE.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Accumulator of the points of a scan.
+
+The points are appended to a growable RingBuffer with the column "x" and
+one column per counter, so the curves are available as numpy views
+without copying. The x and y ranges are updated with every point, so
+the plot limits are known without going through the curves. Missing
+counter values are stored as NaN and are ignored by the ranges.
+num_drawn counts the points already plotted.
+"""
+
+import numpy as np
+
+from BlissFramework.Utils.RingBuffer import RingBuffer
+
+
+__credits__ = ["MXCuBE colaboration"]
+__version__ = "2.3"
+
+
+SCAN_INITIAL_CAPACITY = 1024
+
+
+def _update_range(value_range, values):
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return value_range
+    low = float(values.min())
+    high = float(values.max())
+    if value_range is not None:
+        low = min(low, value_range[0])
+        high = max(high, value_range[1])
+    return (low, high)
+
+
+class ScanData(object):
+    """
+    Descript. : Points of a scan in preallocated growable arrays
+    """
+
+    def __init__(self, labels, capacity=SCAN_INITIAL_CAPACITY):
+        """
+        Descript. : labels are the names of the counters (y columns),
+                    capacity is the initial number of points
+        """
+        self.labels = list(labels)
+        self.buffer = RingBuffer(capacity, columns=["x"] + self.labels,
+                                 growable=True)
+        self.x_range = None
+        self.y_range = None
+        self.num_drawn = 0
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def _get_row(self, y_values):
+        row = [float(value) for value in y_values[:len(self.labels)]]
+        return row + [np.nan] * (len(self.labels) - len(row))
+
+    def add_point(self, x, y_values):
+        """
+        Descript. : Appends a point, y_values are the counter values in
+                    the order of the labels
+        """
+        x = float(x)
+        row = self._get_row(y_values)
+        self.buffer.append(x, *row)
+
+        if self.x_range is None:
+            self.x_range = (x, x)
+        elif x < self.x_range[0] or x > self.x_range[1]:
+            self.x_range = (min(x, self.x_range[0]), max(x, self.x_range[1]))
+        self.y_range = _update_range(self.y_range, np.array(row))
+
+    def add_points(self, x_values, y_rows):
+        """
+        Descript. : Appends several points, one row of counter values
+                    per point
+        """
+        if len(x_values) == 0:
+            return
+        x_values = np.asarray(x_values, dtype=np.float64)
+        rows = np.array([self._get_row(row) for row in y_rows],
+                        dtype=np.float64).reshape(len(x_values),
+                                                  len(self.labels))
+        self.buffer.extend(x_values, *rows.T)
+        self.x_range = _update_range(self.x_range, x_values)
+        self.y_range = _update_range(self.y_range, rows.ravel())
+
+    def get_x(self):
+        return self.buffer.get_column("x")
+
+    def get_y(self, label):
+        return self.buffer.get_column(label)
+
+    def has_new_points(self):
+        return len(self.buffer) > self.num_drawn
+
+    def mark_drawn(self):
+        self.num_drawn = len(self.buffer)
@@ -0,0 +1,136 @@
+#
+#  Project: MXCuBE
+#  https://github.com/mxcube.
+#
+#  This file is part of MXCuBE software.
+#
+#  MXCuBE is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MXCuBE is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MXCuBE.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Batched drawing of scan points on a QtBlissGraph.
+
+The scan plot bricks give the points of a scan to ScanPlotUpdater.
+They are accumulated in a ScanData and the curves with the new points
+are redrawn by a single shot timer, at most max_refresh_rate times per
+second (every point if it is 0). The axis limits are set from the
+ranges kept by ScanData, so the graph does not autoscale on the whole
+curves at every redraw.
+
+QtBlissGraph can only set the whole data of a curve, so each redraw
+still gives newcurve the full curve of every counter: a redraw costs
+O(n), but there are at most max_refresh_rate of them per second instead
+of one per point.
+"""
+
+import time
+
+from qt import *
+
+from BlissFramework.Utils.ScanData import ScanData, SCAN_INITIAL_CAPACITY
+
+
+SCAN_MAX_REFRESH_RATE = 10.
+# part of the y range added above and below the curves
+Y_RANGE_MARGIN = 0.02
+
+
+class ScanPlotUpdater(QObject):
+    def __init__(self, graph, max_refresh_rate=SCAN_MAX_REFRESH_RATE):
+        QObject.__init__(self)
+
+        self.graph = graph
+        self.maxRefreshRate = max_refresh_rate
+        self.logY = False
+        self.scanData = None
+        self.lastRedraw = 0
+        self.axisLimits = (None, None)
+        self.redrawTimer = QTimer(self)
+
+        QObject.connect(self.redrawTimer, SIGNAL('timeout()'), self.redraw)
+
+
+    def newScan(self, labels, capacity=SCAN_INITIAL_CAPACITY):
+        """Creates the empty curves of a new scan"""
+        self.redrawTimer.stop()
+        self.scanData = ScanData(labels, capacity)
+        self.axisLimits = (None, None)
+        self.graph.xAutoScale = True
+        self.graph.yAutoScale = True
+
+        for label in self.scanData.labels:
+            self.graph.newcurve(label, self.scanData.get_x(), self.scanData.get_y(label))
+
+
+    def addPoint(self, x, y_values):
+        if self.scanData is None:
+            return
+        self.scanData.add_point(x, y_values)
+        self.scheduleRedraw()
+
+
+    def addPoints(self, x_values, y_rows):
+        if self.scanData is None:
+            return
+        self.scanData.add_points(x_values, y_rows)
+        self.scheduleRedraw()
+
+
+    def scheduleRedraw(self):
+        if self.maxRefreshRate <= 0:
+            self.redraw()
+        elif not self.redrawTimer.isActive():
+            elapsed = int((time.time() - self.lastRedraw) * 1000)
+            self.redrawTimer.start(max(0, self.redrawInterval() - elapsed), True)
+
+
+    def redrawInterval(self):
+        # in ms
+        return int(1000 / max(self.maxRefreshRate, 0.01))
+
+
+    def redraw(self):
+        """Redraws the curves if points were added since the last redraw"""
+        scanData = self.scanData
+        if scanData is None or not scanData.has_new_points():
+            return
+        self.lastRedraw = time.time()
+
+        x = scanData.get_x()
+        for label in scanData.labels:
+            self.graph.newcurve(label, x, scanData.get_y(label))
+        self.updateAxisLimits()
+        scanData.mark_drawn()
+
+        self.graph.replot()
+
+
+    def updateAxisLimits(self):
+        x_range, y_range = self.scanData.x_range, self.scanData.y_range
+        if y_range is not None and not self.logY:
+            margin = (y_range[1] - y_range[0]) * Y_RANGE_MARGIN
+            y_range = (y_range[0] - margin, y_range[1] + margin)
+        else:
+            y_range = None
+        if (x_range, y_range) == self.axisLimits:
+            return
+        self.axisLimits = (x_range, y_range)
+
+        if x_range is not None and x_range[1] > x_range[0]:
+            self.graph.setX1AxisLimits(x_range[0], x_range[1])
+        if y_range is not None and y_range[1] > y_range[0]:
+            self.graph.setY1AxisLimits(y_range[0], y_range[1])
+
+
+    def stop(self):
+        self.redrawTimer.stop()
@@ -0,0 +1,215 @@
+#
+#  Project: MXCuBE
+#  https://github.com/mxcube.
+#
+#  This file is part of MXCuBE software.
+#
+#  MXCuBE is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MXCuBE is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MXCuBE.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Profiler of the GUI startup.
+
+The startup code measures its steps with span(category, name...):
+
+    with StartupProfiler.span("import", brick_type):
+        ...
+
+Spans cost nothing while the profiler is not enabled. Once enabled (see
+the --profileStartup option of Qt4_startGUI) every span is recorded with
+its thread. save() writes a report (<prefix>.txt) with the total time of
+each category and the spans sorted by duration, and a trace
+(<prefix>.json) in the Chrome trace event format, to be opened in
+chrome://tracing or https://ui.perfetto.dev.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+
+
+__credits__ = ["MXCuBE colaboration"]
+__version__ = "2.3"
+
+
+REPORT_MAX_SPANS = 100
+
+_profiler = None
+
+
+class _NullSpan(object):
+    """
+    Descript. : Span of a disabled profiler
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    """
+    Descript. : Span recorded by a profiler when it is exited
+    """
+
+    def __init__(self, profiler, category, name):
+        self.profiler = profiler
+        self.category = category
+        self.name = name
+        self.start_time = None
+
+    def __enter__(self):
+        self.start_time = time.time()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.add_span(self.category, self.name, self.start_time,
+                               time.time() - self.start_time)
+        return False
+
+
+class StartupProfiler(object):
+    """
+    Descript. : Timed spans of the startup
+    """
+
+    def __init__(self):
+        self.start_time = time.time()
+        # (category, name, start time, duration, thread id, thread name)
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def span(self, category, name):
+        return _Span(self, category, name)
+
+    def add_span(self, category, name, start_time, duration):
+        thread = threading.current_thread()
+        with self.lock:
+            self.spans.append((category, name, start_time, duration,
+                               thread.ident, thread.name))
+
+    def get_category_totals(self):
+        """
+        Descript. : Returns [(category, total time, number of spans)]
+                    sorted by total time
+        """
+        totals = {}
+        for category, name, start_time, duration, _, _ in self.spans:
+            total, count = totals.get(category, (0.0, 0))
+            totals[category] = (total + duration, count + 1)
+        return sorted([(category, total, count) for category, \
+                       (total, count) in totals.items()],
+                      key=lambda item: item[1], reverse=True)
+
+    def get_report(self, max_spans=REPORT_MAX_SPANS):
+        """
+        Descript. : Returns the text report
+        """
+        lines = ["MXCuBE startup profile: %.3f s" % \
+                 (time.time() - self.start_time), "",
+                 "%-14s %10s %8s" % ("category", "total [s]", "spans")]
+        for category, total, count in self.get_category_totals():
+            lines.append("%-14s %10.3f %8d" % (category, total, count))
+
+        lines += ["", "%-14s %10s %10s  %-14s %s" % \
+                  ("category", "time [s]", "start [s]", "thread", "name")]
+        spans = sorted(self.spans, key=lambda span: span[3], reverse=True)
+        for category, name, start_time, duration, _, thread_name \
+            in spans[:max_spans]:
+            lines.append("%-14s %10.3f %10.3f  %-14s %s" % \
+                         (category, duration, start_time - self.start_time,
+                          thread_name, name))
+        if len(spans) > max_spans:
+            lines.append("... %d shorter spans in the trace file" % \
+                         (len(spans) - max_spans))
+        return "\n".join(lines) + "\n"
+
+    def get_chrome_trace(self):
+        """
+        Descript. : Returns the spans as a dict in the Chrome trace event
+                    format (complete events, times in microseconds)
+        """
+        pid = os.getpid()
+        events = []
+        thread_names = {}
+        for category, name, start_time, duration, thread_id, thread_name \
+            in self.spans:
+            thread_names[thread_id] = thread_name
+            events.append({"name": name,
+                           "cat": category,
+                           "ph": "X",
+                           "ts": int((start_time - self.start_time) * 1e6),
+                           "dur": int(duration * 1e6),
+                           "pid": pid,
+                           "tid": thread_id})
+        for thread_id, thread_name in thread_names.items():
+            events.append({"name": "thread_name",
+                           "ph": "M",
+                           "pid": pid,
+                           "tid": thread_id,
+                           "args": {"name": thread_name}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, filename_prefix):
+        """
+        Descript. : Writes the report in <prefix>.txt and the trace in
+                    <prefix>.json
+        """
+        try:
+            with open(filename_prefix + ".txt", "w") as report_file:
+                report_file.write(self.get_report())
+            with open(filename_prefix + ".json", "w") as trace_file:
+                json.dump(self.get_chrome_trace(), trace_file)
+        except (IOError, OSError):
+            logging.getLogger().exception(\
+                "Could not save startup profile %s" % filename_prefix)
+        else:
+            logging.getLogger().info("Startup profile saved in " + \
+                "%s.txt and %s.json" % (filename_prefix, filename_prefix))
+
+
+def enable():
+    """
+    Descript. : Enables the profiler, the time origin is now
+    """
+    global _profiler
+    _profiler = StartupProfiler()
+    return _profiler
+
+
+def disable():
+    global _profiler
+    _profiler = None
+
+
+def get_profiler():
+    return _profiler
+
+
+def span(category, *name_parts):
+    """
+    Descript. : Returns a context manager timing a step. The name parts
+                are joined with dots only if the profiler is enabled
+    """
+    profiler = _profiler
+    if profiler is None:
+        return _NULL_SPAN
+    return profiler.span(category, ".".join([str(part) for part \
+                                             in name_parts]))
@@ -0,0 +1,143 @@
+#
+#  Project: MXCuBE
+#  https://github.com/mxcube.
+#
+#  This file is part of MXCuBE software.
+#
+#  MXCuBE is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MXCuBE is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MXCuBE.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+History of a scalar value (machine current, cryo temperature...).
+
+Points are kept in a preallocated RingBuffer with the columns "x"
+(timestamp) and "y" (value), so the buffer can be plotted directly by a
+realtime plot. If a file is given every point is appended to it as a
+"timestamp value" text line and the last points are loaded back at
+startup. The file is rewritten with the kept points when it contains
+more than HISTORY_FILE_COMPACT_FACTOR times the buffer capacity.
+"""
+
+import os
+import time
+import logging
+
+from BlissFramework.Utils.RingBuffer import RingBuffer
+
+
+__credits__ = ["MXCuBE colaboration"]
+__version__ = "2.3"
+
+
+HISTORY_FILE_COMPACT_FACTOR = 4
+
+
+class TimeSeriesHistory(object):
+    """
+    Descript. : Bounded time series with an append-only history file
+    """
+
+    def __init__(self, capacity, filename=None):
+        """
+        Descript. : capacity is the number of points kept in memory
+        """
+        self.buffer = RingBuffer(capacity, columns=("x", "y"))
+        self.filename = filename
+        self._file = None
+        self._file_lines = 0
+
+        if filename:
+            self.load()
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def load(self):
+        """
+        Descript. : Loads the last points of the history file
+        """
+        if not os.path.exists(self.filename):
+            return
+        times = []
+        values = []
+        try:
+            with open(self.filename) as history_file:
+                for line in history_file:
+                    try:
+                        timestamp, value = [float(item) for item \
+                                            in line.split()]
+                    except ValueError:
+                        continue
+                    times.append(timestamp)
+                    values.append(value)
+        except IOError:
+            logging.getLogger("HWR").exception(\
+                "Unable to read history file %s" % self.filename)
+            return
+
+        self._file_lines = len(times)
+        self.buffer.extend(times, values)
+        if self._file_lines > HISTORY_FILE_COMPACT_FACTOR * \
+                              self.buffer.capacity:
+            self.compact()
+
+    def compact(self):
+        """
+        Descript. : Rewrites the history file with the points in memory
+        """
+        self.close()
+        temp_filename = self.filename + ".tmp"
+        try:
+            with open(temp_filename, "w") as history_file:
+                for timestamp, value in self.buffer.get_data().T:
+                    history_file.write("%.3f %r\n" % (timestamp, float(value)))
+            os.rename(temp_filename, self.filename)
+            self._file_lines = len(self.buffer)
+        except (IOError, OSError):
+            logging.getLogger("HWR").exception(\
+                "Unable to compact history file %s" % self.filename)
+
+    def append(self, value, timestamp=None):
+        """
+        Descript. : Adds a point, by default with the current time
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        self.buffer.append(timestamp, value)
+
+        if self.filename:
+            try:
+                if self._file is None:
+                    # line buffered, a point is written per line
+                    self._file = open(self.filename, "a", 1)
+                self._file.write("%.3f %r\n" % (timestamp, float(value)))
+                self._file_lines += 1
+            except IOError:
+                logging.getLogger("HWR").exception(\
+                    "Unable to write history file %s" % self.filename)
+                self.filename = None
+                return
+            if self._file_lines > HISTORY_FILE_COMPACT_FACTOR * \
+                                  self.buffer.capacity:
+                self.compact()
+
+    def get_times(self):
+        return self.buffer.get_column("x")
+
+    def get_values(self):
+        return self.buffer.get_column("y")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -66,7 +66,11 @@ $.extend(MouseApp.Python.prototype, MouseApp.Terminal.prototype, {
         error: function(XMLHttpRequest, textStatus, errorThrown) {},
         url: 'output_request',
         type: 'GET',
-        success: function(output) { python.write(output); },
+        success: function(output) {
+          for (var i = 0; i < output.length; i++) {
+            python.write(output[i]);
+          }
+        },
         complete: function() { python.askForOutput(); },
         data: { "client_id": python.session_id },
         dataType: 'json'
@@ -79,7 +83,11 @@ $.extend(MouseApp.Python.prototype, MouseApp.Terminal.prototype, {
         error: function(XMLHttpRequest, textStatus, errorThrown) {},
         url: 'log_msg_request',
         type: 'GET',
-        success: function(msg) { jQuery("#logger:first").append("<p>"+msg+"</p>"); },
+        success: function(msgs) {
+          for (var i = 0; i < msgs.length; i++) {
+            jQuery("#logger:first").append("<p>"+msgs[i]+"</p>");
+          }
+        },
         complete: function() { python.askForLogMessages(); },
         data: { "client_id": python.session_id },
         dataType: 'json'
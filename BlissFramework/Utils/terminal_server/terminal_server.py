@@ -19,13 +19,86 @@ HISTORY = {}
 LOG = {}
 OUTPUT = {}
 CODE_EXECUTION = {}
+STREAMS = {}
 ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
 INTERPRETER = None
 INTERPRETER_GLOBALS = {}
 
+# messages kept per client queue, the oldest are dropped
+MAX_QUEUE_SIZE = 10000
+# budget of one response of /output_request and /log_msg_request
+BATCH_MAX_BYTES = 64*1024
+BATCH_MAX_WAIT = 0.02
+# comment sent on idle event streams, to detect closed connections
+STREAM_KEEPALIVE = 15
+
 def export(name, obj):
   INTERPRETER_GLOBALS[name]=obj
 
+class ClientQueue(gevent.queue.Queue):
+  """Bounded message queue of a client
+
+  put never blocks: when the queue is full the oldest message
+  is dropped and counted in 'dropped'
+  """
+  def __init__(self, maxsize=None):
+    gevent.queue.Queue.__init__(self, maxsize or MAX_QUEUE_SIZE)
+    self.dropped = 0
+
+  def put(self, item, block=True, timeout=None):
+    while self.full():
+      try:
+        self.get_nowait()
+      except gevent.queue.Empty:
+        break
+      self.dropped += 1
+    gevent.queue.Queue.put(self, item, False)
+
+  def put_back(self, items):
+    """Puts messages taken from the queue back before the queued ones"""
+    newer = []
+    while self.qsize() > 0:
+      newer.append(self.get_nowait())
+    for item in list(items)+newer:
+      self.put(item)
+
+def drain(queue, max_bytes=BATCH_MAX_BYTES, max_wait=BATCH_MAX_WAIT):
+  """Returns the queued messages, up to max_bytes of messages
+
+  Waits for the first message, then for the next ones during
+  max_wait seconds at most
+  """
+  messages = [queue.get()]
+  size = len(messages[0])
+  deadline = time.time()+max_wait
+  try:
+    while size < max_bytes:
+      if queue.qsize() > 0:
+        message = queue.get_nowait()
+      else:
+        remaining = deadline-time.time()
+        if remaining <= 0:
+          break
+        try:
+          message = queue.get(timeout=remaining)
+        except gevent.queue.Empty:
+          break
+      messages.append(message)
+      size += len(message)
+  except gevent.GreenletExit:
+    # killed while waiting: the messages are not lost
+    queue.put_back(messages)
+    raise
+  return messages
+
+def get_output_queue(client_id):
+  return OUTPUT.setdefault(client_id, ClientQueue())
+
+def format_output(output):
+  if output == "\n":
+    return ""
+  return output
+
 class GreenletStdout:
   def write(self, output):
     # find right client id depending on greenlet
@@ -114,29 +187,136 @@ def MyLogHandler(client_id):
 class _MyLogHandler(logging.Handler):
   def __init__(self):
     logging.Handler.__init__(self)
-    self.queue = gevent.queue.Queue() 
+    self.queue = ClientQueue()
     
   def emit(self, record):
     self.queue.put(record.getMessage()) 
 
+def is_batch_request():
+  # batch=0: one message per request (protocol of the old clients)
+  return bottle.request.GET.get("batch") != "0"
+
+def send_messages(queue, format_message=None):
+  """Returns a JSON list of the queued messages, or the next message
+  for a batch=0 request
+  """
+  if is_batch_request():
+    messages = drain(queue)
+  else:
+    messages = [queue.get()]
+  if format_message is not None:
+    messages = [format_message(message) for message in messages]
+  bottle.response.headers["X-Dropped-Messages"] = str(queue.dropped)
+  if is_batch_request():
+    return json.dumps(messages)
+  return json.dumps(messages[0])
+
 @bottle.route("/output_request")
 def send_output():
   client_id = bottle.request.GET["client_id"]
-  try:
-    output = OUTPUT[client_id].get()
-  except KeyError:
+  if not client_id in OUTPUT:
     # an old client was waiting for us
-    OUTPUT.setdefault(client_id, gevent.queue.Queue())
-    return json.dumps("")
- 
-  if output == "\n":
+    get_output_queue(client_id)
+    if is_batch_request():
+      return json.dumps([])
     return json.dumps("")
-  return json.dumps(output)
+  return send_messages(OUTPUT[client_id], format_output)
 
 @bottle.route("/log_msg_request")
 def send_log():
   client_id = bottle.request.GET["client_id"]
-  return json.dumps(MyLogHandler(client_id).queue.get())
+  return send_messages(MyLogHandler(client_id).queue)
+
+class EventStream:
+  """Server-sent events of the queues of a client
+
+  Forwarders drain the client queues into one event queue of one
+  batch per queue, so a slow connection leaves the messages in the
+  bounded client queues
+  """
+  def __init__(self, client_id, queues):
+    self.client_id = client_id
+    self.queues = queues
+    self.events = gevent.queue.Queue(len(queues))
+    self.stopped = False
+    self.forwarders = [gevent.spawn(self.forward, event, queue) for event, queue in queues.items()]
+
+  def forward(self, event, queue):
+    while True:
+      messages = drain(queue)
+      try:
+        self.events.put((event, messages))
+      except gevent.GreenletExit:
+        # the stream is stopped: the next request or stream gets the messages
+        queue.put_back(messages)
+        raise
+
+  def get_dropped(self):
+    return dict([(event, queue.dropped) for event, queue in self.queues.items()])
+
+  def stop(self):
+    self.stopped = True
+    gevent.killall(self.forwarders)
+    # the batches not sent go back to the client queues, before the
+    # batches the forwarders have put back
+    batches = []
+    while self.events.qsize() > 0:
+      item = self.events.get_nowait()
+      if item is not None:
+        batches.append(item)
+    for event, messages in reversed(batches):
+      self.queues[event].put_back(messages)
+    try:
+      self.events.put_nowait(None)
+    except gevent.queue.Full:
+      pass
+
+  def __iter__(self):
+    dropped = self.get_dropped()
+    try:
+      yield "retry: 1000\n\n"
+      while not self.stopped:
+        try:
+          item = self.events.get(timeout=STREAM_KEEPALIVE)
+        except gevent.queue.Empty:
+          yield ":\n\n"
+          continue
+        if item is None:
+          break
+        event, messages = item
+        if event == "output":
+          messages = [format_output(message) for message in messages]
+        data = "event: %s\ndata: %s\n\n" % (event, json.dumps(messages))
+        if self.get_dropped() != dropped:
+          dropped = self.get_dropped()
+          data += "event: dropped\ndata: %s\n\n" % json.dumps(dropped)
+        yield data
+    finally:
+      self.stop()
+      if STREAMS.get(self.client_id) is self:
+        del STREAMS[self.client_id]
+
+@bottle.route("/event_stream")
+def send_event_stream():
+  """Server-sent events of a client: output (and log if log=1) events
+  with a JSON list of messages, dropped events with the number of
+  messages dropped from the client queues
+
+  A client has one stream, opening a new one closes the previous one
+  """
+  client_id = bottle.request.GET["client_id"]
+  queues = { "output": get_output_queue(client_id) }
+  if bottle.request.GET.get("log") == "1":
+    queues["log"] = MyLogHandler(client_id).queue
+
+  previous_stream = STREAMS.pop(client_id, None)
+  if previous_stream is not None:
+    previous_stream.stop()
+  STREAMS[client_id] = EventStream(client_id, queues)
+
+  bottle.response.content_type = "text/event-stream"
+  bottle.response.headers["Cache-Control"] = "no-cache"
+  return iter(STREAMS[client_id])
 
 @bottle.get("/completion_request")
 def send_completion():
@@ -211,7 +391,7 @@ def do_execute(python_code_to_execute):
 def main():
   contents = file(os.path.join(ROOT_PATH, "terminal.html"), "r")
   client_id = str(id(contents))
-  OUTPUT.setdefault(client_id, gevent.queue.Queue())
+  get_output_queue(client_id)
   return contents.read() % id(contents) 
 
 @bottle.route("/lib/CodeMirror-2.3/lib/:filename")
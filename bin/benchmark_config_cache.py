@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Benchmark of the compiled cache of the GUI configuration files.
+
+Copies the example GUI files in a temporary directory and compares the
+cold load (parsing the file and loading its property bags, then writing
+the cache) with the warm load from the cache, and with the load after
+the file has been touched (mtime changed, content hash unchanged).
+
+Usage: benchmark_config_cache.py [number of loads] [GUI file ...]
+"""
+import sys
+import os
+import time
+import shutil
+import tempfile
+MXCUBE_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+sys.path.insert(0, MXCUBE_ROOT)
+
+from BlissFramework.Utils import ConfigCache
+
+
+def timed(num_loads, function, *args):
+    """Returns the best time of num_loads calls"""
+    best_time = None
+    for index in range(num_loads):
+        start_time = time.time()
+        function(*args)
+        load_time = time.time() - start_time
+        if best_time is None or load_time < best_time:
+            best_time = load_time
+    return best_time
+
+
+def parse(config_filename):
+    """Load without cache, as done before the cache"""
+    with open(config_filename, "rb") as config_file:
+        content = config_file.read()
+    ConfigCache.decode_properties(ConfigCache.parse_config(content,
+                                                           config_filename))
+
+
+def touch_and_load(config_filename):
+    os.utime(config_filename, None)
+    ConfigCache.load_config(config_filename)
+
+
+if __name__ == '__main__':
+  num_loads = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+  config_filenames = sys.argv[2:] or \
+      [os.path.join(MXCUBE_ROOT, "ExampleFiles", "example_mxcube_qt4.%s" % \
+       extension) for extension in ("json", "yml")]
+
+  temp_dir = tempfile.mkdtemp()
+  try:
+    print "%-26s %10s %10s %10s %10s %9s" % ("file", "parse [s]", "cold [s]",
+          "warm [s]", "touch [s]", "speedup")
+    for config_filename in config_filenames:
+      filename = os.path.join(temp_dir, os.path.basename(config_filename))
+      shutil.copy(config_filename, filename)
+
+      parse_time = timed(num_loads, parse, filename)
+      cold_time = timed(num_loads, ConfigCache.build_cache, filename)
+      warm_time = timed(num_loads, ConfigCache.load_config, filename)
+      touch_time = timed(num_loads, touch_and_load, filename)
+      assert ConfigCache.load_config(filename) == \
+             ConfigCache.load_config(filename, use_cache=False)
+
+      print "%-26s %10.4f %10.4f %10.4f %10.4f %8.1fx" % \
+            (os.path.basename(filename), parse_time, cold_time, warm_time,
+             touch_time, parse_time / max(warm_time, 1e-6))
+  finally:
+    shutil.rmtree(temp_dir)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Benchmark of the data collection tree population.
+
+Populates DataCollectTree with a sample changer content (baskets and
+samples), adds a task group with one data collection to each sample and
+reports the time spent in populate_tree_widget, in the task creation and
+in the item lookups.
+
+Usage: benchmark_dc_tree.py [number of samples] [samples per basket]
+"""
+import sys
+import os
+import time
+MXCUBE_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+sys.path.insert(0, MXCUBE_ROOT)
+
+import BlissFramework
+from HardwareRepository import HardwareRepository
+from QtImport import *
+
+import queue_model_objects_v1 as queue_model_objects
+from widgets.Qt4_dc_tree_widget import DataCollectTree
+
+
+class BenchmarkQueueModel(object):
+    """Minimal queue model that forwards added nodes to the tree"""
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.root = queue_model_objects.RootNode()
+
+    def get_model_root(self):
+        return self.root
+
+    def clear_model(self, name=None):
+        self.root = queue_model_objects.RootNode()
+
+    def select_model(self, name):
+        pass
+
+    def add_child(self, parent, child):
+        parent.add_child(child)
+        self.tree.add_to_view(parent, child)
+
+    def view_created(self, view_item, task):
+        view_item._data_model = task
+
+
+class BenchmarkQueue(object):
+
+    def clear(self):
+        pass
+
+
+if __name__ == '__main__':
+  num_samples = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+  samples_per_basket = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+  app = QApplication([])
+  tree = DataCollectTree(None)
+  tree.queue_hwobj = BenchmarkQueue()
+  tree.queue_model_hwobj = BenchmarkQueueModel(tree)
+  tree.set_sample_pin_icon = lambda: None
+
+  basket_list = []
+  sample_list = []
+  num_baskets = (num_samples + samples_per_basket - 1) / samples_per_basket
+  for basket_index in range(num_baskets):
+      basket = queue_model_objects.Basket()
+      basket.set_name("Basket %d" % (basket_index + 1))
+      basket_list.append(basket)
+  for sample_index in range(num_samples):
+      sample = queue_model_objects.Sample()
+      sample.set_name("sample-%d" % (sample_index + 1))
+      sample.location = (sample_index / samples_per_basket + 1,
+                         sample_index % samples_per_basket + 1)
+      sample_list.append(sample)
+
+  start_time = time.time()
+  tree.populate_tree_widget(basket_list, sample_list, 1)
+  populate_time = time.time() - start_time
+
+  start_time = time.time()
+  for sample in sample_list:
+      task_group = queue_model_objects.TaskGroup()
+      tree.queue_model_hwobj.add_child(sample, task_group)
+      acq = queue_model_objects.Acquisition()
+      dc = queue_model_objects.DataCollection([acq], sample.crystals[0])
+      tree.queue_model_hwobj.add_child(task_group, dc)
+  tasks_time = time.time() - start_time
+
+  start_time = time.time()
+  for sample in sample_list:
+      tree.get_item_by_model(sample)
+  lookup_time = time.time() - start_time
+
+  print "Baskets: %d, samples: %d, tree items: %d" % \
+        (num_baskets, num_samples, len(tree.item_index))
+  print "populate_tree_widget:      %8.3f s" % populate_time
+  print "add task group + dc:       %8.3f s" % tasks_time
+  print "get_item_by_model x %d:  %8.3f ms" % (num_samples, lookup_time * 1000)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Benchmark of the contrast levels used by ImageAnalysisBrick.
+
+Creates synthetic detector frames (Poisson background with Bragg spots
+and a few saturated pixels) and compares the sort based cumulative
+contrast with the histogram based ImageContrast, with and without a
+strided subsample. The std. deviation contrast is computed from the
+same histogram.
+
+Usage: benchmark_image_contrast.py [frame size] [subsample step]
+"""
+import sys
+import os
+import time
+MXCUBE_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+sys.path.insert(0, MXCUBE_ROOT)
+
+import numpy as np
+from BlissFramework.Utils.ImageContrast import ImageContrast, \
+     sort_cumulative_contrast
+
+
+def create_frame(size, dtype):
+    """Returns a size x size frame with background, spots and hot pixels"""
+    frame = np.random.poisson(3, (size, size)).astype(dtype)
+    num_spots = size * 4
+    rows = np.random.randint(0, size, num_spots)
+    cols = np.random.randint(0, size, num_spots)
+    frame[rows, cols] = np.random.randint(100, 20000, num_spots)
+    frame[np.random.randint(0, size, 10), np.random.randint(0, size, 10)] = \
+        np.iinfo(dtype).max if np.issubdtype(dtype, np.integer) else 1e6
+    return frame
+
+
+def timed(function, *args):
+    start_time = time.time()
+    result = function(*args)
+    return result, time.time() - start_time
+
+
+if __name__ == '__main__':
+  size = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+  step = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+  print "%8s %-22s %10s %24s" % ("dtype", "method", "time [s]", "min, max")
+  for dtype in (np.uint16, np.uint32, np.float32):
+      frame = create_frame(size, dtype)
+
+      result, sort_time = timed(sort_cumulative_contrast, frame)
+      print "%8s %-22s %10.3f %24s" % (np.dtype(dtype).name, "sort",
+                                      sort_time, result)
+
+      contrast = ImageContrast(frame)
+      result, hist_time = timed(contrast.get_cumulative_contrast)
+      print "%8s %-22s %10.3f %24s" % ("", "histogram", hist_time, result)
+
+      result, std_time = timed(contrast.get_std_dev_contrast)
+      print "%8s %-22s %10.3f %24s" % ("", "std. dev (cached)", std_time,
+                                      "%.1f, %.1f" % result)
+
+      result, cached_time = timed(contrast.get_cumulative_contrast)
+      print "%8s %-22s %10.3f %24s" % ("", "histogram (cached)",
+                                      cached_time, result)
+
+      contrast = ImageContrast(frame, step)
+      result, sub_time = timed(contrast.get_cumulative_contrast)
+      print "%8s %-22s %10.3f %24s" % ("", "histogram step %d" % step,
+                                      sub_time, result)
+      print "%8s speedup: %.1fx (%.1fx with subsample)" % \
+            ("", sort_time / max(hist_time, 1e-6),
+             sort_time / max(sub_time, 1e-6))
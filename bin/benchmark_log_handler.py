@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Benchmark of the Qt4 GUI log handler.
+
+Emits log records at a given rate for a given time and reports how many
+records reached the viewer, how many were dropped and the longest stall
+of the Qt event loop.
+
+Usage: benchmark_log_handler.py [records per second] [duration] [--legacy]
+"""
+import sys
+import os
+import time
+import logging
+MXCUBE_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+sys.path.insert(0, MXCUBE_ROOT)
+sys.path.insert(0, os.path.join(MXCUBE_ROOT, "BlissFramework"))
+
+import gevent
+from QtImport import *
+from BlissFramework.Utils import Qt4_GUILogHandler
+
+
+class BenchmarkViewer(QWidget):
+
+    def __init__(self):
+        QWidget.__init__(self)
+        self.received = 0
+        self.events = 0
+
+    def customEvent(self, event):
+        self.events += 1
+        if isinstance(event, Qt4_GUILogHandler.LogBatchEvent):
+            self.append_log_records(event.records)
+        else:
+            self.append_log_record(event.record)
+
+    def append_log_record(self, record):
+        self.received += 1
+
+    def append_log_records(self, records):
+        self.received += len(records)
+
+
+def do_gevent():
+    try:
+        gevent.wait(timeout=0.01)
+    except AssertionError:
+        pass
+
+
+if __name__ == '__main__':
+  args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+  rate = int(args[0]) if len(args) > 0 else 10000
+  duration = float(args[1]) if len(args) > 1 else 5.0
+  Qt4_GUILogHandler.BATCH_MODE = "--legacy" not in sys.argv
+
+  app = QApplication([])
+  handler = Qt4_GUILogHandler.GUILogHandler()
+  logger = logging.getLogger("benchmark")
+  logger.propagate = False
+  logger.setLevel(logging.DEBUG)
+  logger.addHandler(handler)
+
+  viewer = BenchmarkViewer()
+  handler.register(viewer)
+
+  state = {"emitted": 0, "last_tick": None, "max_stall": 0}
+  start_time = time.time()
+
+  def produce():
+      elapsed = time.time() - start_time
+      if elapsed > duration:
+          return
+      expected = int(elapsed * rate)
+      for index in range(state["emitted"], expected):
+          logger.info("benchmark record %d", index)
+      state["emitted"] = max(expected, state["emitted"])
+
+  def tick():
+      now = time.time()
+      if state["last_tick"] is not None:
+          state["max_stall"] = max(state["max_stall"], now - state["last_tick"])
+      state["last_tick"] = now
+      if now - start_time > duration + 1.0:
+          app.quit()
+
+  gevent_timer = QTimer()
+  gevent_timer.timeout.connect(do_gevent)
+  gevent_timer.start(0)
+  producer_timer = QTimer()
+  producer_timer.timeout.connect(produce)
+  producer_timer.start(10)
+  tick_timer = QTimer()
+  tick_timer.timeout.connect(tick)
+  tick_timer.start(10)
+
+  app.exec_()
+
+  print "Mode:             %s" % ("batch" if Qt4_GUILogHandler.BATCH_MODE else "legacy")
+  print "Emitted records:  %d (%d records/s)" % (state["emitted"], state["emitted"] / duration)
+  print "Received records: %d in %d events" % (viewer.received, viewer.events)
+  print "Dropped records:  %d" % handler.dropped_records
+  print "Pending records:  %d" % len(handler.buffer)
+  print "Max loop stall:   %.1f ms" % (state["max_stall"] * 1000)
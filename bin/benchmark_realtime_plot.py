@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""
+Benchmark of the realtime curve append in TwoAxisPlotWidget.
+
+Appends points one by one and reports the mean cost per point for each
+block of points, including the coalesced redraws done by the event loop.
+The per point cost should stay constant as the curve grows.
+
+Usage: benchmark_realtime_plot.py [number of points] [block size]
+"""
+import sys
+import os
+import time
+MXCUBE_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+sys.path.insert(0, MXCUBE_ROOT)
+sys.path.insert(0, os.path.join(MXCUBE_ROOT, "BlissFramework"))
+sys.path.insert(0, os.path.join(MXCUBE_ROOT, "BlissFramework", "Bricks"))
+
+import math
+from QtImport import *
+from widgets.Qt4_matplot_widget import TwoAxisPlotWidget
+
+
+if __name__ == '__main__':
+  num_points = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+  block_size = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+  app = QApplication([])
+  plot_widget = TwoAxisPlotWidget(None, realtime_plot=True)
+  plot_widget.show()
+
+  canvas = plot_widget._two_axis_figure_canvas
+  print "%10s %15s %8s %8s" % ("points", "us per point", "draws", "blits")
+  index = 0
+  while index < num_points:
+      start_time = time.time()
+      for block_index in range(block_size):
+          plot_widget.add_new_plot_value(10 + math.sin(index * 0.01))
+          index += 1
+          if index % 100 == 0:
+              app.processEvents()
+      app.processEvents()
+      elapsed = time.time() - start_time
+      print "%10d %15.2f %8d %8d" % (index, elapsed * 1e6 / block_size,
+                                     canvas.realtime_draws,
+                                     canvas.realtime_blits)
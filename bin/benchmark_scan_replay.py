@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""
+Replay benchmark of the scan plot bricks.
+
+Replays a recorded scan (SPEC format data file: a "#L" line with the
+labels, then one line of values per point, x first) or, by default, a
+synthetic 10000 points scan. The points are first accumulated in a
+ScanData and in Python lists rebuilt as arrays at every point (the
+previous drawing path) without drawing. If Qt3 and PyMca are available
+the scan is then fed point by point to SpecScanPlotBrick, with a redraw
+per point (maxRefreshRate 0) and with batched redraws, and the number of
+points per second the brick sustains is reported.
+
+Usage: benchmark_scan_replay.py [scan file] [max refresh rate]
+"""
+import sys
+import os
+import time
+MXCUBE_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+sys.path.insert(0, MXCUBE_ROOT)
+
+import numpy as np
+from BlissFramework.Utils.ScanData import ScanData
+
+
+NUM_POINTS = 10000
+# points fed between two passes of the event loop
+EVENTS_STEP = 10
+
+
+def read_scan(filename):
+    """Returns (labels, rows) of the last scan of a SPEC data file"""
+    labels = []
+    rows = []
+    with open(filename) as scan_file:
+        for line in scan_file:
+            if line.startswith("#L"):
+                labels = line[2:].split()
+                rows = []
+            elif line.strip() and not line.startswith("#"):
+                rows.append([float(value) for value in line.split()])
+    return labels, rows
+
+
+def create_scan(num_points):
+    """Returns (labels, rows) of a peak scan with a monitor"""
+    x = np.linspace(-1, 1, num_points)
+    peak = 1e5 * np.exp(-x ** 2 / 0.02) + np.random.poisson(100, num_points)
+    monitor = np.random.normal(1e6, 1e3, num_points)
+    return ["theta", "det", "mon"], np.column_stack((x, peak, monitor)).tolist()
+
+
+def replay_lists(labels, rows):
+    """Previous path: lists converted to arrays at every point"""
+    xdata = []
+    ydatas = [[] for label in labels[1:]]
+    for row in rows:
+        xdata.append(row[0])
+        for ydata, yvalue in zip(ydatas, row[1:]):
+            ydata.append(float(yvalue))
+            np.array(xdata), np.array(ydata)
+
+
+def replay_scan_data(labels, rows):
+    scan_data = ScanData(labels[1:])
+    for row in rows:
+        scan_data.add_point(row[0], row[1:])
+        scan_data.get_x(), [scan_data.get_y(label) for label in labels[1:]]
+
+
+class ReplayScan:
+    """Scan object of the brick during the replay"""
+    def getScanType(self):
+        return None
+
+
+def replay_brick(app, brick, labels, rows):
+    brick.newScan({"title": "replay", "xlabel": labels[0],
+                   "ylabel": " ".join(labels[1:])})
+    start_time = time.time()
+    for index, row in enumerate(rows):
+        brick.newScanPoint(row[0], " ".join([str(value) for value in row[1:]]))
+        if index % EVENTS_STEP == 0:
+            app.processEvents()
+    brick.plotUpdater.redraw()
+    app.processEvents()
+    return time.time() - start_time
+
+
+if __name__ == '__main__':
+  if len(sys.argv) > 1 and sys.argv[1] != "-":
+    labels, rows = read_scan(sys.argv[1])
+  else:
+    labels, rows = create_scan(NUM_POINTS)
+  max_refresh_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 10.
+  num_points = len(rows)
+  print "%d points, counters: %s" % (num_points, " ".join(labels[1:]))
+
+  print "%-30s %12s" % ("accumulation", "points/s")
+  for name, replay in (("lists rebuilt per point", replay_lists),
+                       ("ScanData", replay_scan_data)):
+      start_time = time.time()
+      replay(labels, rows)
+      print "%-30s %12.0f" % (name, num_points / (time.time() - start_time))
+
+  try:
+    import qt
+    sys.path.insert(0, os.path.join(MXCUBE_ROOT, "BlissFramework", "Bricks"))
+    app = qt.QApplication([])
+    from SpecScanPlotBrick import SpecScanPlotBrick
+  except ImportError, e:
+    print "Brick replay skipped (%s)" % e
+    sys.exit(0)
+
+  brick = SpecScanPlotBrick(None, "scan_plot")
+  brick.scanObject = ReplayScan()
+  brick.show()
+
+  print "%-30s %12s" % ("SpecScanPlotBrick", "points/s")
+  for rate in (0, max_refresh_rate):
+      brick.plotUpdater.maxRefreshRate = rate
+      elapsed = replay_brick(app, brick, labels, rows)
+      print "%-30s %12.0f" % ("redraw per point" if rate <= 0 else \
+                               "max %g redraws/s" % rate, num_points / elapsed)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Load test of the terminal server output protocols.
+
+Starts the terminal server in this process, queues messages for a
+client and reports the time taken by an HTTP client to receive all of
+them with the single message protocol (/output_request?batch=0), the
+batched protocol (/output_request) and the event stream
+(/event_stream).
+
+Usage: benchmark_terminal_server.py [messages] [message size]
+"""
+import sys
+import os
+import time
+import json
+import socket
+MXCUBE_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+sys.path.insert(0, MXCUBE_ROOT)
+sys.path.insert(0, os.path.join(MXCUBE_ROOT, "BlissFramework", "Utils", "terminal_server"))
+
+from gevent import monkey
+monkey.patch_all(thread=False, subprocess=False)
+import gevent.pywsgi
+import bottle
+import terminal_server
+
+try:
+    import httplib
+except ImportError:
+    import http.client as httplib
+
+
+def queue_messages(client_id, num_messages, message_size):
+    queue = terminal_server.ClientQueue(num_messages + 1)
+    message = "x" * (message_size - 1) + "\n"
+    for index in range(num_messages):
+        queue.put(message)
+    terminal_server.OUTPUT[client_id] = queue
+    return queue
+
+
+def poll(port, client_id, num_messages, batch):
+    connection = httplib.HTTPConnection("127.0.0.1", port)
+    url = "/output_request?client_id=%s" % client_id
+    if not batch:
+        url += "&batch=0"
+    received = 0
+    requests = 0
+    while received < num_messages:
+        connection.request("GET", url)
+        output = json.loads(connection.getresponse().read())
+        requests += 1
+        received += len(output) if batch else 1
+    connection.close()
+    return received, requests
+
+
+def stream(port, client_id, num_messages):
+    connection = httplib.HTTPConnection("127.0.0.1", port)
+    connection.request("GET", "/event_stream?client_id=%s" % client_id)
+    response = connection.getresponse()
+    received = 0
+    events = 0
+    event = None
+    while received < num_messages:
+        line = response.fp.readline().decode() if sys.version_info[0] > 2 \
+               else response.fp.readline()
+        if line.startswith("event: "):
+            event = line[7:].strip()
+        elif line.startswith("data: ") and event == "output":
+            received += len(json.loads(line[6:]))
+            events += 1
+    connection.close()
+    return received, events
+
+
+if __name__ == '__main__':
+  num_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+  message_size = int(sys.argv[2]) if len(sys.argv) > 2 else 80
+
+  server = gevent.pywsgi.WSGIServer(("127.0.0.1", 0), bottle.default_app(), log=None)
+  server.start()
+  # without it, each response waits for the delayed ack of its headers
+  # (about 40 ms) and the single message protocol is bounded by it
+  server.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+  print("%d messages of %d bytes" % (num_messages, message_size))
+
+  for name, unit, receive in (("single message polling", "requests",
+                               lambda client_id: poll(server.server_port, client_id, num_messages, False)),
+                              ("batched polling", "requests",
+                               lambda client_id: poll(server.server_port, client_id, num_messages, True)),
+                              ("event stream", "events",
+                               lambda client_id: stream(server.server_port, client_id, num_messages))):
+    client_id = name.replace(" ", "_")
+    queue = queue_messages(client_id, num_messages, message_size)
+    start_time = time.time()
+    received, round_trips = receive(client_id)
+    elapsed = time.time() - start_time
+    print("%-24s %8d messages in %7.3f s: %9.0f messages/s, %d %s, %d dropped" % \
+          (name, received, elapsed, received / elapsed, round_trips, unit, queue.dropped))
+
+  server.stop()
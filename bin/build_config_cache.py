@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+"""
+Prebuilds the compiled cache (<file>.cache) of GUI configuration files,
+so the first start of the GUI does not parse them.
+
+Usage: build_config_cache.py <GUI file> [<GUI file> ...]
+"""
+import sys
+import os
+import time
+MXCUBE_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+sys.path.insert(0, MXCUBE_ROOT)
+
+from BlissFramework.Utils import ConfigCache
+
+
+if __name__ == '__main__':
+  if len(sys.argv) < 2:
+    print 'Usage: %s <GUI file> [<GUI file> ...]' % sys.argv[0]
+    sys.exit(1)
+
+  failed = False
+  for config_filename in sys.argv[1:]:
+    start_time = time.time()
+    try:
+      ConfigCache.build_cache(config_filename)
+    except Exception, e:
+      print 'Could not build cache of %s: %s' % (config_filename, e)
+      failed = True
+      continue
+    cache_filename = ConfigCache.get_cache_filename(config_filename)
+    if not os.path.exists(cache_filename):
+      print 'Could not write cache %s' % cache_filename
+      failed = True
+    else:
+      print '%s: %d bytes in %.3f s' % (cache_filename,
+            os.path.getsize(cache_filename), time.time() - start_time)
+  sys.exit(1 if failed else 0)
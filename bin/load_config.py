@@ -1,5 +1,4 @@
 #!/usr/bin/env python
-import cPickle
 import sys
 import os
 import pprint
@@ -9,19 +8,20 @@ sys.path.insert(0, MXCUBE_ROOT)
 app = qt.QApplication([])
 
 from BlissFramework.Utils import PropertyBag
+from BlissFramework.Utils import ConfigCache
 #from BlissFramework import Configuration
 
 if __name__ == '__main__':
   if len(sys.argv) > 2:
     try:
       cfg = open(sys.argv[2], 'r')
-      gui = open(sys.argv[1], 'r')
     except Exception, e:
       print 'Could not open file', e
   else:
     print 'Usage: %s <.gui file> <cfg file> > new .gui file' % sys.argv[0]
 
-  gui_config = eval(gui.read())
+  # property bags are loaded, from the cache of the .gui file if valid
+  gui_config = ConfigCache.load_config(sys.argv[1])
   #config_obj = Configuration.Configuration()
   #config_obj.load(gui_config)
   cfg = eval(cfg.read())
@@ -29,7 +29,7 @@ if __name__ == '__main__':
   def find(item_name, config=gui_config):
     for x in config:
       if x["name"]==item_name:
-        return x, cPickle.loads(x["properties"])
+        return x, x["properties"]
       cfg, item = find(item_name, x["children"]) 
       if item:
         return cfg,item
@@ -51,7 +51,6 @@ if __name__ == '__main__':
             gui_item.properties[prop_name].setValue(prop_value)
           except KeyError:
             pass
-        # re-dump PropertyBag
-        gui_cfg_item["properties"]=cPickle.dumps(gui_item)
 
-  print repr(gui_config)
+  # re-dump PropertyBags
+  print repr(ConfigCache.encode_properties(gui_config))